@@ -141,6 +141,22 @@ class DispatcherForm(PluginForm):
             if widget.name == widget_name:
                 widget.setTaintGraph(t, prop_policy)
                 
+    def passTaintQuery(self, taint_query, widget_name):
+        """
+        Pass the taint graph queries from the analyzer to visualizer
+        """
+        for widget in self.dispatcher_widgets:
+            if widget.name == widget_name:
+                widget.setTaintQuery(taint_query)
+                
+    def passTaintSummary(self, taint_summary, widget_name):
+        """
+        Pass the taint graph summary from the analyzer to visualizer
+        """
+        for widget in self.dispatcher_widgets:
+            if widget.name == widget_name:
+                widget.setTaintSummary(taint_summary)
+                
     def passBranchData(self, in_taint_chain, widget_name):
         """
         Pass the taintgraph from the analyzer to visualizer
@@ -0,0 +1,248 @@
+'''
+   This is the basic-block taint transfer summary cache for TREE taint tracking.
+
+   Straight-line runs of summarizable instructions(data movement, arithmetic, logic, shift, stack and
+   flag instructions of one thread at consecutive addresses) are buffered as basic blocks; the first
+   instruction that breaks the run(a branch, call, ret, string or other instruction) terminates the block
+   and is propagated normally after it.
+
+   The first time a block runs with a given taint pattern at its entry, it is propagated instruction by
+   instruction and the net effect on its slots(registers and memory bytes its instructions may touch) is
+   composed into a BlockSummary: which slots are cleared, which receive a taint held by another slot at
+   entry, and which receive a new taint derived from the taints of a set of entry slots(intermediate
+   provenance nodes are elided). Later executions with the same entry pattern apply the cached summary.
+
+   Memory slots are always resolved from the concrete read/write addresses of the records being
+   summarized; the key includes an alias signature of those addresses, so a summary is only reused when
+   the memory accesses of the block overlap the same way.
+ */
+'''
+import logging
+import Taint as TaintModule
+from Taint import Taint
+
+log = logging.getLogger('TREE')
+
+DEFAULT_MAX_BLOCK_SIZE = 64 #instructions buffered before a block is cut
+DEFAULT_MAX_SUMMARIES = 4096 #cached summaries before the cache is reset
+
+WRITE_CLEAR = 0
+WRITE_COPY = 1
+WRITE_SHARED = 2
+WRITE_NEW = 3
+
+class BlockSummary(object):
+    def __init__(self, nInstructions):
+        self.nInstructions = nInstructions
+        self.bValid = True
+        self.terminations = [] #(entry slot, record index of the terminator)
+        self.writes = [] #(slot, WRITE_CLEAR) / (slot, WRITE_COPY, entry slot) / (slot, WRITE_SHARED, slot) / (slot, WRITE_NEW, taint type, record index, instruction, entry slots)
+
+class BlockSummarizer(object):
+    def __init__(self, TP, maxBlockSize=DEFAULT_MAX_BLOCK_SIZE, maxSummaries=DEFAULT_MAX_SUMMARIES):
+        self.taintTracker = TP
+        self.bEnabled = False
+        self.maxBlockSize = maxBlockSize
+        self.maxSummaries = maxSummaries
+        self.block = []
+        self.summaries = {}
+        self.nBlocks = 0
+        self.nHits = 0
+        self.nInstructionsSummarized = 0
+        self.nUnsummarizable = 0
+
+    def Propagate(self, instRec):
+        TP = self.taintTracker
+        if (len(self.block) ==0 and len(TP.dynamic_taint) ==0):
+            return TP.PropagateInstruction(instRec)
+        instInfo = TP.DecodeInstruction(instRec)
+        slots = TP.inst_slots.get(instRec.currentInstruction)
+        if (slots is None or not slots.bSkippable or instInfo.inst_category not in TP.taint_category_summarizable):
+            self.Flush()
+            return TP.PropagateInstruction(instRec)
+
+        if (len(self.block)>0):
+            last = self.block[-1]
+            if (last.currentInstruction+last.currentInstSize != instRec.currentInstruction or last.currentThreadId != instRec.currentThreadId or len(self.block) >= self.maxBlockSize):
+                self.Flush()
+        self.block.append(instRec)
+        return 0
+
+    def GetSlots(self, block):
+        '''
+        Returns the concrete slot keys of a block and the alias signature of its memory accesses
+        '''
+        TP = self.taintTracker
+        regKeys = []
+        seen = set()
+        memKeys = []
+        memIndex = {}
+        aliasSig = []
+        for instRec in block:
+            slots = TP.inst_slots[instRec.currentInstruction]
+            srcNames, destNames = slots.getRegisterNames(TP.x86ISA, instRec.currentThreadId)
+            for name in srcNames + destNames:
+                if (name not in seen):
+                    seen.add(name)
+                    regKeys.append(name)
+            if (slots.srcMemWidth >0 or slots.destMemWidth >0):
+                for address in (instRec.currentReadAddr, instRec.currentWriteAddr):
+                    if (address is None):
+                        aliasSig.append(None)
+                        continue
+                    for i in range(slots.memWidth):
+                        if (address+i not in memIndex):
+                            memIndex[address+i] = len(memKeys)
+                            memKeys.append(address+i)
+                        aliasSig.append(memIndex[address+i])
+        return regKeys + memKeys, tuple(aliasSig)
+
+    def GetEntryPattern(self, entry):
+        '''
+        0 for a clean slot, otherwise 1 + the first slot holding the same taint
+        '''
+        pattern = []
+        first = {}
+        for s in range(len(entry)):
+            taint = entry[s]
+            if (taint is None):
+                pattern.append(0)
+            else:
+                if (id(taint) not in first):
+                    first[id(taint)] = s
+                pattern.append(1+first[id(taint)])
+        return tuple(pattern)
+
+    def Flush(self):
+        if (len(self.block) ==0):
+            return
+        block = self.block
+        self.block = []
+        self.nBlocks = self.nBlocks+1
+        dynamic_taint = self.taintTracker.dynamic_taint
+
+        slotKeys, aliasSig = self.GetSlots(block)
+        entry = [dynamic_taint.get(key) for key in slotKeys]
+        key = (block[0].currentInstruction, len(block), block[0].currentThreadId, aliasSig, self.GetEntryPattern(entry))
+        summary = self.summaries.get(key)
+        if (summary is not None):
+            if (summary.bValid):
+                self.nHits = self.nHits+1
+                self.nInstructionsSummarized = self.nInstructionsSummarized+len(block)
+                self.Apply(summary, block, slotKeys, entry)
+            else:
+                for instRec in block:
+                    self.taintTracker.PropagateInstruction(instRec)
+            return
+
+        summary = self.Record(block, slotKeys, entry)
+        if (len(self.summaries) >= self.maxSummaries):
+            self.summaries.clear()
+        self.summaries[key] = summary
+        if (not summary.bValid):
+            self.nUnsummarizable = self.nUnsummarizable+1
+
+    def Record(self, block, slotKeys, entry):
+        '''
+        Propagates the block instruction by instruction and composes its net effect into a summary
+        '''
+        TP = self.taintTracker
+        summary = BlockSummary(len(block))
+        firstTuid = TaintModule.tuid
+        entryIndex = {}
+        for s in range(len(entry)):
+            if (entry[s] is not None and id(entry[s]) not in entryIndex):
+                entryIndex[id(entry[s])] = s
+        terminators = {}
+        for s in entryIndex.values():
+            terminators[s] = (entry[s].terminatorInstruction, entry[s].terminatorThread)
+        seqIndex = {}
+        for i in range(len(block)):
+            seqIndex[block[i].currentInstSeq] = i
+
+        for instRec in block:
+            TP.PropagateInstruction(instRec)
+
+        for s in sorted(terminators.keys()):
+            taint = entry[s]
+            if ((taint.terminatorInstruction, taint.terminatorThread) != terminators[s]):
+                if (taint.terminatorInstruction not in seqIndex):
+                    summary.bValid = False
+                    return summary
+                summary.terminations.append((s, seqIndex[taint.terminatorInstruction]))
+
+        created = {}
+        for s in range(len(slotKeys)):
+            taint = TP.dynamic_taint.get(slotKeys[s])
+            if (taint is entry[s]):
+                continue
+            if (taint is None):
+                summary.writes.append((s, WRITE_CLEAR))
+            elif (id(taint) in entryIndex):
+                summary.writes.append((s, WRITE_COPY, entryIndex[id(taint)]))
+            elif (id(taint) in created):
+                summary.writes.append((s, WRITE_SHARED, created[id(taint)]))
+            else:
+                sources = self.GetEntrySources(taint, entryIndex, firstTuid)
+                if (sources is None or taint.creatorSequence not in seqIndex):
+                    summary.bValid = False
+                    return summary
+                created[id(taint)] = s
+                summary.writes.append((s, WRITE_NEW, taint.taintType, seqIndex[taint.creatorSequence], taint.creatorInstAmenic, sources))
+        return summary
+
+    def GetEntrySources(self, taint, entryIndex, firstTuid):
+        '''
+        Entry slots a taint created inside the block derives from, None when it cannot be expressed that way
+        '''
+        sources = set()
+        visited = set()
+        stack = [taint]
+        while len(stack)!=0:
+            t = stack.pop()
+            if (t.tuid in visited):
+                continue
+            visited.add(t.tuid)
+            if (id(t) in entryIndex):
+                sources.add(entryIndex[id(t)])
+                continue
+            if (t.tuid < firstTuid or len(t.aSources)>0 or len(t.bSources)>0 or len(t.cSources)>0):
+                return None
+            stack.extend(t.dSources)
+        return sorted(sources)
+
+    def Apply(self, summary, block, slotKeys, entry):
+        TP = self.taintTracker
+        dynamic_taint = TP.dynamic_taint
+        for instRec in block:
+            TP.TGC.Tick()
+        for s, i in summary.terminations:
+            entry[s].terminateTaint(block[i].currentInstSeq, block[i].currentThreadId)
+
+        created = {}
+        for write in summary.writes:
+            s = write[0]
+            key = slotKeys[s]
+            if (write[1] == WRITE_CLEAR):
+                if (key in dynamic_taint):
+                    del dynamic_taint[key]
+            elif (write[1] == WRITE_COPY):
+                dynamic_taint[key] = entry[write[2]]
+            elif (write[1] == WRITE_SHARED):
+                dynamic_taint[key] = created[write[2]]
+            else:
+                taintType, i, instStr, sources = write[2:]
+                instRec = block[i]
+                taint = Taint(taintType, key, instRec.currentInstSeq, instRec.currentThreadId, instStr)
+                Taint.uid2Taint[taint.tuid]= taint
+                for src in sources:
+                    taint.addTaintDSources(entry[src])
+                dynamic_taint[key] = taint
+                created[s] = taint
+        sDbg = "BlockSummarizer: applied summary of block 0x%x(%d instructions, %d writes)" %(block[0].currentInstruction, len(block), len(summary.writes))
+        log.debug(sDbg)
+
+    def getStatistics(self):
+        if (not self.bEnabled):
+            return "Block summaries: disabled\n"
+        return "Block summaries: %d of %d blocks applied from %d summaries(%d instructions), %d unsummarizable\n" %(self.nHits, self.nBlocks, len(self.summaries), self.nInstructionsSummarized, self.nUnsummarizable)
@@ -0,0 +1,250 @@
+'''
+   This is the taint-state checkpointing for TREE taint tracking.
+
+   A checkpoint holds everything needed to continue an analysis from the middle of a trace: the shadow
+   state(dynamic_taint), the path conditions(pcs) and reported sinks of every tracker sharing the
+   provenance arena, the provenance arena itself(every taint reachable from those roots or registered in
+   Taint.uid2Taint), the taint uid counter, the input label registry, the resolved library functions, the
+   heap objects and calls being tracked(see HeapTracker), the sink findings(see SinkRegistry) and the
+   trace reader position.
+
+   Taints are written as flat tuples whose sources are tuids, so arbitrarily deep provenance DAGs are
+   serialized without recursion; the whole checkpoint is pickled in binary form and zlib compressed.
+   Checkpoints are taken every self.interval instructions or every self.period seconds, whichever
+   comes first, and at every sequence number added with AddSequence.
+ */
+'''
+import os
+import time
+import zlib
+import logging
+import cPickle
+import Taint as TaintModule
+from Taint import Taint
+
+log = logging.getLogger('TREE')
+
+CHECKPOINT_MAGIC = "TREECKP1"
+CHECKPOINT_SUFFIX = ".ckp"
+DEFAULT_CHECKPOINT_INTERVAL = 1000000 #instructions between two checkpoints, 0 disables
+DEFAULT_CHECKPOINT_PERIOD = 600 #seconds between two checkpoints, 0 disables
+
+class Checkpointer(object):
+    def __init__(self, TP, directory=".", prefix="Checkpoint_", interval=DEFAULT_CHECKPOINT_INTERVAL, period=DEFAULT_CHECKPOINT_PERIOD):
+        self.taintTracker = TP
+        self.bEnabled = False
+        self.directory = directory
+        self.prefix = prefix
+        self.interval = interval
+        self.period = period
+        self.sequences = set() #additional sequence numbers to checkpoint at
+        self.nInstructions = 0
+        self.bPending = False
+        self.lastTime = time.time()
+        self.nSaved = 0
+        self.nBytes = 0
+        self.nRestored = 0
+
+    def AddSequence(self, sequence):
+        self.sequences.add(sequence)
+
+    def Tick(self, instRec, TR):
+        '''
+        Called by the driver once instRec has been propagated and the next record has been read from TR
+        '''
+        if (not self.bEnabled):
+            return None
+        self.nInstructions = self.nInstructions+1
+        bDue = self.bPending or instRec.currentInstSeq in self.sequences
+        if (self.interval >0 and self.nInstructions % self.interval ==0):
+            bDue = True
+        if (self.period >0 and time.time()-self.lastTime >= self.period):
+            bDue = True
+        if (not bDue):
+            return None
+        for TP in self.getTrackers():
+            if (TP.TLS.active is not None):
+                #wait for the summarized call to return rather than replaying it
+                self.bPending = True
+                return None
+        self.bPending = False
+        return self.Save(instRec.currentInstSeq, TR.record_line)
+
+    def getTrackers(self):
+        return self.taintTracker.TGC.trackers
+
+    def getPath(self, sequence):
+        return os.path.join(self.directory, "%s%08x%s" %(self.prefix, sequence, CHECKPOINT_SUFFIX))
+
+    def getCheckpoints(self):
+        '''
+        Returns the saved checkpoints as a sorted list of (sequence, path)
+        '''
+        checkpoints = []
+        if (not os.path.isdir(self.directory)):
+            return checkpoints
+        for name in os.listdir(self.directory):
+            if (not name.startswith(self.prefix) or not name.endswith(CHECKPOINT_SUFFIX)):
+                continue
+            try:
+                sequence = int(name[len(self.prefix):-len(CHECKPOINT_SUFFIX)], 16)
+            except ValueError:
+                continue
+            checkpoints.append((sequence, os.path.join(self.directory, name)))
+        checkpoints.sort()
+        return checkpoints
+
+    def getArena(self):
+        '''
+        Every taint reachable from the roots of all trackers, plus the registered ones
+        '''
+        arena = {}
+        stack = list(self.taintTracker.TGC.getRoots())
+        stack.extend(Taint.uid2Taint.values())
+        while stack:
+            taint = stack.pop()
+            if (taint is None or taint.tuid in arena):
+                continue
+            if (taint.bSpilled):
+                taint = Taint.store.Load(taint.tuid) #checkpoints stay self-contained
+            arena[taint.tuid] = taint
+            stack.extend(taint.aSources)
+            stack.extend(taint.bSources)
+            stack.extend(taint.cSources)
+            stack.extend(taint.dSources)
+        return arena
+
+    def Encode(self, sequence, position, bFinal=False):
+        for TP in self.getTrackers():
+            TP.FlushPending()
+        taints = []
+        for tuid, taint in sorted(self.getArena().iteritems()):
+            taints.append((tuid, taint.bDirectInput, taint.taintType, taint.taintAddress, taint.creatorSequence,
+                           taint.creatorThread, taint.creatorInstAmenic, taint.terminatorInstruction, taint.terminatorThread,
+                           taint.InputFunctionCallerAddress, taint.inputLabels,
+                           [s.tuid for s in taint.aSources], [s.tuid for s in taint.bSources],
+                           [s.tuid for s in taint.cSources], [s.tuid for s in taint.dSources]))
+        trackers = {}
+        for TP in self.getTrackers():
+            trackers[TP.taint_policy] = ([(key, taint.tuid) for key, taint in TP.dynamic_taint.iteritems()],
+                                         [taint.tuid for taint in TP.pcs],
+                                         TP.TC.sinkTaints.keys(),
+                                         TP.inputLabels,
+                                         TP.TLS.functions,
+                                         TP.sources,
+                                         TP.THT.getState(),
+                                         TP.TC.sinks.getState())
+        state = {"sequence":sequence, "position":position, "bFinal":bFinal, "tuid":TaintModule.tuid, "taints":taints,
+                 "registered":Taint.uid2Taint.keys(), "trackers":trackers}
+        return CHECKPOINT_MAGIC + zlib.compress(cPickle.dumps(state, cPickle.HIGHEST_PROTOCOL))
+
+    def ReadState(self, path):
+        '''
+        Returns the checkpoint as saved(taints as flat tuples), without rebuilding the provenance arena
+        '''
+        f = open(path, "rb")
+        data = f.read()
+        f.close()
+        if (not data.startswith(CHECKPOINT_MAGIC)):
+            raise ValueError("not a TREE checkpoint")
+        return cPickle.loads(zlib.decompress(data[len(CHECKPOINT_MAGIC):]))
+
+    def Decode(self, state):
+        arena = {}
+        for record in state["taints"]:
+            taint = Taint.__new__(Taint)
+            (taint.tuid, taint.bDirectInput, taint.taintType, taint.taintAddress, taint.creatorSequence,
+             taint.creatorThread, taint.creatorInstAmenic, taint.terminatorInstruction, taint.terminatorThread,
+             taint.InputFunctionCallerAddress, taint.inputLabels) = record[:11]
+            arena[taint.tuid] = taint
+        for record in state["taints"]:
+            taint = arena[record[0]]
+            taint.aSources = [arena[tuid] for tuid in record[11]]
+            taint.bSources = [arena[tuid] for tuid in record[12]]
+            taint.cSources = [arena[tuid] for tuid in record[13]]
+            taint.dSources = [arena[tuid] for tuid in record[14]]
+        return arena
+
+    def Save(self, sequence, position, bFinal=False):
+        data = self.Encode(sequence, position, bFinal)
+        path = self.getPath(sequence)
+        if (not os.path.isdir(self.directory)):
+            os.makedirs(self.directory)
+        f = open(path+".tmp", "wb")
+        f.write(data)
+        f.close()
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(path+".tmp", path) #never leave a truncated checkpoint behind
+        self.nSaved = self.nSaved+1
+        self.nBytes = self.nBytes+len(data)
+        self.lastTime = time.time()
+        sDbg = "Checkpoint: saved seq 0x%x at line %d to %s(%d bytes)" %(sequence, position, path, len(data))
+        log.debug(sDbg)
+        return path
+
+    def Load(self, path):
+        '''
+        Replaces the state of every tracker with the checkpoint, returns (sequence, reader position)
+        '''
+        state = self.ReadState(path)
+        arena = self.Decode(state)
+        for TP in self.getTrackers():
+            TP.FlushPending()
+            TP.dynamic_taint.clear()
+            TP.pcs = []
+            TP.TC.sinkTaints = {}
+            if (TP.taint_policy not in state["trackers"]):
+                log.debug("Checkpoint: no state for policy %d" %TP.taint_policy)
+                continue
+            dynamic, pcs, sinks, inputLabels, functions, sources, heap, registry = state["trackers"][TP.taint_policy]
+            TP.THT.setState(heap) #heap units are looked up in its index
+            for key, tuid in dynamic:
+                TP.dynamic_taint[key] = arena[tuid]
+            TP.pcs = [arena[tuid] for tuid in pcs]
+            for tuid in sinks:
+                TP.TC.sinkTaints[tuid] = arena[tuid]
+            TP.inputLabels = inputLabels
+            TP.TLS.functions = functions
+            TP.sources = list(sources)
+            TP.TC.sinks.setState(registry, arena)
+        Taint.uid2Taint = dict((tuid, arena[tuid]) for tuid in state["registered"])
+        TaintModule.tuid = state["tuid"]
+        self.nRestored = self.nRestored+1
+        self.lastTime = time.time()
+        sDbg = "Checkpoint: restored seq 0x%x at line %d from %s" %(state["sequence"], state["position"], path)
+        log.debug(sDbg)
+        return state["sequence"], state["position"]
+
+    def SaveFinal(self, instRec, position):
+        '''
+        Called by the driver when the trace ends after instRec, position is the line of instRec so that
+        resuming from the final checkpoint ends the analysis the same way
+        '''
+        if (not self.bEnabled):
+            return None
+        return self.Save(instRec.currentInstSeq, position, True)
+
+    def Remove(self, path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    def Resume(self, TR, sequence=None):
+        '''
+        Restores the nearest checkpoint at or before sequence(the latest one by default) and positions TR
+        on the first record after it. Returns the checkpoint sequence, or None when there is none.
+        '''
+        nearest = None
+        for checkpointSeq, path in self.getCheckpoints():
+            if (sequence is None or checkpointSeq <= sequence):
+                nearest = path
+        if (nearest is None):
+            return None
+        checkpointSeq, position = self.Load(nearest)
+        TR.seek(position)
+        return checkpointSeq
+
+    def getStatistics(self):
+        if (not self.bEnabled and self.nRestored ==0):
+            return "Checkpoints: disabled\n"
+        return "Checkpoints: %d saved(%d bytes), %d restored\n" %(self.nSaved, self.nBytes, self.nRestored)
@@ -0,0 +1,416 @@
+'''
+   This is the heap object tracking for TREE taint tracking.
+
+   Allocation and free routines(malloc, calloc, realloc, free, HeapAlloc, RtlAllocateHeap, operator new...)
+   are resolved to addresses from the image load(L) records and their export names, the same way as the
+   library summaries(see LibrarySummary). When a thread enters one of them right after a call, the stack
+   arguments are collected from the memory reads of the routine up to its matching return, and the return
+   value from the first dump of eax in that thread after the return. Calls nested in a tracked routine
+   (malloc calling HeapAlloc) are not tracked separately.
+
+   Allocated objects are kept in an interval index(HeapIndex). A freed object stays in the index until an
+   allocation reuses its memory, so that taint left in it is still attributed to it. Sink reports list the
+   heap objects the provenance of the sink taint went through(see TaintChecker).
+
+   With GRANULARITY_HEAP(see TaintTracker.SetGranularity), HeapShadowState tracks the taint of a heap object
+   as one unit, or one unit per field range of fieldBytes bytes; registers and the memory outside heap
+   objects keep byte granularity. Units follow the rules of GranularShadowState, so the result is a sound
+   over-approximation of byte tracking. When an allocation changes the units of a memory range, the taint
+   of the old units is spread over their bytes and merged into the new units(see Detach/Attach).
+ */
+'''
+import bisect
+import logging
+from ShadowState import ShadowState, GranularShadowState, GRANULARITY_HEAP, PAGE_SHIFT
+from x86ISA import X86ISA
+
+log = logging.getLogger('TREE')
+
+HEAP_ALLOC = 0
+HEAP_REALLOC = 1
+HEAP_FREE = 2
+
+MAX_RETURN_WAIT = 16 #records of the thread after the return in which eax is looked for
+DEFAULT_FIELD_BYTES = 16 #heap field range tracked as one unit when fields are tracked
+
+class HeapFunction(object):
+    def __init__(self, module, name, kind, sizeArgs=(), pointerArg=None):
+        self.module = module #None matches the export in any module
+        if (module is not None):
+            self.module = module.lower()
+        self.name = name
+        self.kind = kind
+        self.sizeArgs = sizeArgs #the size is the product of these arguments
+        self.pointerArg = pointerArg #argument holding the object freed or reallocated
+
+    def __str__(self):
+        if (self.module is None):
+            return self.name
+        return "%s!%s" %(self.module, self.name)
+
+DEFAULT_HEAP_FUNCTIONS = [
+    HeapFunction(None, "malloc", HEAP_ALLOC, (0,)),
+    HeapFunction(None, "calloc", HEAP_ALLOC, (0, 1)),
+    HeapFunction(None, "realloc", HEAP_REALLOC, (1,), 0),
+    HeapFunction(None, "free", HEAP_FREE, (), 0),
+    HeapFunction(None, "HeapAlloc", HEAP_ALLOC, (2,)),
+    HeapFunction(None, "HeapReAlloc", HEAP_REALLOC, (3,), 2),
+    HeapFunction(None, "HeapFree", HEAP_FREE, (), 2),
+    HeapFunction(None, "RtlAllocateHeap", HEAP_ALLOC, (2,)),
+    HeapFunction(None, "RtlReAllocateHeap", HEAP_REALLOC, (3,), 2),
+    HeapFunction(None, "RtlFreeHeap", HEAP_FREE, (), 2),
+    HeapFunction(None, "??2@YAPAXI@Z", HEAP_ALLOC, (0,)), #operator new
+    HeapFunction(None, "??_U@YAPAXI@Z", HEAP_ALLOC, (0,)), #operator new[]
+    HeapFunction(None, "??3@YAXPAX@Z", HEAP_FREE, (), 0), #operator delete
+    HeapFunction(None, "??_V@YAXPAX@Z", HEAP_FREE, (), 0), #operator delete[]
+    HeapFunction(None, "_Znwj", HEAP_ALLOC, (0,)),
+    HeapFunction(None, "_Znaj", HEAP_ALLOC, (0,)),
+    HeapFunction(None, "_ZdlPv", HEAP_FREE, (), 0),
+    HeapFunction(None, "_ZdaPv", HEAP_FREE, (), 0),
+]
+
+class HeapObject(object):
+    def __init__(self, oid, base, size, function, allocSequence, tid):
+        self.oid = oid
+        self.base = base
+        self.end = base+size
+        self.function = function
+        self.allocSequence = allocSequence
+        self.tid = tid
+        self.freeSequence = None
+
+    def __str__(self):
+        sFree = ""
+        if (self.freeSequence is not None):
+            sFree = ", freed at seq 0x%x" %(self.freeSequence)
+        return "heap#%d(%d bytes at 0x%x from %s at seq 0x%x%s)" %(self.oid, self.end-self.base, self.base, self.function, self.allocSequence, sFree)
+
+class HeapIndex(object):
+    '''
+    Non-overlapping heap objects sorted by base address
+    '''
+    def __init__(self):
+        self.bases = []
+        self.objects = {} #base -> HeapObject
+
+    def __len__(self):
+        return len(self.bases)
+
+    def Find(self, address):
+        i = bisect.bisect_right(self.bases, address)-1
+        if (i <0):
+            return None
+        obj = self.objects[self.bases[i]]
+        if (address < obj.end):
+            return obj
+        return None
+
+    def getOverlapping(self, base, end):
+        overlapping = []
+        i = bisect.bisect_left(self.bases, end)-1
+        while (i >=0):
+            obj = self.objects[self.bases[i]]
+            if (obj.end <= base):
+                break
+            overlapping.append(obj)
+            i = i-1
+        return overlapping
+
+    def Insert(self, obj):
+        for old in self.getOverlapping(obj.base, obj.end):
+            self.Remove(old)
+        bisect.insort(self.bases, obj.base)
+        self.objects[obj.base] = obj
+
+    def Remove(self, obj):
+        i = bisect.bisect_left(self.bases, obj.base)
+        del self.bases[i]
+        del self.objects[obj.base]
+
+class HeapShadowState(GranularShadowState):
+    def __init__(self, heap, targetBits, fieldBytes=0):
+        GranularShadowState.__init__(self, GRANULARITY_HEAP, targetBits)
+        self.heap = heap
+        self.fieldBytes = fieldBytes #0 tracks every heap object as one unit
+
+    def getUnit(self, key):
+        unit = self.units.get(key)
+        if (unit is not None):
+            return unit
+        if isinstance(key, (int, long)):
+            obj = self.heap.Find(key)
+            if (obj is None):
+                return key, 0
+            unit = obj.base
+            if (self.fieldBytes >0):
+                unit = key - (key-obj.base) % self.fieldBytes
+            return unit, key-unit
+        unit = (key, None) #registers keep byte granularity
+        self.units[key] = unit
+        return unit
+
+    def getWidth(self, unit):
+        if isinstance(unit, (int, long)):
+            obj = self.heap.Find(unit)
+            if (obj is None):
+                return 1
+            if (self.fieldBytes >0):
+                return min(self.fieldBytes, obj.end-unit)
+            return obj.end-unit
+        return 1
+
+    def isMemoryTainted(self, address, size):
+        unit, index = self.getUnit(address)
+        if (dict.__contains__(self, unit)):
+            return True
+        bPageTainted = False
+        for page in xrange(address >> PAGE_SHIFT, ((address+size-1) >> PAGE_SHIFT)+1):
+            if (page in self.pageCounts):
+                bPageTainted = True
+                break
+        if (not bPageTainted):
+            return False
+        end = address+size
+        address = unit+self.getWidth(unit)
+        while (address < end):
+            if (dict.__contains__(self, address)):
+                return True
+            address = address+self.getWidth(self.getUnit(address)[0])
+        return False
+
+    def Detach(self, start, end):
+        '''
+        Removes the units overlapping [start, end) before their heap objects change, see Attach
+        '''
+        self.EndUpdate()
+        moved = []
+        unit, index = self.getUnit(start)
+        if (unit < start and dict.__contains__(self, unit)):
+            moved.append((unit, self.getWidth(unit), dict.__getitem__(self, unit)))
+            ShadowState.__delitem__(self, unit)
+        for page in xrange(start >> PAGE_SHIFT, ((end-1) >> PAGE_SHIFT)+1):
+            if (page not in self.pageCounts):
+                continue
+            for address in xrange(max(start, page << PAGE_SHIFT), min(end, (page+1) << PAGE_SHIFT)):
+                if (dict.__contains__(self, address)):
+                    moved.append((address, self.getWidth(address), dict.__getitem__(self, address)))
+                    ShadowState.__delitem__(self, address)
+        return moved
+
+    def Attach(self, moved):
+        '''
+        Taints every byte of the detached units again, with the units of the current heap objects
+        '''
+        self.BeginUpdate()
+        for unit, width, taint in moved:
+            for address in xrange(unit, unit+width):
+                self[address] = taint
+        self.EndUpdate()
+
+    def getStatistics(self):
+        nUnits = len(self)-self.nRegisters
+        sUnits = "heap objects"
+        if (self.fieldBytes >0):
+            sUnits = "%d-byte heap fields" %(self.fieldBytes)
+        return "Granularity: %s, %d tainted memory units, %d tainted register bytes, %d merged writes, %d partial writes in %d updates\n" %(sUnits, nUnits, self.nRegisters, self.nMerged, self.nKept, self.nUpdates)
+
+class HeapCall(object):
+    def __init__(self, function, entryEsp, tid, sequence):
+        self.function = function
+        self.entryEsp = entryEsp #address of the return address pushed by the call
+        self.tid = tid
+        self.sequence = sequence
+        self.values = {} #address -> byte value read by the routine
+
+class HeapTracker(object):
+    def __init__(self, TP):
+        self.taintTracker = TP
+        self.bEnabled = False
+        self.registry = {} #(module, export name) -> HeapFunction
+        self.functions = {} #resolved function address -> HeapFunction
+        self.index = HeapIndex()
+        self.objects = [] #every allocated object, in allocation order
+        self.callSites = {} #tid -> entry esp of the last call
+        self.active = {} #tid -> HeapCall up to its return
+        self.returns = {} #tid -> (HeapCall, number of records seen since its return)
+        self.nFreed = 0
+        self.nBytes = 0
+        self.nUnresolved = 0
+        for function in DEFAULT_HEAP_FUNCTIONS:
+            self.AddFunction(function)
+
+    def AddFunction(self, function):
+        self.registry[(function.module, function.name)] = function
+
+    def LoadImage(self, LRecord):
+        '''
+        Resolves the allocation and free exports of a loaded image, see LibrarySummarizer.LoadImage
+        '''
+        TLS = self.taintTracker.TLS
+        module = TLS.GetModuleName(LRecord)
+        if (module is None):
+            return 0
+        exports = TLS.GetImageExports(LRecord.ImagePath)
+        exports.update(TLS.exports.get(module, {}))
+        nResolved = 0
+        for name, rva in exports.iteritems():
+            function = self.registry.get((module, name))
+            if (function is None):
+                function = self.registry.get((None, name))
+            if (function is not None):
+                self.functions[LRecord.LoadAddress + rva] = function
+                nResolved = nResolved+1
+                sDbg = "HeapTracker: %s!%s at 0x%x" %(module, name, LRecord.LoadAddress + rva)
+                log.debug(sDbg)
+        return nResolved
+
+    def Observe(self, instRec):
+        TP = self.taintTracker
+        tid = instRec.currentThreadId
+        if (tid in self.returns):
+            call, nSeen = self.returns.pop(tid)
+            if ("eax" in instRec.reg_value):
+                self.Complete(call, instRec.reg_value["eax"])
+            elif (nSeen+1 < MAX_RETURN_WAIT):
+                self.returns[tid] = (call, nSeen+1)
+            else:
+                self.nUnresolved = self.nUnresolved+1
+
+        call = self.active.get(tid)
+        if (call is not None):
+            if (instRec.currentReadAddr is not None):
+                for offset, value in instRec.currentReadValue.iteritems():
+                    if (instRec.currentReadAddr+offset not in call.values):
+                        call.values[instRec.currentReadAddr+offset] = value
+                instInfo = TP.DecodeInstruction(instRec)
+                if (instInfo.inst_category in TP.taint_category_ret and instRec.currentReadAddr == call.entryEsp):
+                    del self.active[tid]
+                    if (call.function.kind == HEAP_FREE):
+                        self.Complete(call, None)
+                    else:
+                        self.returns[tid] = (call, 0)
+            return
+
+        instInfo = TP.DecodeInstruction(instRec)
+        if (tid in self.callSites):
+            if (instInfo.inst_category == X86ISA.X86_UNCOND_BR): #import thunk
+                return
+            entryEsp = self.callSites.pop(tid)
+            function = self.functions.get(instRec.currentInstruction)
+            if (function is not None):
+                self.active[tid] = HeapCall(function, entryEsp, tid, instRec.currentInstSeq)
+                self.Observe(instRec)
+                return
+        if (instInfo.inst_category in TP.taint_category_call and instRec.currentWriteAddr is not None):
+            self.callSites[tid] = instRec.currentWriteAddr
+
+    def GetArg(self, call, index):
+        address = call.entryEsp + 4 + 4*index
+        arg = 0
+        for i in range(4):
+            if (address+i not in call.values):
+                return None
+            arg = arg | (call.values[address+i] << (8*i))
+        return arg
+
+    def Complete(self, call, result):
+        function = call.function
+        size = 1
+        for index in function.sizeArgs:
+            arg = self.GetArg(call, index)
+            if (arg is None):
+                size = None
+                break
+            size = size*arg
+        pointer = None
+        if (function.pointerArg is not None):
+            pointer = self.GetArg(call, function.pointerArg)
+            if (pointer is None):
+                self.nUnresolved = self.nUnresolved+1
+                return
+        if (pointer):
+            self.Free(pointer, call.sequence)
+        if (function.kind == HEAP_FREE):
+            return
+        if (size is None):
+            self.nUnresolved = self.nUnresolved+1
+            return
+        if (result and size >0):
+            self.Allocate(result, size, function, call.sequence, call.tid)
+
+    def Allocate(self, base, size, function, sequence, tid):
+        TP = self.taintTracker
+        obj = HeapObject(len(self.objects), base, size, function, sequence, tid)
+        self.objects.append(obj)
+        self.nBytes = self.nBytes+size
+        sDbg = "HeapTracker: allocated %s" %(obj)
+        log.debug(sDbg)
+        if (TP.granularity != GRANULARITY_HEAP):
+            self.index.Insert(obj)
+            return obj
+        start = base
+        end = obj.end
+        for old in self.index.getOverlapping(base, obj.end):
+            start = min(start, old.base)
+            end = max(end, old.end)
+        moved = TP.dynamic_taint.Detach(start, end)
+        self.index.Insert(obj)
+        TP.dynamic_taint.Attach(moved)
+        return obj
+
+    def Free(self, base, sequence):
+        obj = self.index.objects.get(base)
+        if (obj is None or obj.freeSequence is not None):
+            return None
+        obj.freeSequence = sequence
+        self.nFreed = self.nFreed+1
+        return obj
+
+    def FindObject(self, address):
+        '''
+        The heap object holding address, or the last one that did when its memory was reused
+        '''
+        obj = self.index.Find(address)
+        if (obj is not None):
+            return obj
+        for obj in reversed(self.objects):
+            if (obj.base <= address < obj.end):
+                return obj
+        return None
+
+    def GetObjects(self, taint):
+        '''
+        The heap objects the provenance of taint went through
+        '''
+        objects = {} #oid -> HeapObject
+        stack = [taint]
+        visited = set()
+        while len(stack)!=0:
+            t = stack.pop()
+            if (t.tuid in visited):
+                continue
+            visited.add(t.tuid)
+            if isinstance(t.taintAddress, (int, long)):
+                obj = self.FindObject(t.taintAddress)
+                if (obj is not None):
+                    objects[obj.oid] = obj
+            for sources in t.getSources():
+                stack.extend(sources)
+        return [objects[oid] for oid in sorted(objects)]
+
+    def getState(self):
+        '''
+        The tracking state saved with a checkpoint(see Checkpointer), the registry is configuration
+        '''
+        return (self.functions, self.index.bases, self.index.objects, self.objects, self.callSites, self.active,
+                self.returns, self.nFreed, self.nBytes, self.nUnresolved)
+
+    def setState(self, state):
+        #the index is shared with HeapShadowState, it is updated in place
+        (self.functions, self.index.bases, self.index.objects, self.objects, self.callSites, self.active,
+         self.returns, self.nFreed, self.nBytes, self.nUnresolved) = state
+
+    def getStatistics(self):
+        if (not self.bEnabled):
+            return "Heap objects: disabled\n"
+        return "Heap objects: %d allocated(%d bytes), %d freed, %d in the index, %d calls unresolved\n" %(len(self.objects), self.nBytes, self.nFreed, len(self.index), self.nUnresolved)
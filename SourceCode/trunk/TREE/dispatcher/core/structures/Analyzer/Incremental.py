@@ -0,0 +1,183 @@
+'''
+   This is the incremental re-analysis driver for TREE taint tracking.
+
+   Every checkpoint records the taint source assignment applied so far(TaintTracker.sources: one entry per
+   input record, full or partial, and one per interactive taint source). When the analyst narrows the taint
+   sources(TaintTracker.inputFilter, applied by TaintMarker.SetInputTaint) and runs again, the analysis
+   resumes from the latest checkpoint of the previous run whose source assignment is unchanged under the new
+   one, so only the part of the trace after the first difference is propagated again.
+
+   At every later checkpoint of the previous run the new shadow state is compared with the saved one: when
+   every tracker has the same tainted locations, each holding a taint of the same type, creator sequence and
+   input byte labels, and the same path conditions and reported sinks, the rest of the propagation cannot
+   differ and the previous run's final state is adopted instead of propagating to the end of the trace. The
+   sinks of a restored or adopted state that this run has not reported are reported again from it, so the
+   output and the taint graph are complete. Convergence is only detected with input byte labels enabled;
+   the provenance created after the convergence point is the previous run's.
+ */
+'''
+import logging
+
+log = logging.getLogger('TREE')
+
+class IncrementalAnalyzer(object):
+    def __init__(self, TP):
+        self.taintTracker = TP
+        self.checkpointer = TP.TCK
+        self.previous = {} #sequence -> path of the previous run's checkpoints after the resume point
+        self.final = None #(sequence, path, source assignment) of the previous run's final checkpoint
+        self.resumeSequence = None
+        self.convergedSequence = None
+        self.nCompared = 0
+
+    def getExpected(self, source):
+        '''
+        The entry the current source assignment produces for an input record of the previous run
+        '''
+        if (source[0] != "in"):
+            return source
+        kind, sequence, address, inputSize, offset, size = source
+        if (sequence in self.taintTracker.inputFilter):
+            offset, size = self.taintTracker.inputFilter[sequence]
+        else:
+            offset, size = 0, inputSize
+        return (kind, sequence, address, inputSize, offset, size)
+
+    def isCompatible(self, sources, bInteractive=True):
+        if (bInteractive):
+            interactive = [source for source in self.taintTracker.sources if source[0]=="interactive"]
+            if ([source for source in sources if source[0]=="interactive"] != interactive):
+                return False
+        for source in sources:
+            if (self.getExpected(source) != source):
+                return False
+        return True
+
+    def getSources(self, state):
+        return state["trackers"][self.taintTracker.taint_policy][5]
+
+    def Resume(self, TR):
+        '''
+        Restores the latest checkpoint whose source assignment is unchanged and positions TR after it.
+        Returns the checkpoint sequence, or None when the trace has to be propagated from the start.
+        '''
+        checkpoints = self.checkpointer.getCheckpoints()
+        resumePath = None
+        bCompatible = True
+        for sequence, path in checkpoints:
+            state = self.checkpointer.ReadState(path)
+            if (self.taintTracker.taint_policy not in state["trackers"]):
+                bCompatible = False
+            if (bCompatible and self.isCompatible(self.getSources(state))):
+                resumePath = path
+                self.resumeSequence = sequence
+            else:
+                bCompatible = False
+            if (state["bFinal"] and self.taintTracker.taint_policy in state["trackers"]):
+                self.final = (sequence, path, self.getSources(state))
+        for sequence, path in checkpoints:
+            if (self.resumeSequence is None or sequence > self.resumeSequence):
+                if (self.final is None or path != self.final[1]):
+                    self.previous[sequence] = path
+                    self.checkpointer.AddSequence(sequence)
+        if (resumePath is None):
+            return None
+        sequence, position = self.checkpointer.Load(resumePath)
+        for TP in self.checkpointer.getTrackers():
+            if (TP.inputLabels is not None):
+                TP.inputLabels.influence = {}
+            self.ReportSinks(TP, set())
+        TR.seek(position)
+        sDbg = "Incremental: resumed at seq 0x%x, %d checkpoints left to compare" %(self.resumeSequence, len(self.previous))
+        log.debug(sDbg)
+        return self.resumeSequence
+
+    def getSignature(self, taint):
+        return (taint.taintType, taint.creatorSequence, taint.inputLabels)
+
+    def IsConverged(self, state):
+        records = {}
+        for record in state["taints"]:
+            records[record[0]] = (record[2], record[4], record[10])
+        for TP in self.checkpointer.getTrackers():
+            if (TP.inputLabels is None or TP.taint_policy not in state["trackers"]):
+                return False
+            dynamic, pcs, sinks = state["trackers"][TP.taint_policy][:3]
+            if (len(dynamic) != len(TP.dynamic_taint) or len(pcs) != len(TP.pcs) or len(sinks) != len(TP.TC.sinkTaints)):
+                return False
+            signatures = [records[tuid] for tuid in sinks]
+            signatures.sort()
+            current = [self.getSignature(taint) for taint in TP.TC.sinkTaints.itervalues()]
+            current.sort()
+            if (signatures != current):
+                return False
+            for key, tuid in dynamic:
+                taint = TP.dynamic_taint.get(key)
+                if (taint is None or self.getSignature(taint) != records[tuid]):
+                    return False
+            for taint, tuid in zip(TP.pcs, pcs):
+                if (self.getSignature(taint) != records[tuid]):
+                    return False
+        return True
+
+    def Tick(self, instRec, TR):
+        '''
+        Called by the driver in place of Checkpointer.Tick. Returns True when the analysis converged with the
+        previous run: the final state has been adopted and TR positioned on the last instruction record.
+        '''
+        sequence = instRec.currentInstSeq
+        path = self.previous.pop(sequence, None)
+        if (path is not None and self.final is not None):
+            self.nCompared = self.nCompared+1
+            for TP in self.checkpointer.getTrackers():
+                TP.FlushPending()
+            future = self.final[2][len(self.taintTracker.sources):]
+            if (self.isCompatible(future, False)):
+                state = self.checkpointer.ReadState(path)
+                if (self.IsConverged(state)):
+                    self.checkpointer.Tick(instRec, TR)
+                    self.Adopt(sequence, future, TR, state)
+                    return True
+        self.checkpointer.Tick(instRec, TR)
+        return False
+
+    def Adopt(self, sequence, future, TR, state):
+        '''
+        Adopts the previous run's final state, state being its checkpoint at the convergence point
+        '''
+        sources = list(self.taintTracker.sources)
+        influences = {}
+        for TP in self.checkpointer.getTrackers():
+            influences[TP.taint_policy] = TP.inputLabels.influence
+        finalSequence, finalPath, finalSources = self.final
+        finalSequence, position = self.checkpointer.Load(finalPath)
+        for TP in self.checkpointer.getTrackers():
+            TP.sources = sources + list(future)
+            #the influence counts of this run, the sinks reported after the convergence point are added back
+            TP.inputLabels.influence = influences[TP.taint_policy]
+            self.ReportSinks(TP, set(state["trackers"][TP.taint_policy][2]))
+        self.checkpointer.Save(finalSequence, position, True)
+        for path in self.previous.values():
+            self.checkpointer.Remove(path) #saved under the old source assignment
+        self.previous = {}
+        TR.seek(position)
+        self.convergedSequence = sequence
+        sDbg = "Incremental: converged at seq 0x%x, adopted the final state at seq 0x%x" %(sequence, finalSequence)
+        log.debug(sDbg)
+
+    def ReportSinks(self, TP, reported):
+        '''
+        Reports the restored sinks of TP whose tuid is not in reported, in the order they were created
+        '''
+        for tuid in sorted(TP.TC.sinkTaints.keys()):
+            if (tuid not in reported):
+                TP.TC.DumpSinkTaint(TP.TC.sinkTaints[tuid])
+
+    def getStatistics(self):
+        sResume = "from the start"
+        if (self.resumeSequence is not None):
+            sResume = "from seq 0x%x" %(self.resumeSequence)
+        sConverged = "no convergence"
+        if (self.convergedSequence is not None):
+            sConverged = "converged at seq 0x%x" %(self.convergedSequence)
+        return "Incremental re-analysis: resumed %s, %d checkpoints compared, %s\n" %(sResume, self.nCompared, sConverged)
@@ -0,0 +1,116 @@
+'''
+   This is the input-byte label registry for TREE taint tracking.
+
+   When input labelling is enabled every input byte gets a label. Each input record(I line) and each
+   interactive taint source is registered as its own input source, so several input sources are tracked
+   simultaneously in one pass, and a label is the offset of the byte in its source. Every taint carries the
+   union of the labels of the input bytes it was derived from(Taint.inputLabels), which answers "which input
+   bytes influence this location?" directly from the taint without walking the provenance DAG.
+
+   A label set is a sorted tuple of (sourceId, first, last) runs of contiguous input bytes, () being the empty
+   set: its size depends on the number of runs, not on the size or the number of the input records.
+ */
+'''
+import logging
+
+log = logging.getLogger('TREE')
+
+def unionLabels(labels, other):
+    '''
+    The union of two label sets
+    '''
+    if (len(other) ==0 or labels == other):
+        return labels
+    if (len(labels) ==0):
+        return other
+    runs = []
+    for sourceId, first, last in sorted(labels + other):
+        if (len(runs)>0 and runs[-1][0] == sourceId and first <= runs[-1][2]+1):
+            if (last > runs[-1][2]):
+                runs[-1] = (sourceId, runs[-1][1], last)
+        else:
+            runs.append((sourceId, first, last))
+    return tuple(runs)
+
+class InputSource(object):
+    def __init__(self, sourceId, address, size, inputFunction, inputHandle=None, sequence=0):
+        self.sourceId = sourceId
+        self.address = address #register name of an interactive register source
+        self.size = size
+        self.inputFunction = inputFunction
+        self.inputHandle = inputHandle
+        self.sequence = sequence
+
+    def __str__(self):
+        return "in%d(%s)" %(self.sourceId, self.inputFunction)
+
+class InputLabels(object):
+    def __init__(self):
+        self.sources = []
+        self.nLabels = 0
+        self.influence = {} #(sourceId, offset) -> number of reported sinks the input byte influences
+
+    def registerInput(self, INRecord):
+        '''
+        Registers the input record as a new input source, one label per input byte
+        '''
+        return self.registerSource(INRecord.currentInputAddr, INRecord.currentInputSize, INRecord.inputFunction,
+                                   INRecord.inputHandle, INRecord.sequence)
+
+    def registerSource(self, address, size, inputFunction, inputHandle=None, sequence=0):
+        source = InputSource(len(self.sources), address, size, inputFunction, inputHandle, sequence)
+        self.sources.append(source)
+        self.nLabels = self.nLabels + size
+        sDbg = "InputLabels: %s at %s owns %d labels" %(source, str(address), size)
+        log.debug(sDbg)
+        return source
+
+    def getLabel(self, source, offset):
+        return ((source.sourceId, offset, offset),)
+
+    def getInputBytes(self, labels):
+        '''
+        Returns the influencing input bytes as a list of (InputSource, offset)
+        '''
+        inputBytes = []
+        for sourceId, first, last in labels:
+            for offset in xrange(first, last+1):
+                inputBytes.append((self.sources[sourceId], offset))
+        return inputBytes
+
+    def describe(self, labels):
+        '''
+        Run-length description of a label set, e.g. "in0(recv):0x0-0x3,0x8 in1(recv):0x10"
+        '''
+        parts = []
+        sRuns = []
+        for i in range(len(labels)):
+            sourceId, first, last = labels[i]
+            if (first == last):
+                sRuns.append("0x%x" %first)
+            else:
+                sRuns.append("0x%x-0x%x" %(first, last))
+            if (i == len(labels)-1 or labels[i+1][0] != sourceId):
+                parts.append("%s:%s" %(self.sources[sourceId], ",".join(sRuns)))
+                sRuns = []
+        return " ".join(parts)
+
+    def countInfluence(self, labels):
+        for sourceId, first, last in labels:
+            for offset in xrange(first, last+1):
+                key = (sourceId, offset)
+                self.influence[key] = self.influence.get(key, 0)+1
+
+    def getInfluence(self, source, offset):
+        return self.influence.get((source.sourceId, offset), 0)
+
+    def describeInfluence(self, source):
+        '''
+        Per-input-byte influence counts of one input source, e.g. "0x0:3 0x1:3 0x5:1"
+        '''
+        counts = []
+        for offset in range(source.size):
+            count = self.influence.get((source.sourceId, offset), 0)
+            if (count >0):
+                counts.append("0x%x:%d" %(offset, count))
+        return " ".join(counts)
@@ -0,0 +1,57 @@
+'''
+   This is the read/write slot summary of a static taint template for TREE taint tracking.
+
+   The slots of an instruction are the normalized registers and the memory widths its propagation handler
+   may read or write. They are computed once per template; the normalized register names depend on the
+   thread and are cached per thread id. The propagator uses them to skip instructions that cannot touch
+   live taint.
+ */
+'''
+import logging
+from x86Decoder import REGISTER, MEMORY
+
+log = logging.getLogger('TREE')
+
+class InstSlots(object):
+    def __init__(self, instInfo, bSkippable, bEFlags=False):
+        self.bSkippable = bSkippable
+        self.bEFlags = bEFlags #handler may read or write the eflags of the thread
+        self.srcRegs = [] #(register, width in bytes)
+        self.destRegs = []
+        self.srcMemWidth = 0
+        self.destMemWidth = 0
+        self.memWidth = 0 #widest operand, bounds every memory byte the handler may touch
+        self.regNames = {} #tid -> (source names, destination names)
+
+        for i in range(instInfo.n_src_operand):
+            operand = instInfo.src_operands[i]
+            self.memWidth = max(self.memWidth, int(operand._width_bits/8))
+            if (operand._type == REGISTER):
+                self.srcRegs.append((str(operand._ea).strip("b'"), operand._width_bits/8))
+            elif (operand._type == MEMORY):
+                self.srcMemWidth = max(self.srcMemWidth, int(operand._width_bits/8))
+        for i in range(instInfo.n_dest_operand):
+            operand = instInfo.dest_operands[i]
+            self.memWidth = max(self.memWidth, int(operand._width_bits/8))
+            if (operand._type == REGISTER):
+                self.destRegs.append((str(operand._ea).strip("b'"), operand._width_bits/8))
+            elif (operand._type == MEMORY):
+                self.destMemWidth = max(self.destMemWidth, int(operand._width_bits/8))
+
+        for reg, width in self.srcRegs + self.destRegs:
+            if (reg.lower().startswith('eflags')):
+                self.bEFlags = True
+
+    def getRegisterNames(self, x86ISA, tid):
+        if (tid not in self.regNames):
+            srcNames = []
+            for reg, width in self.srcRegs:
+                srcNames.extend(x86ISA.getNormalizedX86RegisterNames(reg, width, tid))
+            destNames = []
+            for reg, width in self.destRegs:
+                destNames.extend(x86ISA.getNormalizedX86RegisterNames(reg, width, tid))
+            if (self.bEFlags):
+                srcNames.append(x86ISA.getNormalizedX86EFlagName(tid))
+                destNames.append(x86ISA.getNormalizedX86EFlagName(tid))
+            self.regNames[tid] = (srcNames, destNames)
+        return self.regNames[tid]
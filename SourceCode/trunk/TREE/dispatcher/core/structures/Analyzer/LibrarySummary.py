@@ -0,0 +1,367 @@
+'''
+   This is the library function summary registry for TREE taint tracking.
+
+   Library routines(memcpy, strcpy, memset, strlen, recv internals...) account for a large share of the
+   propagation time of a trace. A FunctionSummary describes the taint effect of such a routine declaratively;
+   summaries are registered by module and export name and resolved to addresses from the image load(L)
+   records, either from the export table of the image(pefile) or from export RVAs added by hand.
+
+   When a thread enters a summarized function right after a call, its instructions are buffered up to the
+   matching return(the RET that reads the return address pushed by the call), the summary is applied to the
+   shadow state as it was at the call, and the RET itself is propagated normally. The buffered instructions
+   also provide the concrete argument values(stack reads) and the extent of the bytes the routine read or
+   wrote. When an argument cannot be recovered, or another thread runs in between, the buffered instructions
+   are propagated one by one instead.
+
+   In verification mode the per-instruction path is always taken and its result is compared against what
+   the summary predicts.
+
+   Effects, arguments are indexed from 0(cdecl/stdcall stack arguments of a 32-bit target):
+     ("copy", dst, src, length)  dst[0:n] <- src[0:n]
+     ("fill", dst, value, length)  dst[0:n] <- taint of the value argument
+     ("ret", src, length)  return value <- union(src[0:n])
+     ("ret_arg", arg)  return value <- taint of the argument
+   The return value is cleared when no ret effect is given. A length is ("arg", index), LENGTH_WRITTEN or
+   LENGTH_READ(the contiguous bytes the routine wrote at dst or read at src) or a constant.
+ */
+'''
+import os
+import logging
+import Taint as TaintModule
+from Taint import Taint, REGISTER_TAINT, MEMORY_TAINT
+from x86ISA import X86ISA
+try:
+  import pefile
+  PEFile = True
+except:
+  PEFile = False
+  print "[debug] No pefile library support"
+  pass
+
+log = logging.getLogger('TREE')
+
+LENGTH_WRITTEN = "written"
+LENGTH_READ = "read"
+
+class FunctionSummary(object):
+    def __init__(self, module, name, effects):
+        self.module = module #None matches the export in any module
+        if (module is not None):
+            self.module = module.lower()
+        self.name = name
+        self.effects = effects
+
+    def __str__(self):
+        if (self.module is None):
+            return self.name
+        return "%s!%s" %(self.module, self.name)
+
+DEFAULT_SUMMARIES = [
+    FunctionSummary(None, "memcpy", [("copy", 0, 1, ("arg", 2)), ("ret_arg", 0)]),
+    FunctionSummary(None, "memmove", [("copy", 0, 1, ("arg", 2)), ("ret_arg", 0)]),
+    FunctionSummary(None, "strcpy", [("copy", 0, 1, LENGTH_WRITTEN), ("ret_arg", 0)]),
+    FunctionSummary(None, "strncpy", [("copy", 0, 1, LENGTH_WRITTEN), ("ret_arg", 0)]),
+    FunctionSummary(None, "memset", [("fill", 0, 1, ("arg", 2)), ("ret_arg", 0)]),
+    FunctionSummary(None, "strlen", [("ret", 0, LENGTH_READ)]),
+    FunctionSummary(None, "recv", []), #the received bytes are marked by the input(I) record
+]
+
+class LibraryCall(object):
+    def __init__(self, summary, entryEsp, tid):
+        self.summary = summary
+        self.entryEsp = entryEsp #address of the return address pushed by the call
+        self.tid = tid
+        self.records = []
+
+class LibrarySummarizer(object):
+    def __init__(self, TP):
+        self.taintTracker = TP
+        self.bEnabled = False
+        self.bVerify = False
+        self.registry = {} #(module, export name) -> FunctionSummary
+        self.exports = {} #module -> {export name: rva}, added by hand when the image is not available
+        self.functions = {} #resolved function address -> FunctionSummary
+        self.callSites = {} #tid -> entry esp of the last call
+        self.active = None
+        self.nCalls = 0
+        self.nInstructionsSkipped = 0
+        self.nReplayed = 0
+        self.nVerified = 0
+        self.nMismatches = 0
+        for summary in DEFAULT_SUMMARIES:
+            self.AddSummary(summary)
+
+    def AddSummary(self, summary):
+        self.registry[(summary.module, summary.name)] = summary
+
+    def AddExport(self, module, name, rva):
+        module = module.lower()
+        if (module not in self.exports):
+            self.exports[module] = {}
+        self.exports[module][name] = rva
+
+    def GetModuleName(self, LRecord):
+        if (LRecord.ImagePath is None):
+            return None
+        return os.path.basename(LRecord.ImagePath.replace("\\", "/")).lower()
+
+    def GetImageExports(self, path):
+        exports = {}
+        if (not PEFile or path is None or not os.path.exists(path)):
+            return exports
+        try:
+            pe = pefile.PE(path, fast_load=True)
+            pe.parse_data_directories(directories=[pefile.DIRECTORY_ENTRY['IMAGE_DIRECTORY_ENTRY_EXPORT']])
+            if hasattr(pe, "DIRECTORY_ENTRY_EXPORT"):
+                for symbol in pe.DIRECTORY_ENTRY_EXPORT.symbols:
+                    if (symbol.name is not None):
+                        exports[symbol.name] = symbol.address
+        except Exception as e:
+            sWarn = "LibrarySummarizer: failed to read the exports of %s: %s" %(path, e)
+            log.warning(sWarn)
+        return exports
+
+    def LoadImage(self, LRecord):
+        '''
+        Resolves the summarized exports of a loaded image to function addresses
+        '''
+        module = self.GetModuleName(LRecord)
+        if (module is None):
+            return 0
+        exports = self.GetImageExports(LRecord.ImagePath)
+        exports.update(self.exports.get(module, {}))
+        nResolved = 0
+        for name, rva in exports.iteritems():
+            summary = self.registry.get((module, name))
+            if (summary is None):
+                summary = self.registry.get((None, name))
+            if (summary is not None):
+                self.functions[LRecord.LoadAddress + rva] = summary
+                nResolved = nResolved+1
+                sDbg = "LibrarySummarizer: %s!%s at 0x%x" %(module, name, LRecord.LoadAddress + rva)
+                log.debug(sDbg)
+        return nResolved
+
+    def Intercept(self, instRec):
+        '''
+        Returns True when the record is consumed by a summarized call
+        '''
+        TP = self.taintTracker
+        tid = instRec.currentThreadId
+        if (self.active is not None):
+            if (tid != self.active.tid):
+                self.Flush()
+            else:
+                self.active.records.append(instRec)
+                if (self.IsMatchingRet(instRec)):
+                    self.Complete()
+                return True
+
+        instInfo = TP.DecodeInstruction(instRec)
+        if (tid in self.callSites):
+            if (instInfo.inst_category == X86ISA.X86_UNCOND_BR): #import thunk
+                return False
+            entryEsp = self.callSites.pop(tid)
+            summary = self.functions.get(instRec.currentInstruction)
+            if (summary is not None):
+                self.active = LibraryCall(summary, entryEsp, tid)
+                self.active.records.append(instRec)
+                return True
+        if (instInfo.inst_category in TP.taint_category_call and instRec.currentWriteAddr is not None):
+            self.callSites[tid] = instRec.currentWriteAddr
+        return False
+
+    def IsMatchingRet(self, instRec):
+        instInfo = self.taintTracker.DecodeInstruction(instRec)
+        return (instInfo.inst_category in self.taintTracker.taint_category_ret and instRec.currentReadAddr == self.active.entryEsp)
+
+    def Flush(self):
+        '''
+        Propagates the instructions of an unfinished summarized call one by one
+        '''
+        if (self.active is None):
+            return
+        call = self.active
+        self.active = None
+        self.Replay(call)
+
+    def Replay(self, call):
+        self.nReplayed = self.nReplayed+1
+        for instRec in call.records:
+            self.taintTracker.PropagateInstruction(instRec)
+
+    def Complete(self):
+        TP = self.taintTracker
+        call = self.active
+        self.active = None
+        plan = self.Plan(call)
+        if (plan is None):
+            sDbg = "LibrarySummarizer: cannot apply %s, replaying %d instructions" %(call.summary, len(call.records))
+            log.debug(sDbg)
+            self.Replay(call)
+            return
+        if (self.bVerify):
+            self.Verify(call, plan)
+            return
+
+        self.nCalls = self.nCalls+1
+        self.nInstructionsSkipped = self.nInstructionsSkipped+len(call.records)-1
+        for instRec in call.records[:-1]:
+            TP.TGC.Tick()
+        self.Apply(call, plan)
+        TP.PropagateInstruction(call.records[-1])
+
+    def GetMemoryValues(self, call):
+        values = {}
+        for instRec in call.records:
+            if (instRec.currentReadAddr is not None):
+                for offset, value in instRec.currentReadValue.iteritems():
+                    if (instRec.currentReadAddr+offset not in values):
+                        values[instRec.currentReadAddr+offset] = value
+        return values
+
+    def GetArgAddress(self, call, index):
+        return call.entryEsp + 4 + 4*index
+
+    def GetArg(self, call, values, index):
+        address = self.GetArgAddress(call, index)
+        arg = 0
+        for i in range(4):
+            if (address+i not in values):
+                return None
+            arg = arg | (values[address+i] << (8*i))
+        return arg
+
+    def GetExtent(self, start, accesses):
+        touched = set()
+        for address, size in accesses:
+            if (address is not None and size is not None):
+                for i in range(size):
+                    touched.add(address+i)
+        n = 0
+        while start+n in touched:
+            n = n+1
+        return n
+
+    def GetLength(self, call, values, length, address, bWrite):
+        if isinstance(length, tuple):
+            return self.GetArg(call, values, length[1])
+        elif (length == LENGTH_WRITTEN):
+            return self.GetExtent(address, [(r.currentWriteAddr, r.currentWriteSize) for r in call.records[:-1]])
+        elif (length == LENGTH_READ):
+            return self.GetExtent(address, [(r.currentReadAddr, r.currentReadSize) for r in call.records[:-1]])
+        return length
+
+    def Plan(self, call):
+        '''
+        Returns the summary effect as a list of (slot, taint type, source taints), None when it cannot be applied
+        '''
+        TP = self.taintTracker
+        dynamic_taint = TP.dynamic_taint
+        values = self.GetMemoryValues(call)
+        plan = []
+        bRet = False
+        for effect in call.summary.effects:
+            if (effect[0] == "copy" or effect[0] == "fill"):
+                dst = self.GetArg(call, values, effect[1])
+                if (dst is None):
+                    return None
+                n = self.GetLength(call, values, effect[3], dst, True)
+                if (n is None):
+                    return None
+                if (effect[0] == "copy"):
+                    src = self.GetArg(call, values, effect[2])
+                    if (src is None):
+                        return None
+                    sources = [dynamic_taint.get(src+i) for i in range(n)]
+                else:
+                    valueTaint = dynamic_taint.get(self.GetArgAddress(call, effect[2]))
+                    sources = [valueTaint]*n
+                for i in range(n):
+                    if (sources[i] is None):
+                        plan.append((dst+i, MEMORY_TAINT, []))
+                    else:
+                        plan.append((dst+i, MEMORY_TAINT, [sources[i]]))
+            elif (effect[0] == "ret"):
+                src = self.GetArg(call, values, effect[1])
+                if (src is None):
+                    return None
+                n = self.GetLength(call, values, effect[2], src, False)
+                sources = []
+                for i in range(n):
+                    if (src+i in dynamic_taint and dynamic_taint[src+i] not in sources):
+                        sources.append(dynamic_taint[src+i])
+                for name in TP.x86ISA.getNormalizedX86RegisterNames("eax", 4, call.tid):
+                    plan.append((name, REGISTER_TAINT, sources))
+                bRet = True
+            elif (effect[0] == "ret_arg"):
+                address = self.GetArgAddress(call, effect[1])
+                names = TP.x86ISA.getNormalizedX86RegisterNames("eax", 4, call.tid)
+                for i in range(len(names)):
+                    if (address+i in dynamic_taint):
+                        plan.append((names[i], REGISTER_TAINT, [dynamic_taint[address+i]]))
+                    else:
+                        plan.append((names[i], REGISTER_TAINT, []))
+                bRet = True
+        if (not bRet):
+            for name in TP.x86ISA.getNormalizedX86RegisterNames("eax", 4, call.tid):
+                plan.append((name, REGISTER_TAINT, []))
+        return plan
+
+    def Apply(self, call, plan):
+        dynamic_taint = self.taintTracker.dynamic_taint
+        retRec = call.records[-1]
+        instStr = str(call.summary)
+        for slot, taintType, sources in plan:
+            if (slot in dynamic_taint):
+                dynamic_taint[slot].terminateTaint(retRec.currentInstSeq, retRec.currentThreadId)
+                del dynamic_taint[slot]
+            if (len(sources) >0):
+                taint = Taint(taintType, slot, retRec.currentInstSeq, retRec.currentThreadId, instStr)
+                Taint.uid2Taint[taint.tuid]= taint
+                for src in sources:
+                    taint.addTaintDSources(src)
+                dynamic_taint[slot] = taint
+        sDbg = "LibrarySummarizer: applied %s(%d slots) instead of %d instructions" %(call.summary, len(plan), len(call.records)-1)
+        log.debug(sDbg)
+
+    def GetRoots(self, taint, firstTuid):
+        roots = set()
+        stack = [taint]
+        visited = set()
+        while len(stack)!=0:
+            t = stack.pop()
+            if (t.tuid in visited):
+                continue
+            visited.add(t.tuid)
+            if (t.tuid < firstTuid):
+                roots.add(t.tuid)
+                continue
+            stack.extend(t.dSources + t.cSources + t.bSources + t.aSources)
+        return roots
+
+    def Verify(self, call, plan):
+        '''
+        Propagates the call one instruction at a time and compares the result with the summary prediction
+        '''
+        dynamic_taint = self.taintTracker.dynamic_taint
+        firstTuid = TaintModule.tuid
+        self.Replay(call)
+        self.nReplayed = self.nReplayed-1
+        self.nVerified = self.nVerified+1
+        for slot, taintType, sources in plan:
+            expected = set([src.tuid for src in sources])
+            actual = set()
+            if (slot in dynamic_taint):
+                actual = self.GetRoots(dynamic_taint[slot], firstTuid)
+            if (expected != actual):
+                self.nMismatches = self.nMismatches+1
+                sWarn = "LibrarySummarizer: %s at seq 0x%x mismatch on %s: summary %s, instructions %s" %(call.summary, call.records[0].currentInstSeq, slot, sorted(expected), sorted(actual))
+                log.warning(sWarn)
+
+    def getStatistics(self):
+        if (not self.bEnabled):
+            return "Library summaries: disabled\n"
+        if (self.bVerify):
+            return "Library summaries: %d calls verified, %d mismatching slots, %d replayed\n" %(self.nVerified, self.nMismatches, self.nReplayed)
+        return "Library summaries: %d calls summarized(%d instructions skipped), %d replayed\n" %(self.nCalls, self.nInstructionsSkipped, self.nReplayed)
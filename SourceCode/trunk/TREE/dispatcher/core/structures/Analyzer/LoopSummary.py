@@ -0,0 +1,188 @@
+'''
+   This is the loop fast-forward for TREE taint tracking.
+
+   Decompression and parsing loops repeat the same instruction cycle a very large number of times. The
+   address stream of every thread is watched on the fly: when an instruction address comes back after at
+   most self.maxPeriod instructions and the last two periods of the stream are identical, the current
+   instruction is taken as the head of a loop whose body is the last period. The following records are
+   buffered one iteration at a time for as long as they follow the body; the first record that leaves it
+   ends the loop and the records buffered so far are propagated normally.
+
+   An iteration is summarized like a basic block(see BlockSummary): its slots are resolved from the
+   concrete registers and memory addresses of its records, and the entry pattern of the shadow state on
+   those slots and the alias signature of its memory accesses make up its key. An iteration whose key is
+   the key of the previous one starts from the same abstract taint state, i.e. the transfer of one
+   iteration is a fixed point for the current state, and the summary recorded from the previous iteration
+   is applied instead of propagating it; only the slot resolution(the address-dependent part) is
+   done per iteration. Any other iteration is propagated instruction by instruction and recorded.
+
+   Loop bodies may only contain instructions a block summary can express, plus unconditional branches
+   and, unless the policy records path conditions, conditional branches. Loops containing anything else
+   are not considered again.
+ */
+'''
+import time
+import logging
+
+log = logging.getLogger('TREE')
+
+DEFAULT_MAX_PERIOD = 256 #longest loop body detected, in instructions
+
+class Loop(object):
+    def __init__(self, body):
+        self.body = body #(tid, address) of every instruction of one iteration, starting with the head
+        self.key = None #key of the last recorded iteration
+        self.summary = None #summary of the last recorded iteration
+        self.nIterations = 0
+
+class LoopSummarizer(object):
+    def __init__(self, TP, maxPeriod=DEFAULT_MAX_PERIOD):
+        self.taintTracker = TP
+        self.bEnabled = False
+        self.maxPeriod = maxPeriod
+        self.history = [] #(tid, address) of the last executed instructions
+        self.nSeen = 0
+        self.lastSeen = {} #(tid, address) -> position in the address stream of its last execution
+        self.rejected = set() #(tid, address) of the bodies of loops that cannot be summarized
+        self.loop = None
+        self.iteration = []
+        self.nLoops = 0
+        self.nIterations = 0
+        self.nFastForwarded = 0
+        self.nInstructionsFastForwarded = 0
+        self.nInstructionsRecorded = 0
+        self.fastForwardTime = 0.0
+        self.recordTime = 0.0
+
+    def Propagate(self, instRec):
+        TP = self.taintTracker
+        period = self.Observe(instRec)
+        if (self.loop is not None):
+            if (self.Follow(instRec)):
+                return 0
+            self.Exit()
+        elif (period is not None):
+            TP.TBS.Flush()
+            self.loop = Loop(self.history[-period-1:-1])
+            self.nLoops = self.nLoops+1
+            sDbg = "LoopSummarizer: loop at 0x%x with a body of %d instructions" %(instRec.currentInstruction, period)
+            log.debug(sDbg)
+            if (self.Follow(instRec)):
+                return 0
+            self.Exit()
+        return TP.PropagateBlock(instRec)
+
+    def Observe(self, instRec):
+        '''
+        Adds instRec to the address stream, returns the loop period when instRec starts a new loop
+        '''
+        key = (instRec.currentThreadId, instRec.currentInstruction)
+        position = self.nSeen
+        self.nSeen = position+1
+        previous = self.lastSeen.get(key)
+        self.lastSeen[key] = position
+        self.history.append(key)
+        if (len(self.history) > 4*self.maxPeriod):
+            del self.history[:-2*self.maxPeriod-1]
+        if (self.loop is not None or previous is None or key in self.rejected):
+            return None
+        period = position-previous
+        if (period > self.maxPeriod or 2*period >= len(self.history)):
+            return None
+        end = len(self.history)-1
+        if (self.history[end-period:end] != self.history[end-2*period:end-period]):
+            return None
+        return period
+
+    def IsSummarizable(self, instRec):
+        TP = self.taintTracker
+        instInfo = TP.DecodeInstruction(instRec)
+        slots = TP.inst_slots.get(instRec.currentInstruction)
+        if (slots is None or not slots.bSkippable):
+            return False
+        return instInfo.inst_category in TP.taint_category_loop
+
+    def Follow(self, instRec):
+        '''
+        Buffers instRec when it continues the current iteration, summarizing the iteration once complete
+        '''
+        loop = self.loop
+        if ((instRec.currentThreadId, instRec.currentInstruction) != loop.body[len(self.iteration)]):
+            return False
+        if (not self.IsSummarizable(instRec)):
+            self.rejected.update(loop.body)
+            sDbg = "LoopSummarizer: loop at 0x%x cannot be summarized" %(loop.body[0][1])
+            log.debug(sDbg)
+            return False
+        self.iteration.append(instRec)
+        if (len(self.iteration) == len(loop.body)):
+            self.Iterate()
+        return True
+
+    def Iterate(self):
+        TP = self.taintTracker
+        TBS = TP.TBS
+        loop = self.loop
+        iteration = self.iteration
+        self.iteration = []
+        loop.nIterations = loop.nIterations+1
+        self.nIterations = self.nIterations+1
+        if (len(TP.dynamic_taint) ==0):
+            for instRec in iteration:
+                TP.PropagateInstruction(instRec)
+            return
+
+        start = time.time()
+        slotKeys, aliasSig = TBS.GetSlots(iteration)
+        entry = [TP.dynamic_taint.get(key) for key in slotKeys]
+        key = (aliasSig, TBS.GetEntryPattern(entry))
+        if (loop.summary is not None and key == loop.key):
+            TBS.Apply(loop.summary, iteration, slotKeys, entry)
+            self.nFastForwarded = self.nFastForwarded+1
+            self.nInstructionsFastForwarded = self.nInstructionsFastForwarded+len(iteration)
+            self.fastForwardTime = self.fastForwardTime+time.time()-start
+            return
+
+        summary = TBS.Record(iteration, slotKeys, entry)
+        loop.key = key
+        loop.summary = None
+        if (summary.bValid):
+            loop.summary = summary
+        self.nInstructionsRecorded = self.nInstructionsRecorded+len(iteration)
+        self.recordTime = self.recordTime+time.time()-start
+
+    def Exit(self):
+        '''
+        Ends the current loop, the records of its unfinished iteration are propagated normally
+        '''
+        TP = self.taintTracker
+        iteration = self.iteration
+        sDbg = "LoopSummarizer: left the loop at 0x%x after %d iterations" %(self.loop.body[0][1], self.loop.nIterations)
+        log.debug(sDbg)
+        self.loop = None
+        self.iteration = []
+        for instRec in iteration:
+            TP.PropagateBlock(instRec)
+
+    def Flush(self):
+        if (self.loop is not None):
+            self.Exit()
+
+    def getSpeedup(self):
+        '''
+        Propagation time per instruction of the recorded iterations over that of the fast-forwarded ones
+        '''
+        if (self.nInstructionsRecorded ==0 or self.nInstructionsFastForwarded ==0 or self.fastForwardTime <=0):
+            return None
+        recordRate = self.recordTime/self.nInstructionsRecorded
+        fastForwardRate = self.fastForwardTime/self.nInstructionsFastForwarded
+        return recordRate/fastForwardRate
+
+    def getStatistics(self):
+        if (not self.bEnabled):
+            return "Loop fast-forward: disabled\n"
+        sSpeedup = "no speedup measured"
+        speedup = self.getSpeedup()
+        if (speedup is not None):
+            sSpeedup = "%.1fx faster than propagating them" %(speedup)
+        return "Loop fast-forward: %d of %d iterations of %d loops fast-forwarded(%d instructions), %s\n" %(self.nFastForwarded, self.nIterations, self.nLoops, self.nInstructionsFastForwarded, sSpeedup)
@@ -0,0 +1,645 @@
+'''
+   This is the parallel segment propagation for TREE taint tracking.
+
+   The trace is split into segments of consecutive lines and every segment is summarized by a worker
+   process, without knowing the taint state at its entry. The final pass composes the summaries in trace
+   order with the real taint state.
+
+   A worker keeps a symbolic shadow state: every location holds a node of a provenance expression over
+   the locations at entry of the segment(ENTRY), the input records of the segment(INPUT), the taints
+   the instructions derive(NEW, a taint is only created when one of its sources is tainted) and the
+   choice among them(FIRST, the first alternative that is tainted). The transfer of an instruction is
+   obtained from the regular propagation handler: it is run on a scratch shadow state in which every slot
+   of the instruction(see InstSlots and BlockSummary) holds its own symbol, then again with the sources of
+   the alternative it chose untainted, and so on, which yields for every destination slot the ordered
+   alternatives the handler takes depending on which sources are tainted, and whether it keeps or clears
+   the destination when none is. A source may also be the taint the instruction just left in another
+   slot(the bytes of a sum depend on the lower ones), the entries of a template are ordered so that it is
+   computed first. The template is checked against two more runs of the handler and cached
+   per instruction address and slot layout.
+
+   Instructions a template cannot express(string, call, ret, lea and other non-skippable instructions,
+   or a handler whose runs disagree with its template) and the instructions at a sink address(see
+   SinkRegistry, the sinks are given to the workers, which resolve the function sinks of every image loaded
+   before their segments) split the segment: the final pass propagates them with the real engine
+   (TaintTracker.Propagator) between the summaries. Input records are replayed by the final pass in order, so
+   the taint sources, the input filter and the input byte labels are those of a sequential run.
+
+   The final pass evaluates, for every location written by a summary, the expression it holds with the
+   real state at entry, so the live taints and their provenance are the ones a sequential run creates
+   (taint uids differ, the terminator marks of overwritten provenance nodes are not reproduced). With
+   bCoarse, every taint created in a summary is built directly from the entry and input taints it depends
+   on, i.e. the provenance is coarsened to segment boundaries.
+
+   Only the data policy(TAINT_DATA) is summarized; the address, counter and branch policies depend on
+   operands that are not slots(address registers, path conditions) and run sequentially, and so does a
+   tracker at a coarser granularity than bytes or tracking heap objects(the final pass does not see the
+   instructions of the segments).
+ */
+'''
+import time
+import logging
+import cStringIO
+import multiprocessing
+import Taint as TaintModule
+from Taint import Taint, INITIAL_TAINT
+from TraceParser import IDBTraceReader, LoadImage, Input, Execution, eXception
+from TaintTracker import TaintTracker, TAINT_DATA
+from TaintMark import TaintMarker
+from ShadowState import ShadowState, GRANULARITY_BYTE
+
+log = logging.getLogger('TREE')
+
+DEFAULT_SEGMENTS_PER_WORKER = 4 #segments handed to every worker, for load balancing
+DEFAULT_MAX_NODES = 1000000 #nodes of a summary before its unreachable nodes are dropped
+
+NODE_ENTRY = 0 #(NODE_ENTRY, location)
+NODE_INPUT = 1 #(NODE_INPUT, input record line, location, node before the input)
+NODE_NEW = 2 #(NODE_NEW, taint type, location, sequence, tid, instruction, (a, b, c, d source nodes))
+NODE_FIRST = 3 #(NODE_FIRST, alternative nodes, fallback node)
+
+ALT_COPY = 0 #(ALT_COPY, reference): the destination receives the referenced taint
+ALT_NEW = 1 #(ALT_NEW, taint type, instruction, (a, b, c, d references)): a new taint derived from the tainted ones
+
+FALLBACK_KEEP = 0
+FALLBACK_CLEAR = 1
+
+class SegmentSummarizer(object):
+    '''
+    Runs in the worker processes, see SummarizeSegment
+    '''
+    def __init__(self, TP, maxNodes=DEFAULT_MAX_NODES):
+        self.taintTracker = TP
+        self.maxNodes = maxNodes
+        self.templates = {} #(address, tid, alias signature) -> transfer template, None when not expressible
+        self.categories = TP.taint_category_skippable - TP.taint_category_ret
+        self.images = [] #lines of the image load records, see ParallelPropagator.getImages
+        self.loaded = set() #lines of the image load records already resolved
+        self.BeginPart()
+
+    def BeginPart(self):
+        self.nodes = []
+        self.state = {} #location -> node, None when cleared
+        self.entryNodes = {} #location -> ENTRY node
+        self.inputs = [] #lines of the input records
+        self.nInstructions = 0
+
+    def AddNode(self, node):
+        self.nodes.append(node)
+        return len(self.nodes)-1
+
+    def getValue(self, location):
+        if (location in self.state):
+            return self.state[location]
+        node = self.entryNodes.get(location)
+        if (node is None):
+            node = self.AddNode((NODE_ENTRY, location))
+            self.entryNodes[location] = node
+        return node
+
+    def getChildren(self, node):
+        if (node[0] == NODE_INPUT):
+            return [node[3]]
+        if (node[0] == NODE_NEW):
+            return [n for group in node[6] for n in group]
+        if (node[0] == NODE_FIRST):
+            return list(node[1]) + [node[2]]
+        return []
+
+    def Compact(self):
+        '''
+        Drops the nodes no location depends on any more and renumbers the others
+        '''
+        marked = set()
+        stack = [n for n in self.state.values() if n is not None]
+        while stack:
+            n = stack.pop()
+            if (n is None or n in marked):
+                continue
+            marked.add(n)
+            stack.extend(self.getChildren(self.nodes[n]))
+        renumber = {None:None}
+        nodes = []
+        for n in sorted(marked):
+            renumber[n] = len(nodes)
+            node = self.nodes[n]
+            if (node[0] == NODE_INPUT):
+                node = node[:3] + (renumber[node[3]],)
+            elif (node[0] == NODE_NEW):
+                node = node[:6] + (tuple(tuple(renumber[s] for s in group) for group in node[6]),)
+            elif (node[0] == NODE_FIRST):
+                node = (NODE_FIRST, tuple(renumber[s] for s in node[1]), renumber[node[2]])
+            nodes.append(node)
+        self.nodes = nodes
+        for location in self.state:
+            self.state[location] = renumber[self.state[location]]
+        self.entryNodes = dict((location, renumber[n]) for location, n in self.entryNodes.iteritems() if n in marked)
+
+    def EndPart(self, parts):
+        if (self.nInstructions >0 or len(self.inputs) >0):
+            self.Compact()
+            parts.append(("summary", self.nodes, self.state.items(), self.inputs, self.nInstructions))
+        self.BeginPart()
+
+    def Probe(self, instRec, slotKeys, untainted):
+        '''
+        Runs the handler with every slot but the untainted ones holding its own symbol. Returns the result of
+        every slot and the creation order of the new taints(slot -> tuid), or (None, None) when the result is
+        not expressible. A result is None, (ALT_COPY, reference) or (ALT_NEW, type, instruction, references);
+        a reference s >= 0 is the symbol of slot s, -1-s the taint the instruction left in slot s.
+        '''
+        TP = self.taintTracker
+        state = ShadowState()
+        symbols = {}
+        symbolTaints = [] #keeps the symbols alive while their ids are compared
+        for s in range(len(slotKeys)):
+            if (s not in untainted):
+                taint = Taint(INITIAL_TAINT, slotKeys[s], -1, -1, "")
+                state[slotKeys[s]] = taint
+                symbols[id(taint)] = s
+                symbolTaints.append(taint)
+        firstTuid = TaintModule.tuid
+        saved = TP.dynamic_taint
+        TP.dynamic_taint = state
+        try:
+            TP.PropagateInstruction(instRec)
+        except Exception as e:
+            sDbg = "SegmentSummarizer: handler failed at seq 0x%x: %s" %(instRec.currentInstSeq, e)
+            log.debug(sDbg)
+            return None, None
+        finally:
+            TP.dynamic_taint = saved
+            for tuid in xrange(firstTuid, TaintModule.tuid):
+                Taint.uid2Taint.pop(tuid, None)
+        if (len(state) > len(slotKeys) or [key for key in state if key not in slotKeys]):
+            return None, None
+        created = {} #id of a new taint -> first slot holding it
+        for s in range(len(slotKeys)):
+            taint = state.get(slotKeys[s])
+            if (taint is not None and id(taint) not in symbols and id(taint) not in created):
+                created[id(taint)] = s
+        results = []
+        order = {}
+        for s in range(len(slotKeys)):
+            taint = state.get(slotKeys[s])
+            if (taint is None):
+                results.append(None)
+            elif (id(taint) in symbols):
+                results.append((ALT_COPY, symbols[id(taint)]))
+            elif (created[id(taint)] != s):
+                results.append((ALT_COPY, -1-created[id(taint)]))
+            else:
+                groups = []
+                for sources in (taint.aSources, taint.bSources, taint.cSources, taint.dSources):
+                    group = []
+                    for src in sources:
+                        if (id(src) in symbols):
+                            group.append(symbols[id(src)])
+                        elif (id(src) in created):
+                            group.append(-1-created[id(src)])
+                        else:
+                            return None, None #derived from a taint the instruction did not leave in a slot
+                    groups.append(tuple(group))
+                if (sum(len(group) for group in groups) ==0):
+                    return None, None
+                results.append((ALT_NEW, taint.taintType, taint.creatorInstAmenic, tuple(groups)))
+                order[s] = taint.tuid
+        return results, order
+
+    def getReferences(self, alternative):
+        if (alternative[0] == ALT_COPY):
+            return [alternative[1]]
+        return [r for group in alternative[3] for r in group]
+
+    def getAlternativeSlots(self, alternative, full):
+        '''
+        The slots to untaint so that the alternative is not tainted any more
+        '''
+        slots = set()
+        stack = self.getReferences(alternative)
+        while stack:
+            reference = stack.pop()
+            if (reference >= 0):
+                slots.add(reference)
+            elif (-1-reference not in slots):
+                slots.add(-1-reference)
+                if (full[-1-reference] is not None):
+                    stack.extend(self.getReferences(full[-1-reference]))
+        return slots
+
+    def Predict(self, template, nSlots, untainted):
+        '''
+        The results Probe returns for the given untainted slots if the template is right
+        '''
+        results = [(ALT_COPY, s) for s in range(nSlots)]
+        for s in untainted:
+            results[s] = None
+        def isTainted(reference):
+            if (reference >= 0):
+                return reference not in untainted
+            return results[-1-reference] is not None
+        for s, alternatives, fallback in template:
+            result = None
+            if (fallback == FALLBACK_KEEP and s not in untainted):
+                result = (ALT_COPY, s)
+            for alternative in alternatives:
+                if (alternative[0] == ALT_COPY):
+                    if (isTainted(alternative[1])):
+                        result = alternative
+                        break
+                else:
+                    groups = tuple(tuple(r for r in group if isTainted(r)) for group in alternative[3])
+                    if (sum(len(group) for group in groups) >0):
+                        result = alternative[:3] + (groups,)
+                        break
+            results[s] = result
+        return results
+
+    def BuildTemplate(self, instRec, slotKeys):
+        '''
+        Returns the (destination slot, alternatives, fallback) of every slot the instruction may change, in
+        the order the handler creates them
+        '''
+        nSlots = len(slotKeys)
+        full, order = self.Probe(instRec, slotKeys, set())
+        if (full is None):
+            return None
+        template = []
+        for s in range(nSlots):
+            result = full[s]
+            alternatives = []
+            untainted = set()
+            while (result is not None and result != (ALT_COPY, s)):
+                alternatives.append(result)
+                slots = self.getAlternativeSlots(result, full)
+                if (slots <= untainted):
+                    return None
+                untainted = untainted | slots
+                results, partialOrder = self.Probe(instRec, slotKeys, untainted)
+                if (results is None):
+                    return None
+                result = results[s]
+            if (len(alternatives) ==0 and result is not None):
+                continue #unchanged
+            fallback = FALLBACK_CLEAR
+            if (result is not None):
+                fallback = FALLBACK_KEEP
+            template.append((order.get(s, TaintModule.tuid), s, tuple(alternatives), fallback))
+        template.sort()
+        template = [entry[1:] for entry in template]
+        applied = set()
+        for s, alternatives, fallback in template:
+            for alternative in alternatives:
+                for reference in self.getReferences(alternative):
+                    if (reference <0 and -1-reference not in applied):
+                        return None
+            applied.add(s)
+        for parity in (0, 1):
+            untainted = set(s for s in range(nSlots) if s%2 == parity)
+            if (self.Probe(instRec, slotKeys, untainted)[0] != self.Predict(template, nSlots, untainted)):
+                return None
+        return template
+
+    def getTemplate(self, instRec):
+        '''
+        Returns (template, slot keys), template is None when the instruction has to be propagated for real
+        '''
+        TP = self.taintTracker
+        instInfo = TP.DecodeInstruction(instRec)
+        slots = TP.inst_slots.get(instRec.currentInstruction)
+        if (slots is None or not slots.bSkippable or instInfo.inst_category not in self.categories):
+            return None, None
+        slotKeys, aliasSig = TP.TBS.GetSlots([instRec])
+        key = (instRec.currentInstruction, instRec.currentThreadId, aliasSig)
+        if (key not in self.templates):
+            self.templates[key] = self.BuildTemplate(instRec, slotKeys)
+        return self.templates[key], slotKeys
+
+    def Apply(self, template, slotKeys, instRec):
+        values = [self.getValue(key) for key in slotKeys]
+        after = {} #slot -> node the instruction left in it
+        def resolve(reference):
+            if (reference >= 0):
+                return values[reference]
+            return after[-1-reference]
+        tid = instRec.currentThreadId
+        for s, alternatives, fallback in template:
+            nodes = []
+            for alternative in alternatives:
+                if (alternative[0] == ALT_COPY):
+                    node = resolve(alternative[1])
+                    if (node is not None):
+                        nodes.append(node)
+                else:
+                    groups = tuple(tuple(resolve(r) for r in group if resolve(r) is not None) for group in alternative[3])
+                    if (sum(len(group) for group in groups) >0):
+                        nodes.append(self.AddNode((NODE_NEW, alternative[1], slotKeys[s], instRec.currentInstSeq, tid, alternative[2], groups)))
+            value = None
+            if (fallback == FALLBACK_KEEP):
+                value = values[s]
+            if (len(nodes) ==1 and value is None):
+                value = nodes[0]
+            elif (len(nodes) >0):
+                value = self.AddNode((NODE_FIRST, tuple(nodes), value))
+            after[s] = value
+            self.state[slotKeys[s]] = value
+
+    def AddInput(self, INRecord, line):
+        for i in range(INRecord.currentInputSize):
+            address = INRecord.currentInputAddr+i
+            self.state[address] = self.AddNode((NODE_INPUT, line, address, self.getValue(address)))
+        self.inputs.append(line)
+
+    def Summarize(self, TR, start, end):
+        '''
+        Summarizes the records at lines [start, end) of the trace, returns the list of parts:
+        ("summary", nodes, writes, input lines, instructions), ("raw", line), ("load", line),
+        ("exception", line, exception line) and ("end",)
+        '''
+        parts = []
+        self.BeginPart()
+        #the function sinks of the images loaded before the segment, whichever worker summarized them
+        for line in self.images:
+            if (line >= start):
+                break
+            if (line not in self.loaded):
+                TR.seek(line)
+                self.taintTracker.LoadImage(TR.getNext())
+                self.loaded.add(line)
+        TR.seek(start)
+        tRecord = TR.getNext()
+        recordLine = TR.record_line
+        while (tRecord is not None and recordLine < end):
+            tNextRecord = TR.getNext()
+            nextLine = TR.record_line
+            recordType = tRecord.getRecordType()
+            if (recordType == LoadImage):
+                if (recordLine not in self.loaded):
+                    self.taintTracker.LoadImage(tRecord)
+                    self.loaded.add(recordLine)
+                self.EndPart(parts)
+                parts.append(("load", recordLine))
+            elif (recordType == Input):
+                self.AddInput(tRecord, recordLine)
+            elif (recordType == Execution):
+                if (tNextRecord is None):
+                    self.EndPart(parts)
+                    parts.append(("end",))
+                    return parts
+                if (tNextRecord.getRecordType() == eXception):
+                    self.EndPart(parts)
+                    parts.append(("exception", recordLine, nextLine))
+                    if (tNextRecord.currentExceptionCode !=0):
+                        return parts
+                else:
+                    template = None
+                    if (tRecord.currentInstruction not in self.taintTracker.TC.sinks.addresses):
+                        template, slotKeys = self.getTemplate(tRecord)
+                    if (template is None):
+                        self.EndPart(parts)
+                        parts.append(("raw", recordLine))
+                    else:
+                        self.Apply(template, slotKeys, tRecord)
+                        self.nInstructions = self.nInstructions+1
+                        if (len(self.nodes) > self.maxNodes):
+                            self.Compact()
+            tRecord = tNextRecord
+            recordLine = nextLine
+        self.EndPart(parts)
+        return parts
+
+worker = None
+
+def InitWorker(traceBuffer, config):
+    global worker
+    hostOS, processBits, targetBits, policy, traceType, sinkAddresses, sinkFunctions, exports, images = config
+    TP = TaintTracker(hostOS, processBits, targetBits, cStringIO.StringIO(), policy, traceType)
+    TP.TGC.interval = 0
+    TP.TC.sinks.addresses = dict([(address, list(sinks)) for address, sinks in sinkAddresses.iteritems()])
+    TP.TC.sinks.functions = dict(sinkFunctions)
+    TP.TLS.exports = exports #the exports added by hand, the function sinks are resolved with them
+    summarizer = SegmentSummarizer(TP)
+    summarizer.images = images
+    worker = (IDBTraceReader(traceBuffer), summarizer)
+
+def SummarizeSegment(segment):
+    TR, summarizer = worker
+    start, end = segment
+    return summarizer.Summarize(TR, start, end)
+
+class ParallelPropagator(object):
+    def __init__(self, TP, nWorkers=None, bCoarse=False):
+        self.taintTracker = TP
+        self.nWorkers = nWorkers #None uses every core, 0 summarizes in this process
+        if (nWorkers is None):
+            self.nWorkers = multiprocessing.cpu_count()
+        self.bCoarse = bCoarse
+        self.segmentsPerWorker = DEFAULT_SEGMENTS_PER_WORKER
+        self.nSegments = 0
+        self.nSummaries = 0
+        self.nSummarized = 0
+        self.nRaw = 0
+        self.nNodes = 0
+        self.composeTime = 0.0
+        self.totalTime = 0.0
+
+    def getSegments(self, TR):
+        nLines = len(TR.lines)
+        start = TR.current_line
+        nSegments = max(1, self.nWorkers*self.segmentsPerWorker)
+        size = max(1, (nLines-start+nSegments-1)/nSegments)
+        return [(line, min(line+size, nLines)) for line in xrange(start, nLines, size)]
+
+    def getImages(self, TR):
+        '''
+        The lines of the image load records from the reader position on when function sinks are registered:
+        a worker resolves them before summarizing a segment after them
+        '''
+        if (len(self.taintTracker.TC.sinks.functions) ==0):
+            return []
+        return [line for line in xrange(TR.current_line, len(TR.lines)) if TR.lines[line].lstrip().startswith("L ")]
+
+    def getConfig(self, TR):
+        TP = self.taintTracker
+        return (TP.xDecoder.target_os, TP.xDecoder.process_bits, TP.targetBits, TP.taint_policy, TP.trace_type, TP.TC.sinks.addresses, TP.TC.sinks.functions, TP.TLS.exports, self.getImages(TR))
+
+    def Tick(self, nInstructions):
+        TGC = self.taintTracker.TGC
+        before = TGC.nInstructions
+        TGC.nInstructions = before+nInstructions
+        if (TGC.interval >0 and before/TGC.interval != TGC.nInstructions/TGC.interval):
+            TGC.Collect()
+
+    def Evaluate(self, nodes, getEntry, marked):
+        '''
+        Returns the real taint(or, with bCoarse, the entry and input taints) of every node
+        '''
+        values = [None]*len(nodes)
+        for n in range(len(nodes)):
+            node = nodes[n]
+            kind = node[0]
+            if (kind == NODE_ENTRY):
+                values[n] = getEntry(node[1])
+            elif (kind == NODE_INPUT):
+                if ((node[1], node[2]) in marked):
+                    values[n] = marked[(node[1], node[2])]
+                elif (node[3] is not None):
+                    values[n] = values[node[3]]
+            elif (kind == NODE_NEW):
+                groups = [[values[s] for s in group if values[s] is not None] for group in node[6]]
+                if (sum(len(group) for group in groups) ==0):
+                    continue
+                if (self.bCoarse):
+                    values[n] = ("coarse", node, self.getLeaves(groups))
+                    continue
+                taint = Taint(node[1], node[2], node[3], node[4], node[5])
+                Taint.uid2Taint[taint.tuid]= taint
+                for src in groups[0]:
+                    taint.addTaintASources(src)
+                for src in groups[1]:
+                    taint.addTaintBSources(src)
+                for src in groups[2]:
+                    taint.addTaintCSources(src)
+                for src in groups[3]:
+                    taint.addTaintDSources(src)
+                values[n] = taint
+            else:
+                for s in node[1]:
+                    if (values[s] is not None):
+                        values[n] = values[s]
+                        break
+                else:
+                    if (node[2] is not None):
+                        values[n] = values[node[2]]
+        return values
+
+    def getLeaves(self, groups):
+        leaves = set()
+        for group in groups:
+            for value in group:
+                if (isinstance(value, Taint)):
+                    leaves.add(value)
+                else:
+                    leaves.update(value[2])
+        return frozenset(leaves)
+
+    def getTaint(self, value, coarse):
+        if (value is None or isinstance(value, Taint)):
+            return value
+        if (id(value) not in coarse):
+            node = value[1]
+            taint = Taint(node[1], node[2], node[3], node[4], node[5])
+            Taint.uid2Taint[taint.tuid]= taint
+            for src in sorted(value[2]):
+                taint.addTaintDSources(src)
+            coarse[id(value)] = taint
+        return coarse[id(value)]
+
+    def ApplySummary(self, part, TR, TM):
+        kind, nodes, writes, inputs, nInstructions = part
+        TP = self.taintTracker
+        dynamic_taint = TP.dynamic_taint
+        saved = {} #entry taints of the locations the input records overwrite
+        marked = {} #(input line, location) -> taint created by the input record
+        for line in inputs:
+            TR.seek(line)
+            INRecord = TR.getNext()
+            before = {}
+            for address in xrange(INRecord.currentInputAddr, INRecord.currentInputAddr+INRecord.currentInputSize):
+                if (address not in saved):
+                    saved[address] = dynamic_taint.get(address)
+                before[address] = dynamic_taint.get(address)
+            TM.SetInputTaint(INRecord)
+            for address in before:
+                taint = dynamic_taint.get(address)
+                if (taint is not None and taint is not before[address]):
+                    marked[(line, address)] = taint
+
+        def getEntry(location):
+            if (location in saved):
+                return saved[location]
+            return dynamic_taint.get(location)
+        values = self.Evaluate(nodes, getEntry, marked)
+        coarse = {}
+        for location, node in writes:
+            taint = None
+            if (node is not None):
+                taint = self.getTaint(values[node], coarse)
+            if (taint is None):
+                if (location in dynamic_taint):
+                    del dynamic_taint[location]
+            else:
+                dynamic_taint[location] = taint
+        self.nSummaries = self.nSummaries+1
+        self.nSummarized = self.nSummarized+nInstructions
+        self.nNodes = self.nNodes+len(nodes)
+        self.Tick(nInstructions)
+
+    def Run(self, TR, verBose=False):
+        '''
+        Propagates the rest of the trace from segment summaries. Returns the summary of the last live taint
+        dump or the output of the fault cause dump, or None when the policy is not summarized(the caller then
+        runs sequentially).
+        '''
+        TP = self.taintTracker
+        if (TP.taint_policy != TAINT_DATA or TP.granularity != GRANULARITY_BYTE or TP.THT.bEnabled):
+            return None
+        start = time.time()
+        TP.FlushPending()
+        TR.bCoalesceRep = False
+        TM = TaintMarker(TP)
+        segments = self.getSegments(TR)
+        self.nSegments = len(segments)
+        pool = None
+        if (self.nWorkers >0):
+            pool = multiprocessing.Pool(self.nWorkers, InitWorker, (TR.trace_buffer, self.getConfig(TR)))
+            results = pool.imap(SummarizeSegment, segments)
+        else:
+            InitWorker(TR.trace_buffer, self.getConfig(TR))
+            results = (SummarizeSegment(segment) for segment in segments)
+        sDbg = "ParallelPropagator: %d segments on %d workers" %(len(segments), self.nWorkers)
+        log.debug(sDbg)
+
+        strTaint = ""
+        bEnd = False
+        for parts in results:
+            composeStart = time.time()
+            for part in parts:
+                if (part[0] == "summary"):
+                    self.ApplySummary(part, TR, TM)
+                elif (part[0] == "raw"):
+                    TR.seek(part[1])
+                    if (TP.Propagator(TR.getNext())==1 and verBose):
+                        print "Tainted Security Warning!"
+                    self.nRaw = self.nRaw+1
+                elif (part[0] == "load"):
+                    TR.seek(part[1])
+                    TP.LoadImage(TR.getNext())
+                elif (part[0] == "exception"):
+                    TR.seek(part[1])
+                    tRecord = TR.getNext()
+                    TR.seek(part[2])
+                    tNextRecord = TR.getNext()
+                    if (tNextRecord.currentExceptionCode ==0):
+                        strTaint = TP.TC.DumpLiveTaints()
+                    else:
+                        strTaint = TP.TC.DumpFaultCause(tNextRecord, tRecord, verBose)
+                        bEnd = True
+                        break
+                else:
+                    bEnd = True
+                    break
+            self.composeTime = self.composeTime+time.time()-composeStart
+            if (bEnd):
+                break
+        if (pool is not None):
+            if (bEnd):
+                pool.terminate()
+            else:
+                pool.close()
+            pool.join()
+        self.totalTime = time.time()-start
+        return strTaint
+
+    def getStatistics(self):
+        return "Parallel segments: %d segments on %d workers, %d instructions in %d summaries(%d nodes), %d propagated in the final pass, composition %.1fs of %.1fs\n" %(self.nSegments, self.nWorkers, self.nSummarized, self.nSummaries, self.nNodes, self.nRaw, self.composeTime, self.totalTime)
@@ -0,0 +1,266 @@
+'''
+   This is the disk-backed provenance store for TREE taint tracking.
+
+   With the full history kept(or on traces whose live provenance alone outgrows the analysis host), the
+   provenance nodes registered in Taint.uid2Taint do not fit in RAM. The store keeps at most self.budget
+   nodes in memory: once Taint.uid2Taint grows past the budget(after a collection when the provenance
+   collector is on), the oldest terminated taints are spilled to an append-only file until half the
+   budget is left. Only terminated taints are spilled since they never change again.
+
+   A spilled taint is written as a flat record whose sources are tuids(the tuple layout of a checkpoint
+   taint, see Checkpoint), removed from Taint.uid2Taint and its source lists are dropped, so whatever it
+   alone kept reachable can be reclaimed. The Taint object itself stays valid wherever it is still
+   referenced(marked bSpilled) and its sources are read back from the file on demand, see
+   Taint.getTaint and Taint.getSources. Sources of a spilled taint that stay in memory are pinned(kept
+   as collector roots) until they are spilled in turn.
+
+   Records are read through a read-only memory map of the file, remapped when it has grown. Backward walks
+   read the same sources again and again, so records read are kept decoded in two generations of at most
+   self.cacheSize records each: a hit in the older one moves the record to the current one and the older
+   generation is dropped when the current one is full(an approximate LRU without per-read bookkeeping). The offset index holds one sorted(tuid, offset) array pair per spill pass, merged
+   into one once there are more than MAX_INDEX_SEGMENTS of them.
+ */
+'''
+import os
+import mmap
+import heapq
+import struct
+import marshal
+import logging
+import tempfile
+from array import array
+from bisect import bisect_left
+from Taint import Taint
+
+log = logging.getLogger('TREE')
+
+DEFAULT_MEMORY_BUDGET = 2000000 #provenance nodes kept in memory
+DEFAULT_CACHE_SIZE = 65536 #spilled records kept decoded in memory, per cache generation
+MAX_INDEX_SEGMENTS = 64
+RECORD_HEADER = struct.Struct("<I") #length of the marshalled record that follows
+
+class ProvenanceStore(object):
+    def __init__(self, TP, budget=DEFAULT_MEMORY_BUDGET, path=None):
+        self.taintTracker = TP
+        self.bEnabled = False
+        self.budget = budget
+        self.path = path #spill file, a temporary file removed by Close when None
+        self.threshold = budget
+        self.file = None
+        self.map = None
+        self.bTemporary = False
+        self.size = 0 #bytes written to the spill file
+        self.segments = [] #(tuids, offsets) arrays of every spill pass, sorted by tuid
+        self.pinned = {} #tuid -> in-memory source of a spilled taint
+        self.cacheSize = DEFAULT_CACHE_SIZE
+        self.cache = {} #tuid -> record read since the older generation was dropped
+        self.oldCache = {}
+        self.nSpilled = 0
+        self.nPasses = 0
+        self.nLoaded = 0
+        self.nHits = 0
+
+    def Enable(self, budget=None, path=None):
+        if (budget is not None):
+            self.budget = budget
+        if (path is not None):
+            self.path = path
+        self.threshold = self.budget
+        self.bEnabled = True
+        Taint.store = self
+
+    def Open(self):
+        if (self.path is None):
+            fd, self.path = tempfile.mkstemp(prefix="tree_provenance_", suffix=".prv")
+            os.close(fd)
+            self.bTemporary = True
+        self.file = open(self.path, "w+b")
+        self.size = 0
+
+    def Close(self):
+        if (self.map is not None):
+            self.map.close()
+            self.map = None
+        self.cache = {}
+        self.oldCache = {}
+        if (self.file is not None):
+            self.file.close()
+            self.file = None
+            if (self.bTemporary):
+                os.remove(self.path)
+                self.path = None
+                self.bTemporary = False
+        if (Taint.store is self):
+            Taint.store = None
+
+    def Tick(self):
+        '''
+        Called once per propagated instruction, spills once Taint.uid2Taint has grown past the threshold
+        '''
+        if (len(Taint.uid2Taint) > self.threshold):
+            self.Spill()
+
+    def Spill(self):
+        '''
+        Spills the oldest terminated taints until half the budget is left, returns the number of spilled taints
+        '''
+        TGC = self.taintTracker.TGC
+        if (not TGC.bKeepHistory):
+            TGC.Collect()
+        target = self.budget/2
+        nSpill = len(Taint.uid2Taint)-target
+        if (nSpill <=0):
+            return 0
+        candidates = [tuid for tuid, taint in Taint.uid2Taint.iteritems() if taint.terminatorInstruction is not None]
+        candidates.sort()
+        chosen = candidates[:nSpill]
+        if (len(chosen) !=0):
+            self.Write(chosen)
+        #not enough terminated taints: wait for half a budget of new ones before scanning again
+        self.threshold = max(self.budget, len(Taint.uid2Taint)+self.budget/2)
+        self.nPasses = self.nPasses+1
+        sDbg = "ProvenanceStore: spilled %d of %d candidates, %d provenance nodes left in memory" %(len(chosen), len(candidates), len(Taint.uid2Taint))
+        log.debug(sDbg)
+        return len(chosen)
+
+    def Write(self, chosen):
+        if (self.file is None):
+            self.Open()
+        spilled = set(chosen)
+        taints = []
+        tuids = array('L')
+        offsets = array('d') #exact up to 2**53 bytes
+        self.file.seek(self.size)
+        for tuid in chosen:
+            taint = Taint.uid2Taint.pop(tuid)
+            self.pinned.pop(tuid, None)
+            taints.append(taint)
+            data = marshal.dumps(self.Encode(taint))
+            tuids.append(tuid)
+            offsets.append(self.size)
+            self.file.write(RECORD_HEADER.pack(len(data)))
+            self.file.write(data)
+            self.size = self.size+RECORD_HEADER.size+len(data)
+        self.file.flush()
+        for taint in taints:
+            for src in taint.aSources + taint.bSources + taint.cSources + taint.dSources:
+                if (src.tuid not in spilled and not src.bSpilled):
+                    self.pinned[src.tuid] = src
+            taint.aSources = []
+            taint.bSources = []
+            taint.cSources = []
+            taint.dSources = []
+            taint.bSpilled = True
+        self.segments.append((tuids, offsets))
+        if (len(self.segments) > MAX_INDEX_SEGMENTS):
+            self.MergeIndex()
+        self.nSpilled = self.nSpilled+len(chosen)
+
+    def Encode(self, taint):
+        return (taint.tuid, taint.bDirectInput, taint.taintType, taint.taintAddress, taint.creatorSequence,
+                taint.creatorThread, taint.creatorInstAmenic, taint.terminatorInstruction, taint.terminatorThread,
+                taint.InputFunctionCallerAddress, taint.inputLabels,
+                [s.tuid for s in taint.aSources], [s.tuid for s in taint.bSources],
+                [s.tuid for s in taint.cSources], [s.tuid for s in taint.dSources])
+
+    def MergeIndex(self):
+        tuids = array('L')
+        offsets = array('d')
+        streams = [self.getEntries(segment) for segment in self.segments]
+        for tuid, offset in heapq.merge(*streams):
+            tuids.append(tuid)
+            offsets.append(offset)
+        self.segments = [(tuids, offsets)]
+
+    def getEntries(self, segment):
+        tuids, offsets = segment
+        for i in xrange(len(tuids)):
+            yield (tuids[i], offsets[i])
+
+    def getOffset(self, tuid):
+        for tuids, offsets in self.segments:
+            i = bisect_left(tuids, tuid)
+            if (i < len(tuids) and tuids[i] == tuid):
+                return int(offsets[i])
+        return None
+
+    def isSpilled(self, tuid):
+        return tuid in self.cache or tuid in self.oldCache or self.getOffset(tuid) is not None
+
+    def Read(self, tuid):
+        '''
+        The spilled record of tuid, read through the memory map
+        '''
+        if (tuid in self.cache):
+            self.nHits = self.nHits+1
+            return self.cache[tuid]
+        record = self.oldCache.get(tuid)
+        if (record is not None):
+            self.nHits = self.nHits+1
+            self.Cache(tuid, record)
+            return record
+        offset = self.getOffset(tuid)
+        if (offset is None):
+            raise KeyError(tuid)
+        if (self.map is None or offset+RECORD_HEADER.size > len(self.map)):
+            self.Remap()
+        length = RECORD_HEADER.unpack_from(self.map, offset)[0]
+        start = offset+RECORD_HEADER.size
+        if (start+length > len(self.map)):
+            self.Remap()
+        record = marshal.loads(self.map[start:start+length])
+        self.Cache(tuid, record)
+        return record
+
+    def Cache(self, tuid, record):
+        if (len(self.cache) >= self.cacheSize):
+            self.oldCache = self.cache
+            self.cache = {}
+        self.cache[tuid] = record
+
+    def Remap(self):
+        if (self.map is not None):
+            self.map.close()
+        self.file.flush()
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def Decode(self, record):
+        taint = Taint.__new__(Taint)
+        (taint.tuid, taint.bDirectInput, taint.taintType, taint.taintAddress, taint.creatorSequence,
+         taint.creatorThread, taint.creatorInstAmenic, taint.terminatorInstruction, taint.terminatorThread,
+         taint.InputFunctionCallerAddress, taint.inputLabels) = record[:11]
+        taint.aSources = []
+        taint.bSources = []
+        taint.cSources = []
+        taint.dSources = []
+        return taint
+
+    def getSource(self, tuid):
+        '''
+        The in-memory taint of tuid, or a spilled one whose sources are left on disk
+        '''
+        if (tuid in Taint.uid2Taint):
+            return Taint.uid2Taint[tuid]
+        if (tuid in self.pinned):
+            return self.pinned[tuid]
+        taint = self.Decode(self.Read(tuid))
+        taint.bSpilled = True
+        return taint
+
+    def Load(self, tuid):
+        '''
+        Rebuilds the spilled taint of tuid with its sources, the sources themselves are not expanded
+        '''
+        record = self.Read(tuid)
+        taint = self.Decode(record)
+        taint.aSources = [self.getSource(src) for src in record[11]]
+        taint.bSources = [self.getSource(src) for src in record[12]]
+        taint.cSources = [self.getSource(src) for src in record[13]]
+        taint.dSources = [self.getSource(src) for src in record[14]]
+        self.nLoaded = self.nLoaded+1
+        return taint
+
+    def getStatistics(self):
+        if (not self.bEnabled):
+            return "Provenance store: disabled\n"
+        return "Provenance store: %d nodes spilled in %d passes(%d bytes on disk), %d in memory(budget %d), %d pinned, %d loaded back(%d record cache hits)\n" %(self.nSpilled, self.nPasses, self.size, len(Taint.uid2Taint), self.budget, len(self.pinned), self.nLoaded, self.nHits)
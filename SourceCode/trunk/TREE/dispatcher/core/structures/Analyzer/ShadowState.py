@@ -0,0 +1,275 @@
+'''
+   This is the shadow state for TREE taint tracking.
+
+   ShadowState is the dynamic_taint dictionary(keyed by memory address or normalized register/thread name)
+   extended with two summaries that are kept up to date on every insertion and deletion: the number of
+   tainted bytes per memory page and the number of tainted registers. They let the propagator rule out
+   live taint for a whole operand with one lookup, without probing every byte.
+
+   GranularShadowState tracks taint at a coarser granularity: one taint per register(GRANULARITY_WORD and
+   GRANULARITY_OBJECT) and one per aligned memory word(GRANULARITY_WORD) or aligned block of objectBytes
+   (GRANULARITY_OBJECT). The propagation handlers keep addressing bytes, every byte key is mapped to the
+   unit holding it. All the writes of an instruction to a unit(see BeginUpdate/EndUpdate) yield one taint
+   derived from all their sources; a unit the instruction only partly overwrites keeps its previous taint
+   as a source, and is only untainted once the instruction untaints all its bytes. The result is a sound
+   over-approximation of the byte-level one: every byte tainted at byte granularity lies in a tainted unit
+   whose provenance includes that of the byte, but a unit also taints its untainted bytes, and the
+   provenance of its bytes is merged.
+ */
+'''
+import logging
+import Taint as TaintModule
+from Taint import Taint
+
+log = logging.getLogger('TREE')
+
+PAGE_SHIFT = 12
+
+GRANULARITY_BYTE = 0
+GRANULARITY_WORD = 1
+GRANULARITY_OBJECT = 2
+GRANULARITY_HEAP = 3 #see HeapTracker
+
+GRANULARITY_NAME = {GRANULARITY_BYTE:"byte", GRANULARITY_WORD:"word", GRANULARITY_OBJECT:"object", GRANULARITY_HEAP:"heap"}
+
+DEFAULT_OBJECT_BYTES = 64 #memory block tracked as one unit at GRANULARITY_OBJECT
+
+class ShadowState(dict):
+    def __init__(self):
+        dict.__init__(self)
+        self.pageCounts = {} #page number -> number of tainted bytes in the page
+        self.nRegisters = 0 #number of tainted non-memory keys(registers, eflags, branch conditions)
+
+    def __setitem__(self, key, taint):
+        if (key not in self):
+            if isinstance(key, (int, long)):
+                page = key >> PAGE_SHIFT
+                self.pageCounts[page] = self.pageCounts.get(page, 0)+1
+            else:
+                self.nRegisters = self.nRegisters+1
+        dict.__setitem__(self, key, taint)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        if isinstance(key, (int, long)):
+            page = key >> PAGE_SHIFT
+            count = self.pageCounts[page]-1
+            if (count ==0):
+                del self.pageCounts[page]
+            else:
+                self.pageCounts[page] = count
+        else:
+            self.nRegisters = self.nRegisters-1
+
+    def clear(self):
+        dict.clear(self)
+        self.pageCounts.clear()
+        self.nRegisters = 0
+
+    def isMemoryTainted(self, address, size):
+        firstPage = address >> PAGE_SHIFT
+        lastPage = (address+size-1) >> PAGE_SHIFT
+        bPageTainted = False
+        for page in xrange(firstPage, lastPage+1):
+            if (page in self.pageCounts):
+                bPageTainted = True
+                break
+        if (not bPageTainted):
+            return False
+        for i in xrange(size):
+            if (address+i in self):
+                return True
+        return False
+
+    def isRegisterTainted(self, normalizedNames):
+        if (self.nRegisters ==0):
+            return False
+        for name in normalizedNames:
+            if (name in self):
+                return True
+        return False
+
+    def BeginUpdate(self):
+        pass
+
+    def EndUpdate(self):
+        pass
+
+    def getStatistics(self):
+        nBytes = len(self)-self.nRegisters
+        return "Granularity: byte, %d tainted memory bytes, %d tainted register bytes\n" %(nBytes, self.nRegisters)
+
+class GranularShadowState(ShadowState):
+    def __init__(self, granularity, targetBits, objectBytes=DEFAULT_OBJECT_BYTES):
+        ShadowState.__init__(self)
+        self.granularity = granularity
+        self.memoryBytes = targetBits/8
+        if (granularity == GRANULARITY_OBJECT):
+            self.memoryBytes = objectBytes
+        self.units = {} #register byte name -> (register unit, byte index)
+        self.registerWidths = {} #register unit -> number of bytes seen
+        self.bUpdate = False
+        self.firstTuid = 0 #taints created since the update began are not shared yet and are merged in place
+        self.before = {} #unit -> taint it held when the update first touched it
+        self.covered = {} #unit -> byte indexes the update wrote or untainted, None when all
+        self.written = set() #units the update tainted
+        self.nUpdates = 0
+        self.nMerged = 0
+        self.nKept = 0
+
+    def getUnit(self, key):
+        '''
+        Returns (unit, byte index in the unit), the index is None when key is a register unit itself
+        '''
+        unit = self.units.get(key)
+        if (unit is not None):
+            return unit
+        if isinstance(key, (int, long)):
+            unit = key - key % self.memoryBytes
+            return unit, key-unit
+        parts = key.rsplit("_", 2)
+        if (len(parts) ==3 and parts[1].isdigit()):
+            unit = (parts[0]+"_"+parts[2], int(parts[1]))
+            self.registerWidths[unit[0]] = max(self.registerWidths.get(unit[0], 0), unit[1]+1)
+        else:
+            unit = (key, None)
+        self.units[key] = unit
+        return unit
+
+    def getWidth(self, unit):
+        if isinstance(unit, (int, long)):
+            return self.memoryBytes
+        return self.registerWidths.get(unit, 1)
+
+    def __contains__(self, key):
+        return dict.__contains__(self, self.getUnit(key)[0])
+
+    def __getitem__(self, key):
+        return dict.__getitem__(self, self.getUnit(key)[0])
+
+    def get(self, key, default=None):
+        return dict.get(self, self.getUnit(key)[0], default)
+
+    def BeginUpdate(self):
+        '''
+        Starts the update of one instruction or input record, ending the previous one
+        '''
+        self.EndUpdate()
+        self.bUpdate = True
+        self.firstTuid = TaintModule.tuid
+        self.nUpdates = self.nUpdates+1
+
+    def EndUpdate(self):
+        if (not self.bUpdate):
+            return
+        for unit in self.written:
+            before = self.before[unit]
+            taint = dict.get(self, unit)
+            if (before is None or taint is None or taint is before or self.isCovered(unit)):
+                continue
+            #partly overwritten, the bytes left keep their taint
+            if (taint.tuid < self.firstTuid):
+                taint = self.NewTaint(taint)
+            taint.addTaintDSources(before)
+            ShadowState.__setitem__(self, unit, taint)
+            self.nKept = self.nKept+1
+        self.bUpdate = False
+        self.before.clear()
+        self.covered.clear()
+        self.written.clear()
+
+    def Touch(self, key):
+        unit, index = self.getUnit(key)
+        if (unit not in self.covered):
+            self.before[unit] = dict.get(self, unit)
+            self.covered[unit] = set()
+        if (index is None):
+            self.covered[unit] = None
+        elif (self.covered[unit] is not None):
+            self.covered[unit].add(index)
+        return unit
+
+    def isCovered(self, unit):
+        covered = self.covered[unit]
+        return covered is None or len(covered) >= self.getWidth(unit)
+
+    def NewTaint(self, taint):
+        '''
+        A new taint created like taint and derived from it
+        '''
+        merged = Taint(taint.taintType, taint.taintAddress, taint.creatorSequence, taint.creatorThread, taint.creatorInstAmenic)
+        Taint.uid2Taint[merged.tuid]= merged
+        merged.addTaintDSources(taint)
+        return merged
+
+    def Merge(self, current, taint):
+        '''
+        Returns the taint of a unit written twice by the update, derived from both writes
+        '''
+        if (current.tuid >= self.firstTuid):
+            merged = current # created by this update, the overwritten byte is still part of it
+            merged.terminatorInstruction = None
+            merged.terminatorThread = None
+        else:
+            merged = self.NewTaint(current)
+        if (taint.tuid >= self.firstTuid and not taint.bDirectInput):
+            for src in taint.aSources:
+                if (src is not merged):
+                    merged.addTaintASources(src)
+            for src in taint.bSources:
+                if (src is not merged):
+                    merged.addTaintBSources(src)
+            for src in taint.cSources:
+                if (src is not merged):
+                    merged.addTaintCSources(src)
+            for src in taint.dSources:
+                if (src is not merged):
+                    merged.addTaintDSources(src)
+        else:
+            merged.addTaintDSources(taint)
+        self.nMerged = self.nMerged+1
+        return merged
+
+    def __setitem__(self, key, taint):
+        if (not self.bUpdate):
+            self.BeginUpdate()
+            self.__setitem__(key, taint)
+            self.EndUpdate()
+            return
+        unit = self.Touch(key)
+        current = dict.get(self, unit)
+        if (unit in self.written and current is not None and current is not taint):
+            taint = self.Merge(current, taint)
+        self.written.add(unit)
+        ShadowState.__setitem__(self, unit, taint)
+
+    def __delitem__(self, key):
+        if (not self.bUpdate):
+            self.BeginUpdate()
+            self.__delitem__(key)
+            self.EndUpdate()
+            return
+        unit = self.Touch(key)
+        if (unit in self.written):
+            return # another byte of the unit was tainted by the update
+        if (self.isCovered(unit) and dict.__contains__(self, unit)):
+            ShadowState.__delitem__(self, unit)
+
+    def clear(self):
+        ShadowState.clear(self)
+        self.bUpdate = False
+        self.before.clear()
+        self.covered.clear()
+        self.written.clear()
+
+    def isMemoryTainted(self, address, size):
+        unit = address - address % self.memoryBytes
+        while (unit < address+size):
+            if (dict.__contains__(self, unit)):
+                return True
+            unit = unit+self.memoryBytes
+        return False
+
+    def getStatistics(self):
+        nUnits = len(self)-self.nRegisters
+        return "Granularity: %s(%d-byte memory units), %d tainted memory units, %d tainted registers, %d merged writes, %d partial writes in %d updates\n" %(GRANULARITY_NAME[self.granularity], self.memoryBytes, nUnits, self.nRegisters, self.nMerged, self.nKept, self.nUpdates)
@@ -0,0 +1,235 @@
+'''
+   This is the sink registry for TREE taint checking.
+
+   Sinks are registered by instruction address, by instruction category or by imported function; function
+   sinks are resolved to the address of the function from the image load(L) records and their export names,
+   the same way as the library summaries(see LibrarySummary). Dispatch is a dictionary lookup per instruction:
+   category sinks are checked by TaintChecker.TaintCheckTargets, address and function sinks by
+   TaintChecker.CheckAddressSinks before the instruction is propagated.
+
+   What a sink checks is given by its kind:
+   SINK_REGISTERS checks the registers dumped with the instruction and the 4 bytes each of them points to
+   (calls by default), SINK_CONTROL checks eip, ebp and esp(returns by default, after the return address
+   is popped into eip) and SINK_ARGUMENTS checks some stack arguments at the entry of a function, located from
+   the return address written by the call that entered it.
+
+   A hit is reported once per distinct finding: findings are keyed by (sink address, root set), the root set
+   being the tuids of the taints without sources the sink taint derives from. Later hits of a finding only
+   count, and a taint already seen at a sink address is matched to its finding without walking its
+   provenance again.
+ */
+'''
+import logging
+from x86ISA import X86ISA
+
+log = logging.getLogger('TREE')
+
+SINK_REGISTERS = 0
+SINK_CONTROL = 1
+SINK_ARGUMENTS = 2
+
+MAX_CALL_DISTANCE = 16 #sequence numbers between a call and the function entry it reaches(through a thunk)
+
+class Sink(object):
+    def __init__(self, name, kind, args=(), module=None):
+        self.name = name
+        self.kind = kind
+        self.args = args #stack arguments checked by SINK_ARGUMENTS
+        self.module = module #module exporting a function sink, None matches the export in any module
+        if (module is not None):
+            self.module = module.lower()
+
+    def __str__(self):
+        if (self.module is None):
+            return self.name
+        return "%s!%s" %(self.module, self.name)
+
+DEFAULT_FUNCTION_SINKS = [
+    Sink("memcpy", SINK_ARGUMENTS, (2,)),
+    Sink("memmove", SINK_ARGUMENTS, (2,)),
+    Sink("memset", SINK_ARGUMENTS, (2,)),
+    Sink("strncpy", SINK_ARGUMENTS, (2,)),
+    Sink("strncat", SINK_ARGUMENTS, (2,)),
+    Sink("RtlCopyMemory", SINK_ARGUMENTS, (2,)),
+    Sink("RtlMoveMemory", SINK_ARGUMENTS, (2,)),
+    Sink("malloc", SINK_ARGUMENTS, (0,)),
+    Sink("HeapAlloc", SINK_ARGUMENTS, (2,)),
+    Sink("VirtualAlloc", SINK_ARGUMENTS, (1,)),
+]
+
+class SinkReport(object):
+    def __init__(self, sink, address, roots, taint, sequence):
+        self.sink = sink
+        self.address = address
+        self.roots = roots
+        self.taint = taint #first taint reported
+        self.sequence = sequence #sequence of the first hit
+        self.nHits = 0
+
+    def __str__(self):
+        return "%s at 0x%x: %d hits, first at seq 0x%x, taint %d from %d roots" %(self.sink, self.address, self.nHits, self.sequence, self.taint.tuid, len(self.roots))
+
+class SinkRegistry(object):
+    def __init__(self, TP):
+        self.taintTracker = TP
+        self.x86ISA = X86ISA()
+        self.addresses = {} #instruction address -> sinks
+        self.categories = {} #instruction category -> sinks
+        self.functions = {} #(module, name) -> sink, resolved into self.addresses by LoadImage
+        self.calls = {} #tid -> (sequence, return address slot) of the last call
+        self.findings = {} #(sink address, root set) -> SinkReport
+        self.seen = {} #(sink address, tuid) -> SinkReport
+        self.reports = [] #in the order of the first hit
+        self.nHits = 0
+        self.AddCategorySink(X86ISA.X86_CALL, Sink("call", SINK_REGISTERS))
+        self.AddCategorySink(X86ISA.X86_RET, Sink("ret", SINK_CONTROL))
+
+    def AddAddressSink(self, address, sink):
+        self.addresses.setdefault(address, []).append(sink)
+
+    def AddCategorySink(self, category, sink):
+        self.categories.setdefault(category, []).append(sink)
+
+    def AddFunctionSink(self, sink):
+        self.functions[(sink.module, sink.name)] = sink
+
+    def AddDefaultFunctionSinks(self):
+        for sink in DEFAULT_FUNCTION_SINKS:
+            self.AddFunctionSink(sink)
+
+    def LoadImage(self, LRecord):
+        '''
+        Resolves the function sinks exported by a loaded image, see LibrarySummarizer.LoadImage
+        '''
+        TLS = self.taintTracker.TLS
+        module = TLS.GetModuleName(LRecord)
+        if (module is None):
+            return 0
+        exports = TLS.GetImageExports(LRecord.ImagePath)
+        exports.update(TLS.exports.get(module, {}))
+        nResolved = 0
+        for name, rva in exports.iteritems():
+            sink = self.functions.get((module, name))
+            if (sink is None):
+                sink = self.functions.get((None, name))
+            if (sink is not None):
+                self.AddAddressSink(LRecord.LoadAddress + rva, sink)
+                nResolved = nResolved+1
+                sDbg = "SinkRegistry: %s!%s at 0x%x" %(module, name, LRecord.LoadAddress + rva)
+                log.debug(sDbg)
+        return nResolved
+
+    def ObserveCall(self, instRec):
+        if (instRec.currentWriteAddr is not None):
+            self.calls[instRec.currentThreadId] = (instRec.currentInstSeq, instRec.currentWriteAddr)
+
+    def getEntrySlot(self, instRec):
+        '''
+        The return address slot of the call that entered the function at instRec, None when unknown
+        '''
+        call = self.calls.get(instRec.currentThreadId)
+        if (call is None or instRec.currentInstSeq-call[0] > MAX_CALL_DISTANCE):
+            return None
+        return call[1]
+
+    def getRegisterTaints(self, reg, tid):
+        dynamic_taint = self.taintTracker.dynamic_taint
+        taints = []
+        for regName in self.x86ISA.getNormalizedX86RegisterNames(reg, 4, tid):
+            if (regName in dynamic_taint):
+                taints.append(dynamic_taint[regName])
+        return taints
+
+    def getMemoryTaints(self, address, size):
+        dynamic_taint = self.taintTracker.dynamic_taint
+        taints = []
+        for i in range(size):
+            if (address+i in dynamic_taint):
+                taints.append(dynamic_taint[address+i])
+        return taints
+
+    def Collect(self, sink, instRec):
+        '''
+        The tainted locations checked by sink at instRec
+        '''
+        tid = instRec.currentThreadId
+        taints = []
+        if (sink.kind == SINK_REGISTERS):
+            for reg in instRec.reg_value:
+                taints.extend(self.getRegisterTaints(reg, tid))
+                taints.extend(self.getMemoryTaints(instRec.reg_value[reg], 4))
+        elif (sink.kind == SINK_CONTROL):
+            for reg in ("eip", "ebp", "esp"):
+                taints.extend(self.getRegisterTaints(reg, tid))
+        elif (sink.kind == SINK_ARGUMENTS):
+            slot = self.getEntrySlot(instRec)
+            if (slot is not None):
+                for arg in sink.args:
+                    taints.extend(self.getMemoryTaints(slot+4+4*arg, 4))
+        return taints
+
+    def getRoots(self, taint):
+        roots = set()
+        stack = [taint]
+        visited = set()
+        while len(stack)!=0:
+            t = stack.pop()
+            if (t.tuid in visited):
+                continue
+            visited.add(t.tuid)
+            dSources, cSources, bSources, aSources = t.getSources()
+            if (t.bDirectInput or len(dSources)+len(cSources)+len(bSources)+len(aSources) ==0):
+                roots.add(t.tuid)
+                continue
+            stack.extend(dSources)
+            stack.extend(cSources)
+            stack.extend(bSources)
+            stack.extend(aSources)
+        return frozenset(roots)
+
+    def Record(self, sink, instRec, taint):
+        '''
+        Counts a hit of taint at the sink, returns the finding when it is a new one
+        '''
+        self.nHits = self.nHits+1
+        address = instRec.currentInstruction
+        report = self.seen.get((address, taint.tuid))
+        if (report is None):
+            roots = self.getRoots(taint)
+            report = self.findings.get((address, roots))
+            if (report is None):
+                report = SinkReport(sink, address, roots, taint, instRec.currentInstSeq)
+                self.findings[(address, roots)] = report
+                self.reports.append(report)
+            self.seen[(address, taint.tuid)] = report
+        report.nHits = report.nHits+1
+        if (report.nHits ==1):
+            return report
+        return None
+
+    def getState(self):
+        '''
+        The registry state saved with a checkpoint(see Checkpointer): the resolved sink addresses, the calls
+        being tracked and the findings, with their taints as tuids
+        '''
+        index = {}
+        reports = []
+        for report in self.reports:
+            index[id(report)] = len(reports)
+            reports.append((report.sink, report.address, report.roots, report.taint.tuid, report.sequence, report.nHits))
+        seen = [(key, index[id(report)]) for key, report in self.seen.iteritems()]
+        return (self.addresses, self.calls, reports, seen, self.nHits)
+
+    def setState(self, state, arena):
+        self.addresses, self.calls, reports, seen, self.nHits = state
+        self.findings = {}
+        self.reports = []
+        for sink, address, roots, tuid, sequence, nHits in reports:
+            report = SinkReport(sink, address, roots, arena[tuid], sequence)
+            report.nHits = nHits
+            self.findings[(address, roots)] = report
+            self.reports.append(report)
+        self.seen = dict((key, self.reports[i]) for key, i in seen)
+
+    def getStatistics(self):
+        return "Sinks: %d hits, %d distinct findings reported, %d sink addresses, %d sink categories\n" %(self.nHits, len(self.reports), len(self.addresses), len(self.categories))
@@ -8,6 +8,7 @@ This is the basic taint class for CBASS/TREE.
 '''
 import logging
 import struct
+from InputLabel import unionLabels
     
 log = logging.getLogger('TREE')
 
@@ -17,10 +18,16 @@ MEMORY_TAINT = 1
 BRANCH_TAINT = 2
 tuid=1
 
+TREE_MAX_DEPTH = 256 #generations rendered by taint_tree
+TREE_MAX_FANOUT = 64 #sources of a node rendered by taint_tree
+DUMP_CHUNK_LINES = 4096 #provenance lines written to the output stream at once
+DUMP_LINE_CACHE_SIZE = 65536 #formatted lines of terminated taints kept by a TaintDumper
+
 class Taint(object):
       
     uid2Taint = {}        
-    visited = set()
+    store = None #disk-backed provenance of spilled taints, see ProvenanceStore
+    bSpilled = False #sources left in the provenance store
        
     def __init__(self, taintType, taintAddress,creatorSequence,creatorThread, creatorInstAmenic, directInput=False):
         global tuid
@@ -39,6 +46,7 @@ class Taint(object):
         self.terminatorInstruction = None
         self.terminatorThread = None
         self.InputFunctionCallerAddress = None
+        self.inputLabels = () #runs of influencing input bytes, see InputLabel
 
     def __eq__(self, other):
         if other==None:
@@ -52,18 +60,22 @@ class Taint(object):
     def addTaintASources(self, taintSource):
         if(self.aSources.__contains__(taintSource)== False):
             self.aSources.append(taintSource)
+            self.inputLabels = unionLabels(self.inputLabels, taintSource.inputLabels)
 
     def addTaintBSources(self, taintSource):
         if(self.bSources.__contains__(taintSource)== False):
             self.bSources.append(taintSource)
+            self.inputLabels = unionLabels(self.inputLabels, taintSource.inputLabels)
 
     def addTaintCSources(self, taintSource):
         if(self.cSources.__contains__(taintSource)== False):
             self.cSources.append(taintSource)
+            self.inputLabels = unionLabels(self.inputLabels, taintSource.inputLabels)
 
     def addTaintDSources(self, taintSource):
         if(self.dSources.__contains__(taintSource)== False):
             self.dSources.append(taintSource)
+            self.inputLabels = unionLabels(self.inputLabels, taintSource.inputLabels)
         
     def terminateTaint(self,terminatorInstructionLine, terminatorThread):
         self.terminatorInstruction = terminatorInstructionLine
@@ -72,6 +84,24 @@ class Taint(object):
     def setCreatorSequence(self, creatorSequence):
         self.creatorSequence = creatorSequence
 
+    @staticmethod
+    def getTaint(tid):
+        '''
+        The registered taint of tid, read back with its sources when it has been spilled to the provenance store
+        '''
+        if (tid not in Taint.uid2Taint and Taint.store is not None and Taint.store.isSpilled(tid)):
+            return Taint.store.Load(tid)
+        return Taint.uid2Taint[tid]
+
+    def getSources(self):
+        '''
+        Returns the (dSources, cSources, bSources, aSources) lists, read back from the provenance store when spilled
+        '''
+        taint = self
+        if (self.bSpilled):
+            taint = Taint.store.Load(self.tuid)
+        return (taint.dSources, taint.cSources, taint.bSources, taint.aSources)
+
     def setInputFunctionCaller(self, InputCallerAddress):
         if self.bDirectInput:
             self.InputFunctionCallerAddress = InputCallerAddress
@@ -103,55 +133,47 @@ class Taint(object):
         
         return taintStr
 
-    def taint_tree(self, level=1):
-        taintStr ="[%s]" %(self.tuid)
-        
-        if(self.taintType == REGISTER_TAINT):
-            taintStr =taintStr+"reg_"
-        elif(self.taintType == MEMORY_TAINT):
-            taintStr =taintStr+"mem_"
-        elif(self.taintType == INITIAL_TAINT):
-            taintStr =taintStr+"in_"                 
-        else:
-            taintStr =taintStr+"bc_"
-            
-        if isinstance(self.taintAddress, int):
-            taintStr = taintStr+hex(self.taintAddress)+"["+hex(self.creatorSequence)+":"+hex(self.creatorThread)+"]"
-        else:
-            taintStr = taintStr+str(self.taintAddress)+"["+hex(self.creatorSequence)+":"+hex(self.creatorThread)+"]"
-            
-        if(self.terminatorInstruction!=None and self.terminatorThread !=None):
-            taintStr = taintStr+"["+hex(self.terminatorInstruction)+":"+hex(self.terminatorThread)+"]"
-        
-        if(self.bDirectInput==True):
-            taintStr = taintStr + "<-"+hex(self.InputFunctionCallerAddress)+":"+str(self.creatorInstAmenic)
-            return taintStr
-        
-        taint_dtree = None
-        if(len(self.dSources)>0):        
-            taint_dtree = "\n{D}".join([("\t" * level + t.taint_tree(level+1)) for t in self.dSources])
-        
-        taint_ctree = None
-        if(len(self.cSources)>0):        
-            taint_ctree = "\n{C}".join([("\t" * level + t.taint_tree(level+1)) for t in self.cSources])
-
-        taint_btree = None
-        if(len(self.bSources)>0):        
-            taint_btree = "\n{B}".join([("\t" * level + t.taint_tree(level+1)) for t in self.bSources])
-        
-        if(taint_dtree is None):
-            return taintStr
-        
-        if(taint_dtree !=None):
-            taintStr = "".join(["%s<-%s" % (taintStr,self.creatorInstAmenic), "\n", taint_dtree])
-        
-        if(taint_ctree!=None):
-            taintStr = "".join(["%s<-%s" % (taintStr,self.creatorInstAmenic), "\n", taint_dtree,"\n",taint_ctree])
-        
-        if (taint_btree!=None):
-            taintStr = "".join(["%s<-%s" % (taintStr,self.creatorInstAmenic), "\n", taint_dtree,"\n",taint_btree])
-
-        return taintStr
+    def taint_tree(self, level=1, maxDepth=TREE_MAX_DEPTH, maxFanout=TREE_MAX_FANOUT):
+        '''
+        Renders the provenance of this taint as a tree, one node per line, the sources of a node level tabs deeper
+        than the node and marked {D}, {C} or {B}. Every node is expanded once: a node already rendered in this
+        tree is written as a back-reference "[tuid](see above)", so the rendering is linear in the size of the
+        provenance DAG. Generations past maxDepth and the sources of a node past maxFanout are elided.
+        '''
+        lines = []
+        rendered = set()
+        stack = [(self, 0, "")]
+        while len(stack)!=0:
+            taint, depth, relation = stack.pop()
+            prefix = relation
+            if (depth >0):
+                prefix = "\t"*(level+depth-1) + relation
+            if (taint is None): #elided sources
+                lines.append(prefix)
+                continue
+            if (taint.tuid in rendered):
+                lines.append("%s[%s](see above)" %(prefix, taint.tuid))
+                continue
+            rendered.add(taint.tuid)
+            taintStr = prefix + str(taint)
+            if (taint.bDirectInput==True):
+                lines.append(taintStr)
+                continue
+            dSources, cSources, bSources, aSources = taint.getSources()
+            sources = [("{D}", src) for src in dSources] + [("{C}", src) for src in cSources] + [("{B}", src) for src in bSources]
+            if (len(sources)==0):
+                lines.append(taintStr)
+                continue
+            lines.append("%s<-%s" % (taintStr,taint.creatorInstAmenic))
+            if (depth >= maxDepth):
+                stack.append((None, depth+1, "...(%d sources not shown)" %(len(sources))))
+                continue
+            if (len(sources) > maxFanout):
+                stack.append((None, depth+1, "...(%d more sources)" %(len(sources)-maxFanout)))
+                sources = sources[:maxFanout]
+            for relation, src in reversed(sources):
+                stack.append((src, depth+1, relation))
+        return "\n".join(lines)
     
     def taint_simple(self):
         taintStr ="[%s]" %(self.tuid)
@@ -200,24 +222,83 @@ class Taint(object):
         return taintStr
     
     def dumpTaintTree(self,output_fd):
-        taintids=set()
-        taintids.add(self.tuid)
-        taintStr = ""
-        while len(taintids)!=0:
-            tid = taintids.pop()
-            taint = Taint.uid2Taint[tid]
-            for dSrc in taint.dSources:
-                taintids.add(dSrc.tuid)
-            for cSrc in taint.cSources:
-                taintids.add(cSrc.tuid)
-            for bSrc in taint.bSources:
-                taintids.add(bSrc.tuid)                
-            if(tid not in Taint.visited):
-                newStr = "%s\n" %taint.taint_simple()
-                taintStr = taintStr + newStr
-                if (output_fd !=None):
-                    output_fd.write("%s" %newStr)
-                Taint.visited.add(tid)
-        
-        return taintStr
+        '''
+        Writes the provenance of this taint to output_fd, one taint_simple line per node, returns a DumpSummary
+        '''
+        return TaintDumper().Dump(self, output_fd)
+
+class DumpSummary(object):
+    def __init__(self, tuid):
+        self.tuid = tuid
+        self.nNodes = 0
+        self.nBytes = 0
+
+    def __str__(self):
+        return "Provenance of taint %d: %d nodes, %d bytes dumped\n" %(self.tuid, self.nNodes, self.nBytes)
+
+class TaintDumper(object):
+    '''
+    Walks the provenance DAG of a taint iteratively and streams one taint_simple line per node to the output,
+    DUMP_CHUNK_LINES lines per write. Every dump has its own visited set, so a report always holds the whole
+    provenance of its taint whatever was dumped before. The lines of terminated taints are kept(up to
+    self.cacheSize) since provenance shared by several reports is formatted again and again otherwise. The
+    nodes are also recorded in the taint graph when one is given, see TaintGraphRecorder.
+    '''
+    def __init__(self, cacheSize=DUMP_LINE_CACHE_SIZE):
+        self.cacheSize = cacheSize
+        self.lines = {} #tuid -> (terminatorInstruction, terminatorThread, line)
+        self.nDumps = 0
+        self.nNodes = 0
+        self.nBytes = 0
+        self.nReused = 0
+
+    def getLine(self, taint):
+        cached = self.lines.get(taint.tuid)
+        if (cached is not None and cached[0] == taint.terminatorInstruction and cached[1] == taint.terminatorThread):
+            self.nReused = self.nReused+1
+            return cached[2]
+        line = "%s\n" %taint.taint_simple()
+        if (taint.terminatorInstruction is not None):
+            if (len(self.lines) >= self.cacheSize):
+                self.lines = {}
+            self.lines[taint.tuid] = (taint.terminatorInstruction, taint.terminatorThread, line)
+        return line
+
+    def Dump(self, taint, output_fd, graph=None):
+        summary = DumpSummary(taint.tuid)
+        visited = set()
+        chunk = []
+        stack = [taint]
+        while len(stack)!=0:
+            t = stack.pop()
+            if (t.tuid in visited):
+                continue
+            visited.add(t.tuid)
+            if (t.bSpilled):
+                t = Taint.store.Load(t.tuid)
+            line = self.getLine(t)
+            if (graph is not None):
+                graph.AddTaint(t)
+            summary.nNodes = summary.nNodes+1
+            summary.nBytes = summary.nBytes+len(line)
+            chunk.append(line)
+            if (len(chunk) >= DUMP_CHUNK_LINES):
+                self.Write(chunk, output_fd)
+                chunk = []
+            for sources in (t.bSources, t.cSources, t.dSources):
+                for src in reversed(sources):
+                    if (src.tuid not in visited):
+                        stack.append(src)
+        self.Write(chunk, output_fd)
+        self.nDumps = self.nDumps+1
+        self.nNodes = self.nNodes+summary.nNodes
+        self.nBytes = self.nBytes+summary.nBytes
+        return summary
+
+    def Write(self, chunk, output_fd):
+        if (output_fd is not None and len(chunk) !=0):
+            output_fd.write("".join(chunk))
+
+    def getStatistics(self):
+        return "Provenance dumps: %d dumps, %d nodes(%d bytes) written, %d lines reused\n" %(self.nDumps, self.nNodes, self.nBytes, self.nReused)
 
@@ -0,0 +1,65 @@
+'''
+   This is the taint sharing layer for TREE taint tracking.
+
+   Data propagation creates one Taint per destination byte, even when the derivation is identical to the taint
+   the destination already holds(e.g. the same mov executed in a loop). When sharing is enabled, a unary move
+   whose destination already holds a live taint of the same type derived from exactly the same sources keeps
+   that taint instead of allocating a new provenance node.
+
+   Only the taint of the destination itself is reused, so a taint is never shared between locations:
+   terminating it when its location is overwritten cannot terminate the taint of another location. A shared
+   taint keeps the creator(sequence, instruction) of its first derivation. Binary operations are not looked
+   up: their destination is usually one of their sources, so their derivation never matches it.
+ */
+'''
+import logging
+from Taint import Taint
+
+log = logging.getLogger('TREE')
+
+RELATION_DATA = "D"
+
+class TaintCache(object):
+    def __init__(self, TP, bEnabled=False):
+        self.taintTracker = TP
+        self.bEnabled = bEnabled
+        self.nHits = 0
+        self.nMisses = 0
+
+    def IsDerivation(self, taint, relation, srcTaints, taintType):
+        '''
+        True when taint is a live derivation of type taintType from exactly srcTaints
+        '''
+        if (taint.taintType != taintType or taint.terminatorInstruction is not None or taint.bSpilled):
+            return False
+        if (relation != RELATION_DATA or len(taint.aSources)+len(taint.bSources)+len(taint.cSources) !=0):
+            return False
+        return set([src.tuid for src in taint.dSources]) == set([src.tuid for src in srcTaints])
+
+    def Derive(self, relation, srcTaints, taintType, taintAddress, creatorSequence, creatorThread, creatorInstAmenic, bShare=True):
+        '''
+        Returns a taint derived from srcTaints, the taint taintAddress already holds when it is the same
+        derivation, sharing is enabled and bShare(unary moves)
+        '''
+        if (self.bEnabled and bShare):
+            taint = self.taintTracker.dynamic_taint.get(taintAddress)
+            if (taint is not None and self.IsDerivation(taint, relation, srcTaints, taintType)):
+                self.nHits = self.nHits+1
+                return taint
+            self.nMisses = self.nMisses+1
+
+        taint = Taint(taintType, taintAddress, creatorSequence, creatorThread, creatorInstAmenic)
+        Taint.uid2Taint[taint.tuid]= taint
+        for src in srcTaints:
+            if (relation == RELATION_DATA):
+                taint.addTaintDSources(src)
+        return taint
+
+    def getStatistics(self):
+        if (not self.bEnabled):
+            return "Taint sharing: disabled\n"
+        nLookups = self.nHits + self.nMisses
+        rate = 0.0
+        if (nLookups >0):
+            rate = 100.0*self.nHits/nLookups
+        return "Taint sharing: %d of %d unary derivations reused(%.1f%%)\n" %(self.nHits, nLookups, rate)
@@ -15,80 +15,124 @@ from ctypes.util import *
 from ctypes import *
 import ctypes
 import operator
-from Taint import Taint, INITIAL_TAINT,REGISTER_TAINT,MEMORY_TAINT,BRANCH_TAINT 
+from Taint import Taint, TaintDumper, DUMP_CHUNK_LINES, INITIAL_TAINT,REGISTER_TAINT,MEMORY_TAINT,BRANCH_TAINT 
 from TraceParser import IDBTraceReader
 from x86Decoder import x86Decoder, instDecode, IMMEDIATE, REGISTER,MEMORY, WINDOWS, LINUX
 from x86ISA import X86ISA
+from SinkRegistry import SinkRegistry
+from InputLabel import unionLabels
 #Trace type enumeration
 IDA = 0
 PIN = 1
 
+DUMP_SUMMARY_LINES = 32 #first lines of a live taint dump kept in its summary
+
+class LiveDumpSummary(object):
+    '''
+    Returned by TaintChecker.DumpLive: the dump itself is in the output, the summary holds its counts and
+    its first DUMP_SUMMARY_LINES lines
+    '''
+    def __init__(self, header):
+        self.header = header
+        self.nTaints = 0
+        self.nRanges = 0
+        self.nLines = 0
+        self.nBytes = 0
+        self.lines = []
+
+    def Add(self, text):
+        nLines = text.count("\n")
+        if (len(self.lines) < DUMP_SUMMARY_LINES):
+            self.lines.extend(text.splitlines(True)[:DUMP_SUMMARY_LINES-len(self.lines)])
+        self.nLines = self.nLines+nLines
+        self.nBytes = self.nBytes+len(text)
+
+    def __str__(self):
+        strSummary = "%s%d live taints, %d memory ranges: %d lines(%d bytes) dumped\n" %(self.header, self.nTaints, self.nRanges, self.nLines, self.nBytes)
+        strSummary = strSummary + "".join(self.lines)
+        if (self.nLines > len(self.lines)):
+            strSummary = strSummary + "...\n"
+        return strSummary
+
 class TaintChecker(object):
     def __init__(self, TP):
         self.taintTracker = TP
         self.bDebug = False
+        self.sinkTaints = {} #reported sink taints keyed by tuid, kept alive by the provenance collector
+        self.sinks = SinkRegistry(TP)
+        self.dumper = TaintDumper()
+        self.bCoalesceMemory = False #live tainted memory dumped as ranges of contiguous bytes
+
+    def DumpSinkTaint(self, taint):
+        '''
+        Streams the provenance of taint to the output, returns the summary lines of the report
+        '''
+        self.sinkTaints[taint.tuid] = taint
+        strTaint = str(self.dumper.Dump(taint, self.taintTracker.output_fd, self.taintTracker.graph))
+        if (self.taintTracker.inputLabels is not None):
+            self.taintTracker.inputLabels.countInfluence(taint.inputLabels)
+            strInput = self.GetInputBytesLine(taint)
+            self.taintTracker.output_fd.write(strInput)
+            strTaint = strTaint + strInput
+        if (self.taintTracker.THT.bEnabled):
+            strHeap = self.GetHeapObjectsLine(taint)
+            self.taintTracker.output_fd.write(strHeap)
+            strTaint = strTaint + strHeap
+        return strTaint
+
+    def GetHeapObjectsLine(self, taint):
+        objects = self.taintTracker.THT.GetObjects(taint)
+        if (len(objects) ==0):
+            return ""
+        return "Heap objects of taint %d: %s\n" %(taint.tuid, ", ".join([str(obj) for obj in objects]))
+
+    def GetInputBytesLine(self, taint):
+        if (self.taintTracker.inputLabels is None or len(taint.inputLabels) ==0):
+            return ""
+        return "Input bytes of taint %d: %s\n" %(taint.tuid, self.taintTracker.inputLabels.describe(taint.inputLabels))
 
     def TaintCheckTargets(self, instInfo, instRec):
         sDbg = "Taint Check Sink %s at seq = %d:\n" %(instInfo.attDisa, instRec.currentInstSeq)
         if (self.bDebug == True):
             print ("%s" %sDbg)
-        tid = instRec.currentThreadId
-        instStr = str(instInfo.attDisa).strip("b'")
-        bTaint = 0
-        
-        if (instInfo.inst_category in self.taintTracker.taint_category_ret): 
-            normalizedEIPNames = self.taintTracker.x86ISA.getNormalizedX86RegisterNames("eip", 4,instRec.currentThreadId)
-            for normalizedEIP in normalizedEIPNames:
-                eipName = normalizedEIP
-                if(eipName in self.taintTracker.dynamic_taint):
-                    if self.bDebug==1:
-                        print ("tainted = %s" %self.taintTracker.dynamic_taint[eipName].taint_tree())
-                    self.taintTracker.dynamic_taint[eipName].dumpTaintTree(self.taintTracker.output_fd)
-                    #self.output_fd.write("%s\n" %self.dynamic_taint[eipName].taint_tree())
-                    bTaint =1
+        if (instInfo.inst_category in self.taintTracker.taint_category_call):
+            self.sinks.ObserveCall(instRec)
+        sinks = self.sinks.categories.get(instInfo.inst_category)
+        if (sinks is None):
+            return 0
+        return self.CheckSinks(sinks, instRec)
 
-            normalizedEBPNames = self.taintTracker.x86ISA.getNormalizedX86RegisterNames("ebp", 4,instRec.currentThreadId)
-            for normalizedEBP in normalizedEIPNames:
-                ebpName = normalizedEBP
-                if(ebpName in self.taintTracker.dynamic_taint):
-                    if self.bDebug==1:
-                        print ("tainted = %s" %self.taintTracker.dynamic_taint[ebpName].taint_tree())
-                        #self.output_fd.write("%s\n" %self.dynamic_taint[ebpName].taint_tree())
-                    self.taintTracker.dynamic_taint[ebpName].dumpTaintTree(self.taintTracker.output_fd)
-                    bTaint =1
+    def CheckAddressSinks(self, instRec):
+        '''
+        Checks the sinks registered at the address of instRec before it is propagated
+        '''
+        sinks = self.sinks.addresses.get(instRec.currentInstruction)
+        if (sinks is None):
+            return 0
+        self.taintTracker.FlushPending()
+        return self.CheckSinks(sinks, instRec)
 
-            normalizedESPNames = self.taintTracker.x86ISA.getNormalizedX86RegisterNames("esp", 4,instRec.currentThreadId)
-            for normalizedESP in normalizedESPNames:
-                espName = normalizedESP
-                if(espName in self.taintTracker.dynamic_taint):
-                    if self.bDebug==1:
-                        print ("tainted = %s" %self.taintTracker.dynamic_taint[espName].taint_tree())
-                        #self.output_fd.write("%s\n" %self.dynamic_taint[espName].taint_tree())
-                    self.taintTracker.dynamic_taint[espName].dumpTaintTree(self.taintTracker.output_fd)
-                    bTaint=1					
-        elif (instInfo.inst_category in self.taintTracker.taint_category_call): #check its register set 
-            for reg in instRec.reg_value: 
-                normalizedRegNames = self.taintTracker.x86ISA.getNormalizedX86RegisterNames(reg, 4,instRec.currentThreadId)
-                for normalizedRegName in normalizedRegNames:
-                    regName = normalizedRegName
-                    if(regName in self.taintTracker.dynamic_taint):
-                        if self.bDebug==1:
-                            print ("tainted = %s" %self.taintTracker.dynamic_taint[regName].taint_tree())
-                        self.taintTracker.dynamic_taint[regName].dumpTaintTree(self.taintTracker.output_fd)
-                        bTaint =1
-                #Check if the memory pointed by the reg is tainted
-                memBase = instRec.reg_value[reg]
-                for i in range(4):
-                    if(memBase+i in self.taintTracker.dynamic_taint):
-                        if self.bDebug==1:
-                            print ("tainted = %s" %self.taintTracker.dynamic_taint[memBase+i].taint_tree())
-                        self.taintTracker.dynamic_taint[memBase+i].dumpTaintTree(self.taintTracker.output_fd)
-                        bTaint =1
-        
+    def CheckSinks(self, sinks, instRec):
+        '''
+        Dumps the tainted locations of sinks that are new findings, see SinkRegistry
+        '''
+        bTaint = 0
+        for sink in sinks:
+            checked = set()
+            for taint in self.sinks.Collect(sink, instRec):
+                if (taint.tuid in checked):
+                    continue
+                checked.add(taint.tuid)
+                bTaint = 1
+                if self.bDebug==1:
+                    print ("tainted = %s" %taint.taint_tree())
+                if (self.sinks.Record(sink, instRec, taint) is not None):
+                    self.DumpSinkTaint(taint)
         return bTaint
 
     def DumpFaultCause(self, tRecord, tLastERecord,verBose):
 
+        self.taintTracker.FlushPending()
         faultAddress = tRecord.currentExceptionAddress
         self.taintTracker.output_fd.write("EXCEPTION:\n")
         strTaint ="EXCEPTION:\n"
@@ -133,14 +177,14 @@ class TaintChecker(object):
                 if(normalizedRegName in self.taintTracker.dynamic_taint):
                     if (self.bDebug==True):
                         print ("tainted = %s" %self.taintTracker.dynamic_taint[normalizedRegName].taint_simple())
-                    strTaint = strTaint + self.taintTracker.dynamic_taint[normalizedRegName].dumpTaintTree(self.taintTracker.output_fd)
+                    strTaint = strTaint + self.DumpSinkTaint(self.taintTracker.dynamic_taint[normalizedRegName])
                     
 	    #Check if the memory pointed by the reg is tainted
             memBase = tLastERecord.reg_value[reg]
             if (tLastERecord.reg_value[reg]==faultAddress):
                 for i in range(4):
                     if(memBase+i in self.taintTracker.dynamic_taint):
-                        strTaint = strTaint + self.taintTracker.dynamic_taint[faultAddress+i].dumpTaintTree(self.taintTracker.output_fd)
+                        strTaint = strTaint + self.DumpSinkTaint(self.taintTracker.dynamic_taint[faultAddress+i])
                         if (self.bDebug==True):
                             print ("tainted = %s" %self.taintTracker.dynamic_taint[faultAddress+i].taint_simple())
         return strTaint
@@ -149,6 +193,7 @@ class TaintChecker(object):
         faultAddress = tRecord.currentExceptionAddress
         
         self.taintTracker.Propagator(tLastERecord)
+        self.taintTracker.FlushPending()
         
         if(not(tLastERecord.currentInstruction in self.taintTracker.static_taint)):                
             instlen = tLastERecord.currentInstSize
@@ -193,7 +238,7 @@ class TaintChecker(object):
                     if(normalizedRegName in self.taintTracker.dynamic_taint):
                         if (self.bDebug==True):
                             print ("tainted = %s" %self.taintTracker.dynamic_taint[normalizedRegName].taint_simple())
-                        strTaint = strTaint +self.taintTracker.dynamic_taint[normalizedRegName].dumpTaintTree(self.taintTracker.output_fd)
+                        strTaint = strTaint +self.DumpSinkTaint(self.taintTracker.dynamic_taint[normalizedRegName])
 
         for i in range(instInfo.n_dest_operand):
             if(instInfo.dest_operands[i]._type == REGISTER):
@@ -206,7 +251,7 @@ class TaintChecker(object):
                     if(normalizedRegName in self.taintTracker.dynamic_taint):
                         if (self.bDebug==True):
                             print ("tainted = %s" %self.taintTracker.dynamic_taint[normalizedRegName].taint_simple())
-                        strTaint = strTaint +self.taintTracker.dynamic_taint[normalizedRegName].dumpTaintTree(self.taintTracker.output_fd)
+                        strTaint = strTaint +self.DumpSinkTaint(self.taintTracker.dynamic_taint[normalizedRegName])
             
         for reg in tLastERecord.reg_value:
             if (self.bDebug==True):
@@ -219,48 +264,140 @@ class TaintChecker(object):
                 if(normalizedRegName in self.taintTracker.dynamic_taint):
                     if (self.bDebug==True):
                         print ("tainted = %s" %self.taintTracker.dynamic_taint[normalizedRegName].taint_simple())
-                    strTaint = strTaint + self.taintTracker.dynamic_taint[normalizedRegName].dumpTaintTree(self.taintTracker.output_fd)
+                    strTaint = strTaint + self.DumpSinkTaint(self.taintTracker.dynamic_taint[normalizedRegName])
                     
 	    #Check if the memory pointed by the reg is tainted
             memBase = tLastERecord.reg_value[reg]
             if (tLastERecord.reg_value[reg]==faultAddress):
                 for i in range(4):
                     if(memBase+i in self.taintTracker.dynamic_taint):
-                        strTaint = strTaint + self.taintTracker.dynamic_taint[faultAddress+i].dumpTaintTree(self.taintTracker.output_fd)
+                        strTaint = strTaint + self.DumpSinkTaint(self.taintTracker.dynamic_taint[faultAddress+i])
                         if (self.bDebug==True):
                             print ("tainted = %s" %self.taintTracker.dynamic_taint[faultAddress+i].taint_simple())
 	return strTaint
 
-    def DumpLiveTaintsInOrder(self):
-        self.taintTracker.output_fd.write("Live Taints in the order of creation:\n")
-        strTaint = "Live Taints in the order of creation:\n"
-        for t in self.taintTracker.dynamic_taint:
-            self.taintTracker.dynamic_taint[t].terminateTaint(-1,-1)
-        
-        for v in sorted(self.taintTracker.dynamic_taint.values() ):
-            for key in self.taintTracker.dynamic_taint:
-                if self.taintTracker.dynamic_taint[ key ] == v:
-                    self.taintTracker.output_fd.write("%s \n" %(v.taint_tree()))
-		    strTaint = strTaint + "%s \n" %(v.taint_tree())
+    def getLiveTaints(self):
+        '''
+        Terminates the live taints, returns tuid -> (taint, locations) in one pass over dynamic_taint
+        '''
+        live = {}
+        for location, taint in self.taintTracker.dynamic_taint.iteritems():
+            entry = live.get(taint.tuid)
+            if (entry is None):
+                taint.terminateTaint(-1,-1)
+                entry = (taint, [])
+                live[taint.tuid] = entry
+            entry[1].append(location)
+        return live
+
+    def getLiveRanges(self, live):
+        '''
+        Coalesces the live tainted memory bytes into ranges of contiguous addresses, returns
+        [first tuid, start, end, taints] lists in the order of the addresses
+        '''
+        addresses = []
+        for taint, locations in live.itervalues():
+            for location in locations:
+                if (isinstance(location, (int, long))):
+                    addresses.append((location, taint.tuid))
+        addresses.sort()
+        ranges = []
+        memRange = None
+        for address, tuid in addresses:
+            if (memRange is None or address != memRange[2]+1):
+                memRange = [tuid, address, address, []]
+                ranges.append(memRange)
+            memRange[0] = min(memRange[0], tuid)
+            memRange[2] = address
+            memRange[3].append(live[tuid][0])
+        return ranges
+
+    def GetLiveRangeLines(self, memRange):
+        first, start, end, taints = memRange
+        tuids = [taint.tuid for taint in taints]
+        strRange = "Tainted memory 0x%x-0x%x(%d bytes): %d live taints created from %d to %d\n" %(start, end, end-start+1, len(set(tuids)), first, max(tuids))
+        if (self.taintTracker.inputLabels is None):
+            return strRange
+        labels = ()
+        for taint in taints:
+            labels = unionLabels(labels, taint.inputLabels)
+        if (len(labels) ==0):
+            return strRange
+        return strRange + "Input bytes of memory 0x%x-0x%x: %s\n" %(start, end, self.taintTracker.inputLabels.describe(labels))
+
+    def DumpLive(self, header, bTree):
+        '''
+        Streams every live taint once in the order of creation, DUMP_CHUNK_LINES lines per write. With
+        self.bCoalesceMemory the memory bytes are dumped as ranges of contiguous addresses instead, a range
+        in the order of its oldest taint. Returns a LiveDumpSummary.
+        '''
+        self.taintTracker.FlushPending()
+        output_fd = self.taintTracker.output_fd
+        graph = self.taintTracker.graph
+        live = self.getLiveTaints()
+        ranges = []
+        order = [] #(tuid, range index or -1 for the taint itself)
+        for tuid, entry in live.iteritems():
+            if (not self.bCoalesceMemory):
+                order.append((tuid, -1))
+                continue
+            for location in entry[1]:
+                if (not isinstance(location, (int, long))):
+                    order.append((tuid, -1))
                     break
-	return strTaint
-    
+        if (self.bCoalesceMemory):
+            ranges = self.getLiveRanges(live)
+            for i in range(len(ranges)):
+                order.append((ranges[i][0], i))
+        order.sort()
+        summary = LiveDumpSummary(header)
+        self.dumper.Write([header], output_fd)
+        chunk = []
+        for tuid, i in order:
+            if (i >=0):
+                chunk.append(self.GetLiveRangeLines(ranges[i]))
+                summary.nRanges = summary.nRanges+1
+            else:
+                taint = live[tuid][0]
+                summary.nTaints = summary.nTaints+1
+                if (bTree):
+                    chunk.append("%s \n" %(taint.taint_tree()))
+                    graph.AddProvenance(taint)
+                else:
+                    chunk.append("%s \n" %(taint.taint_simple()))
+                    graph.AddTaint(taint)
+                chunk.append(self.GetInputBytesLine(taint))
+            if (len(chunk) >= DUMP_CHUNK_LINES):
+                self.dumper.Write(chunk, output_fd)
+                summary.Add("".join(chunk))
+                chunk = []
+        self.dumper.Write(chunk, output_fd)
+        summary.Add("".join(chunk))
+        return summary
+
+    def DumpLiveTaintsInOrder(self):
+        return self.DumpLive("Live Taints in the order of creation:\n", True)
+
     def DumpLiveTaints(self):
-        self.taintTracker.output_fd.write("Live Taints:\n")
-        strTaint = "Live Taints:\n"
-        for t in self.taintTracker.dynamic_taint:
-            self.taintTracker.dynamic_taint[t].terminateTaint(-1,-1)
-        for t in self.taintTracker.dynamic_taint:
-            newTaint = strTaint + "%s \n" %(self.taintTracker.dynamic_taint[t].taint_simple())	    
-            strTaint = strTaint + newTaint
-	    self.taintTracker.output_fd.write("%s \n" %(newTaint))
-            #self.output_fd.write("%s \n" %(self.dynamic_taint[t].taint_simple()))
-	return strTaint
+        return self.DumpLive("Live Taints:\n", False)
+
+    def DumpSinkReports(self):
+        '''
+        Dumps every distinct sink finding with its hit count
+        '''
+        strTaint = "Sink findings:\n"
+        for report in self.sinks.reports:
+            strTaint = strTaint + "%s\n" %(report)
+        self.taintTracker.output_fd.write(strTaint)
+        return strTaint
 
     def DumpPCs(self):
+        self.taintTracker.FlushPending()
         self.taintTracker.output_fd.write("Path Conditions:\n")
         strTaint = "Path Conditions:\n" 
         for t in self.taintTracker.pcs:
-            self.taintTracker.output_fd.write("%s \n" %(t.taint_tree()))
-	    strTaint = strTaint + "%s \n" %(t.taint_tree())
+            strTree = "%s \n" %(t.taint_tree())
+            self.taintTracker.output_fd.write(strTree)
+            strTaint = strTaint + strTree
+            self.taintTracker.graph.AddPathCondition(t)
 	return strTaint
@@ -0,0 +1,100 @@
+'''
+   This is the provenance garbage collector for TREE taint tracking.
+
+   Every taint ever created is registered in Taint.uid2Taint and stays there after it is terminated, so
+   memory grows linearly with the trace length. The collector periodically marks every taint that can still
+   be reached from the live shadow state(dynamic_taint), the path conditions(pcs) and the sinks already
+   reported by the taint checker, and sweeps the rest out of Taint.uid2Taint.
+
+   Setting bKeepHistory keeps the full provenance history(no collection at all).
+ */
+'''
+import logging
+from Taint import Taint
+
+log = logging.getLogger('TREE')
+
+DEFAULT_GC_INTERVAL = 1000000 #instructions between two collections, 0 disables periodic collection
+
+class TaintCollector(object):
+    def __init__(self, TP, interval=DEFAULT_GC_INTERVAL, bKeepHistory=False):
+        self.taintTracker = TP
+        self.trackers = [TP] #trackers sharing Taint.uid2Taint, see TaintPolicySet
+        self.interval = interval
+        self.bKeepHistory = bKeepHistory
+        self.nInstructions = 0
+        self.nCollections = 0
+        self.nMarked = 0
+        self.nReclaimed = 0
+        self.nLastReclaimed = 0
+        self.nPeakTaints = 0
+
+    def Tick(self):
+        '''
+        Called once per propagated instruction, collects every self.interval instructions
+        '''
+        self.nInstructions = self.nInstructions+1
+        if (self.interval >0 and self.nInstructions % self.interval ==0):
+            self.Collect()
+
+    def getRoots(self):
+        roots = []
+        for TP in self.trackers:
+            roots.extend(TP.dynamic_taint.values())
+            roots.extend(TP.pcs)
+            roots.extend(TP.TC.sinkTaints.values())
+        if (Taint.store is not None):
+            roots.extend(Taint.store.pinned.values())
+        return roots
+
+    def Mark(self, roots):
+        marked = set()
+        stack = list(roots)
+        while len(stack)!=0:
+            taint = stack.pop()
+            if (taint.tuid in marked):
+                continue
+            marked.add(taint.tuid)
+            for src in taint.dSources:
+                if (src.tuid not in marked):
+                    stack.append(src)
+            for src in taint.cSources:
+                if (src.tuid not in marked):
+                    stack.append(src)
+            for src in taint.bSources:
+                if (src.tuid not in marked):
+                    stack.append(src)
+            for src in taint.aSources:
+                if (src.tuid not in marked):
+                    stack.append(src)
+        return marked
+
+    def Collect(self):
+        '''
+        Mark-and-sweep over Taint.uid2Taint, returns the number of reclaimed provenance nodes
+        '''
+        if (self.bKeepHistory):
+            return 0
+        nBefore = len(Taint.uid2Taint)
+        if (nBefore > self.nPeakTaints):
+            self.nPeakTaints = nBefore
+        marked = self.Mark(self.getRoots())
+
+        live = {}
+        for tid in marked:
+            if (tid in Taint.uid2Taint):
+                live[tid] = Taint.uid2Taint[tid]
+        Taint.uid2Taint = live
+
+        self.nCollections = self.nCollections+1
+        self.nMarked = len(live)
+        self.nLastReclaimed = nBefore - len(live)
+        self.nReclaimed = self.nReclaimed + self.nLastReclaimed
+        sDbg = "TaintCollector: collection %d reclaimed %d of %d provenance nodes" %(self.nCollections, self.nLastReclaimed, nBefore)
+        log.debug(sDbg)
+        return self.nLastReclaimed
+
+    def getStatistics(self):
+        if (self.bKeepHistory):
+            return "Provenance GC: disabled(full history kept), %d provenance nodes\n" %(len(Taint.uid2Taint))
+        return "Provenance GC: %d collections over %d instructions, %d nodes reclaimed(last %d), %d live, peak %d\n" %(self.nCollections, self.nInstructions, self.nReclaimed, self.nLastReclaimed, len(Taint.uid2Taint), self.nPeakTaints)
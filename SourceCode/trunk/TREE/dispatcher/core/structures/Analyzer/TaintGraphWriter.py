@@ -0,0 +1,163 @@
+'''
+   This is the structured taint graph output of TREE.
+
+   Every tracker has a TaintGraphRecorder(TaintTracker.graph) that the checker hands the reported taints
+   to(sink and fault reports, live taints and path conditions) while it dumps them. The recorder turns them
+   into node and edge records and passes each record to the graph sinks registered with AddSink, as soon as
+   it is made: the widgets register one that builds their networkx graph in memory(see
+   Parse.TaintGraphReader), so the graph is complete when the analysis ends and no output is read back.
+   Without a sink nothing is recorded.
+
+   The records are JSON arrays:
+
+   ["N", tuid, type, name, start, end, annotation]   a node, type being "reg", "mem", "in" or "bc", start and
+                                                     end the "sequence:thread" of its creator and terminator
+                                                     (end null while the taint is live) and annotation its
+                                                     creator instruction("caller:function" for an input)
+   ["E", tuid, source, relation]                     an edge from a node to one of its sources, relation
+                                                     being "d", "c" or "b"
+   ["P", tuid]                                       a path condition(TAINT_BRANCH)
+
+   A node is recorded again when it has been terminated since it was last recorded, sinks keep the last
+   record of a node. Its edges are only recorded the first time.
+
+   TaintGraphWriter is the file sink: it writes the records in JSON Lines, one record per line, that
+   Parse.TaintGraphReader loads back.
+ */
+'''
+import json
+from Taint import DUMP_CHUNK_LINES, INITIAL_TAINT, REGISTER_TAINT, MEMORY_TAINT
+
+NODE = "N"
+EDGE = "E"
+PATH_CONDITION = "P"
+
+class TaintGraphSink(object):
+    '''
+    The interface of a graph sink, every record is passed to AddRecord
+    '''
+    def AddRecord(self, record):
+        pass
+
+    def Close(self):
+        pass
+
+class TaintGraphWriter(TaintGraphSink):
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'w')
+        self.records = []
+
+    def AddRecord(self, record):
+        self.records.append(json.dumps(record, separators=(',', ':')) + "\n")
+        if (len(self.records) >= DUMP_CHUNK_LINES):
+            self.Flush()
+
+    def Flush(self):
+        if (len(self.records) !=0):
+            self.file.write("".join(self.records))
+            self.records = []
+
+    def Close(self):
+        if (self.file is not None):
+            self.Flush()
+            self.file.close()
+            self.file = None
+
+class TaintGraphRecorder(object):
+    def __init__(self):
+        self.sinks = []
+        self.nodes = {} #tuid -> end of the node record last recorded
+        self.nNodes = 0
+        self.nEdges = 0
+
+    def AddSink(self, sink):
+        self.sinks.append(sink)
+
+    def Close(self):
+        for sink in self.sinks:
+            sink.Close()
+
+    def Record(self, record):
+        for sink in self.sinks:
+            sink.AddRecord(record)
+
+    def getType(self, taint):
+        if (taint.taintType == REGISTER_TAINT):
+            return "reg"
+        elif (taint.taintType == MEMORY_TAINT):
+            return "mem"
+        elif (taint.taintType == INITIAL_TAINT):
+            return "in"
+        return "bc"
+
+    def getNode(self, taint):
+        '''
+        The node record of taint, with the fields of its taint_simple line
+        '''
+        if isinstance(taint.taintAddress, int):
+            name = hex(taint.taintAddress)
+        else:
+            name = str(taint.taintAddress)
+        start = hex(taint.creatorSequence)+":"+hex(taint.creatorThread)
+        end = None
+        if (taint.terminatorInstruction!=None and taint.terminatorThread !=None):
+            end = hex(taint.terminatorInstruction)+":"+hex(taint.terminatorThread)
+        annotation = taint.creatorInstAmenic
+        if (taint.bDirectInput==True):
+            annotation = hex(taint.InputFunctionCallerAddress)+":"+str(taint.creatorInstAmenic)
+        return [NODE, taint.tuid, self.getType(taint), name, start, end, annotation]
+
+    def AddTaint(self, taint):
+        '''
+        Records the node of taint and, the first time, its edges to its sources
+        '''
+        if (len(self.sinks) ==0):
+            return
+        node = self.getNode(taint)
+        bNew = taint.tuid not in self.nodes
+        if (not bNew and self.nodes[taint.tuid] == node[5]):
+            return
+        self.nodes[taint.tuid] = node[5]
+        self.Record(node)
+        if (not bNew):
+            return
+        self.nNodes = self.nNodes+1
+        if (taint.bDirectInput==True):
+            return
+        dSources, cSources, bSources, aSources = taint.getSources()
+        for relation, sources in (("d", dSources), ("c", cSources), ("b", bSources)):
+            for src in sources:
+                self.Record([EDGE, taint.tuid, src.tuid, relation])
+                self.nEdges = self.nEdges+1
+
+    def AddProvenance(self, taint):
+        '''
+        Records the nodes and edges of the whole provenance of taint
+        '''
+        if (len(self.sinks) ==0):
+            return
+        visited = set()
+        stack = [taint]
+        while len(stack)!=0:
+            t = stack.pop()
+            if (t.tuid in visited):
+                continue
+            visited.add(t.tuid)
+            self.AddTaint(t)
+            if (t.bDirectInput==True):
+                continue
+            dSources, cSources, bSources, aSources = t.getSources()
+            for sources in (bSources, cSources, dSources):
+                for src in reversed(sources):
+                    if (src.tuid not in visited):
+                        stack.append(src)
+
+    def AddPathCondition(self, taint):
+        if (len(self.sinks) ==0):
+            return
+        self.AddProvenance(taint)
+        self.Record([PATH_CONDITION, taint.tuid])
+
+    def getStatistics(self):
+        return "Taint graph: %d nodes, %d edges recorded to %d sinks\n" %(self.nNodes, self.nEdges, len(self.sinks))
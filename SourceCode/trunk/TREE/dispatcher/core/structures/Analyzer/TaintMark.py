@@ -19,18 +19,36 @@ class TaintMarker(object):
         self.taintTracker = TP 
 
     def SetInputTaint(self, INRecord):
+        if (INRecord.sequence in self.taintTracker.inputFilter):
+            Offset, Size = self.taintTracker.inputFilter[INRecord.sequence]
+            self.SetPartialInputTaint(INRecord, Offset, Size)
+            return
+        self.taintTracker.FlushPending()
+        self.taintTracker.dynamic_taint.BeginUpdate()
+        self.taintTracker.sources.append(("in", INRecord.sequence, INRecord.currentInputAddr, INRecord.currentInputSize, 0, INRecord.currentInputSize))
         address = INRecord.currentInputAddr
+        source = None
+        if (self.taintTracker.inputLabels is not None):
+            source = self.taintTracker.inputLabels.registerInput(INRecord)
         for i in range(INRecord.currentInputSize):
             if(address+i in self.taintTracker.dynamic_taint):
                 self.taintTracker.dynamic_taint[address+i].terminateTaint(INRecord.sequence,INRecord.callingThread)
             taint = Taint(INITIAL_TAINT,address+i,INRecord.sequence,INRecord.callingThread, INRecord.inputFunction,True)
             taint.setInputFunctionCaller(INRecord.functionCaller)
+            if (source is not None):
+                taint.inputLabels = self.taintTracker.inputLabels.getLabel(source, i)
             Taint.uid2Taint[taint.tuid]= taint
             self.taintTracker.dynamic_taint[address+i] = taint
             #print("Input Taint: %s" %(taint.taint_simple()))
 
     def SetPartialInputTaint(self, INRecord, Offset,Size):
+        self.taintTracker.FlushPending()
+        self.taintTracker.dynamic_taint.BeginUpdate()
+        self.taintTracker.sources.append(("in", INRecord.sequence, INRecord.currentInputAddr, INRecord.currentInputSize, Offset, Size))
         address = INRecord.currentInputAddr
+        source = None
+        if (self.taintTracker.inputLabels is not None):
+            source = self.taintTracker.inputLabels.registerInput(INRecord)
         for i in range(INRecord.currentInputSize):
             if ((i< Offset) or (i >=Offset+Size)):
                 continue
@@ -38,18 +56,27 @@ class TaintMarker(object):
                 self.taintTracker.dynamic_taint[address+i].terminateTaint(INRecord.sequence,INRecord.callingThread)
             taint = Taint(INITIAL_TAINT,address+i,INRecord.sequence,INRecord.callingThread, INRecord.inputFunction,True)
             taint.setInputFunctionCaller(INRecord.functionCaller)
+            if (source is not None):
+                taint.inputLabels = self.taintTracker.inputLabels.getLabel(source, i)
             Taint.uid2Taint[taint.tuid]= taint
             self.taintTracker.dynamic_taint[address+i] = taint
             
     def setInteractiveTaint(self,taintSource):
+        self.taintTracker.sources.append(("interactive", taintSource))
+        self.taintTracker.dynamic_taint.BeginUpdate()
         split = taintSource.split("_")
         if(split[0]=="mem"):
             address = int(split[1][2:],16)
             size = int(split[2])
+            source = None
+            if (self.taintTracker.inputLabels is not None):
+                source = self.taintTracker.inputLabels.registerSource(address, size, "interactive")
             for i in range(size):
-                if(address+i in self.dynamic_taint):
-                    self.taintTracker.dynamic_taint[address+i].terminateTaint(INRecord.sequence,INRecord.callingThread)
+                if(address+i in self.taintTracker.dynamic_taint):
+                    self.taintTracker.dynamic_taint[address+i].terminateTaint(0,0x0)
                 taint = Taint(MEMORY_TAINT,address+i,0,0x0, "testInteractive")
+                if (source is not None):
+                    taint.inputLabels = self.taintTracker.inputLabels.getLabel(source, i)
                 Taint.uid2Taint[taint.tuid]= taint
                 self.taintTracker.dynamic_taint[address+i] = taint
                 #print("Interactive Taint Source: %s" %(taint.taint_simple()))
@@ -58,9 +85,14 @@ class TaintMarker(object):
             offset = int(split[2])
             size = int(split[3])
             tid = int(split[4])
+            source = None
+            if (self.taintTracker.inputLabels is not None):
+                source = self.taintTracker.inputLabels.registerSource(regName, size, "interactive")
             for i in range(size):
                 regI = regName +"_"+(str(offset+i)+"_"+str(tid))
                 taint = Taint(REGISTER_TAINT,regI, 0,tid,"test interactive reg")
+                if (source is not None):
+                    taint.inputLabels = self.taintTracker.inputLabels.getLabel(source, i)
                 Taint.uid2Taint[taint.tuid]= taint
                 self.taintTracker.dynamic_taint[regI] = taint
                 #print("Interactive Taint Source: %s" %(taint.taint_simple()))
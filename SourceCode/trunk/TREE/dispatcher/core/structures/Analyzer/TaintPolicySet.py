@@ -0,0 +1,85 @@
+'''
+   This is the multi-policy driver for TREE taint tracking.
+
+   A TaintPolicySet runs one TaintTracker per taint policy in lockstep over a single pass of the trace: every
+   record is parsed once, every instruction is decoded once(the trackers share the decoder and the static
+   taint templates), and each tracker keeps its own shadow state and writes its own taint graph output.
+   Provenance is collected over the roots of all trackers since they share Taint.uid2Taint.
+ */
+'''
+import logging
+from TaintTracker import TaintTracker, TAINT_ADDRESS, TAINT_BRANCH, TAINT_COUNTER, TAINT_DATA
+from TaintMark import TaintMarker
+
+log = logging.getLogger('TREE')
+
+#taint graph name begins with A(ddress), B(ranch), C(Counter) or D(ata) depending on policy
+POLICY_PREFIX = {TAINT_ADDRESS:"A", TAINT_BRANCH:"B", TAINT_COUNTER:"C", TAINT_DATA:"D"}
+
+class TaintPolicySet(object):
+    def __init__(self, hostOS, processBits, targetBits, policies, out_fds, trace_type):
+        self.policies = list(policies)
+        self.trackers = {}
+        self.markers = {}
+        firstTracker = None
+        for policy in self.policies:
+            TP = TaintTracker(hostOS, processBits, targetBits, out_fds[policy], policy, trace_type, firstTracker)
+            if (firstTracker is None):
+                firstTracker = TP
+            self.trackers[policy] = TP
+            self.markers[policy] = TaintMarker(TP)
+        for policy in self.policies:
+            self.trackers[policy].TGC.trackers = [self.trackers[p] for p in self.policies]
+
+    def getTracker(self, policy):
+        return self.trackers[policy]
+
+    def LoadImage(self, LRecord):
+        for policy in self.policies:
+            self.trackers[policy].LoadImage(LRecord)
+
+    def SetInputTaint(self, INRecord):
+        for policy in self.policies:
+            self.markers[policy].SetInputTaint(INRecord)
+
+    def Propagator(self, instRec):
+        '''
+        Returns 1 when any policy reports a tainted sink
+        '''
+        bTaint = 0
+        for policy in self.policies:
+            if (self.trackers[policy].Propagator(instRec)==1):
+                bTaint = 1
+        return bTaint
+
+    def DumpLiveTaints(self):
+        '''
+        Dumps the live taints of every policy, path conditions are dumped by DumpPCs
+        '''
+        strTaints = {}
+        for policy in self.policies:
+            TP = self.trackers[policy]
+            if (policy == TAINT_BRANCH):
+                TP.FlushPending()
+                strTaints[policy] = ""
+            else:
+                strTaints[policy] = TP.TC.DumpLiveTaints()
+        return strTaints
+
+    def DumpFaultCause(self, tRecord, tLastERecord, verBose):
+        strTaints = {}
+        for policy in self.policies:
+            strTaints[policy] = self.trackers[policy].TC.DumpFaultCause(tRecord, tLastERecord, verBose)
+        return strTaints
+
+    def DumpSinkReports(self):
+        strTaints = {}
+        for policy in self.policies:
+            strTaints[policy] = self.trackers[policy].TC.DumpSinkReports()
+        return strTaints
+
+    def DumpPCs(self):
+        strTaints = {}
+        for policy in self.policies:
+            strTaints[policy] = self.trackers[policy].TC.DumpPCs()
+        return strTaints
@@ -0,0 +1,177 @@
+'''
+   This is the backward demand-driven slicer for TREE crash triage.
+
+   Instead of forward-propagating the whole trace, the slicer reads the trace once without propagating and
+   builds a def index: for every register byte and memory byte, the trace lines of the instructions that may
+   write it, and whether the write always overwrites it(a mov/push/pop handler that untaints an untainted
+   destination). Starting from the sink operands of the faulting instruction(the ones DumpFaultCause
+   reports), every demanded location is resolved to the writers before the point of demand, back to the
+   last overwriting one, and the sources of those writers are demanded in turn.
+
+   Only the instructions in the slice(and all input records) are then propagated forward by the regular
+   engine, so the fault cause is reported in the same provenance format as a full forward run. The slice
+   follows data dependencies(TAINT_DATA); block and library summaries are not used while replaying it.
+ */
+'''
+import logging
+from bisect import bisect_left
+from TraceParser import Input, Execution, eXception
+from x86Decoder import REGISTER, MEMORY, IMMEDIATE
+from TaintTracker import IDA
+from TaintMark import TaintMarker
+
+log = logging.getLogger('TREE')
+
+class BackwardSlicer(object):
+    def __init__(self, TP):
+        self.taintTracker = TP
+        self.defs = {} #location -> trace lines of its writers, as line*2+1 for overwriting writers, line*2 otherwise
+        self.inputLines = []
+        self.inputLineSet = set()
+        self.nInstructions = 0
+        self.nSliced = 0
+
+    def getSlots(self, instRec):
+        TP = self.taintTracker
+        instInfo = TP.DecodeInstruction(instRec)
+        slots = TP.inst_slots.get(instRec.currentInstruction)
+        if (slots is None):
+            return instInfo, None, [], []
+        if (TP.trace_type == IDA and str(instInfo.attDisa).find("fs:")!=-1):
+            return instInfo, None, [], [] #not propagated by the engine
+        srcNames, destNames = slots.getRegisterNames(TP.x86ISA, instRec.currentThreadId)
+        return instInfo, slots, srcNames, destNames
+
+    def IsOverwrite(self, instInfo):
+        '''
+        True when the propagation handler sets every destination byte whether its source is tainted or not
+        '''
+        TP = self.taintTracker
+        category = instInfo.inst_category
+        if (category in TP.taint_category_stackpop):
+            return instInfo.n_dest_operand==1 and instInfo.dest_operands[0]._type == REGISTER
+        if (category in TP.taint_category_stackpush):
+            return instInfo.n_src_operand==1 and instInfo.src_operands[0]._type in (REGISTER, IMMEDIATE)
+        if (category in TP.taint_category_1To1):
+            if (instInfo.n_src_operand!=1 or instInfo.n_dest_operand!=1):
+                return False
+            src = instInfo.src_operands[0]
+            dest = instInfo.dest_operands[0]
+            if (src._type not in (REGISTER, MEMORY) or str(dest._ea).strip("b'").lower().startswith('eflags')):
+                return False
+            return src._width_bits >= dest._width_bits
+        return False
+
+    def getDefs(self, instRec, instInfo, destNames):
+        defs = list(destNames)
+        if (instRec.currentWriteAddr is not None and instRec.currentWriteSize is not None):
+            defs.extend(xrange(instRec.currentWriteAddr, instRec.currentWriteAddr+instRec.currentWriteSize))
+        return defs
+
+    def getUses(self, instRec, srcNames):
+        uses = list(srcNames)
+        if (instRec.currentReadAddr is not None and instRec.currentReadSize is not None):
+            uses.extend(xrange(instRec.currentReadAddr, instRec.currentReadAddr+instRec.currentReadSize))
+        return uses
+
+    def BuildIndex(self, TR):
+        '''
+        Reads the trace up to the first exception, returns (exception record, faulting instruction record, its line)
+        '''
+        tRecord = TR.getNext()
+        while tRecord is not None:
+            recordLine = TR.record_line
+            tNextRecord = TR.getNext()
+            recordType = tRecord.getRecordType()
+            if (recordType == Input):
+                self.inputLines.append(recordLine)
+                for i in range(tRecord.currentInputSize):
+                    self.defs.setdefault(tRecord.currentInputAddr+i, []).append(recordLine*2+1)
+            elif (recordType == Execution):
+                if (tNextRecord is None):
+                    break
+                if (tNextRecord.getRecordType() == eXception):
+                    return tNextRecord, tRecord, recordLine
+                self.nInstructions = self.nInstructions+1
+                instInfo, slots, srcNames, destNames = self.getSlots(tRecord)
+                if (slots is not None):
+                    entry = recordLine*2
+                    if (self.IsOverwrite(instInfo)):
+                        entry = entry+1
+                    for location in self.getDefs(tRecord, instInfo, destNames):
+                        self.defs.setdefault(location, []).append(entry)
+            tRecord = tNextRecord
+        return None, None, None
+
+    def GetSinkLocations(self, tRecord, tLastERecord):
+        '''
+        The locations DumpFaultCause checks: the registers of the faulting instruction and the memory at
+        the fault address when a register points to it
+        '''
+        locations = []
+        for reg in tLastERecord.reg_value:
+            locations.extend(self.taintTracker.x86ISA.getNormalizedX86RegisterNames(reg, 4, tLastERecord.currentThreadId))
+            if (tLastERecord.reg_value[reg] == tRecord.currentExceptionAddress):
+                locations.extend(xrange(tRecord.currentExceptionAddress, tRecord.currentExceptionAddress+4))
+        return locations
+
+    def Slice(self, TR, sinkLocations, sinkLine):
+        '''
+        Returns the sorted trace lines of the instructions the sink locations depend on
+        '''
+        included = set()
+        visited = set() #(location, writer line) already resolved
+        worklist = [(location, sinkLine) for location in sinkLocations]
+        while worklist:
+            location, line = worklist.pop()
+            writers = self.defs.get(location)
+            if (writers is None):
+                continue
+            pos = bisect_left(writers, line*2)-1
+            while pos >= 0:
+                writer = writers[pos]
+                writerLine = writer >> 1
+                if ((location, writerLine) in visited):
+                    break
+                visited.add((location, writerLine))
+                if (writerLine not in included and writerLine not in self.inputLineSet):
+                    included.add(writerLine)
+                    TR.seek(writerLine)
+                    instRec = TR.getNext()
+                    instInfo, slots, srcNames, destNames = self.getSlots(instRec)
+                    for use in self.getUses(instRec, srcNames):
+                        worklist.append((use, writerLine))
+                if (writer & 1):
+                    break
+                pos = pos-1
+        return sorted(included)
+
+    def Run(self, TR, verBose=False):
+        '''
+        Slices the trace backward from its fault and propagates the slice. Returns the DumpFaultCause
+        output, or None when the trace does not end with a fault(the caller then runs forward as usual).
+        '''
+        TP = self.taintTracker
+        start = TR.current_line #after a resumed checkpoint, the trace is indexed and propagated from there
+        tRecord, tLastERecord, sinkLine = self.BuildIndex(TR)
+        if (tRecord is None or tRecord.currentExceptionCode ==0):
+            TR.seek(start)
+            return None
+        self.inputLineSet = set(self.inputLines)
+        lines = self.Slice(TR, self.GetSinkLocations(tRecord, tLastERecord), sinkLine)
+        self.nSliced = len(lines)
+        sDbg = "BackwardSlicer: %d of %d instructions in the slice of the fault at seq 0x%x" %(self.nSliced, self.nInstructions, tLastERecord.currentInstSeq)
+        log.debug(sDbg)
+
+        TM = TaintMarker(TP)
+        for line in sorted(lines + self.inputLines):
+            TR.seek(line)
+            record = TR.getNext()
+            if (record.getRecordType() == Input):
+                TM.SetInputTaint(record)
+            else:
+                TP.PropagateInstruction(record)
+        return TP.TC.DumpFaultCause(tRecord, tLastERecord, verBose)
+
+    def getStatistics(self):
+        return "Backward slice: %d of %d instructions propagated\n" %(self.nSliced, self.nInstructions)
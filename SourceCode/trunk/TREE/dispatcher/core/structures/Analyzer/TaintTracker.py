@@ -26,6 +26,18 @@ from x86Decoder import x86Decoder, instDecode, IMMEDIATE, REGISTER,MEMORY, WINDO
 from Taint import Taint, INITIAL_TAINT, REGISTER_TAINT, MEMORY_TAINT, BRANCH_TAINT
 from x86ISA import X86ISA
 from TaintChecker import TaintChecker
+from TaintGraphWriter import TaintGraphRecorder
+from TaintCollector import TaintCollector
+from TaintCache import TaintCache, RELATION_DATA
+from InputLabel import InputLabels
+from ShadowState import ShadowState, GranularShadowState, GRANULARITY_BYTE, GRANULARITY_HEAP, DEFAULT_OBJECT_BYTES
+from InstSlots import InstSlots
+from BlockSummary import BlockSummarizer
+from LoopSummary import LoopSummarizer
+from LibrarySummary import LibrarySummarizer
+from Checkpoint import Checkpointer
+from HeapTracker import HeapTracker, HeapShadowState
+from ProvenanceStore import ProvenanceStore
 
 log = logging.getLogger('TREE')
 
@@ -43,18 +55,40 @@ TAINT_LAST =  TAINT_DATA+1 #update when adding new policy
 
 class TaintTracker(object):
     
-    def __init__(self, hostOS, processBits, targetBits, out_fd, taint_policy,trace_type):
+    def __init__(self, hostOS, processBits, targetBits, out_fd, taint_policy,trace_type, sharedTracker=None):
         self.x86ISA = X86ISA()
         self.TC = TaintChecker(self)
-        self.xDecoder = x86Decoder(processBits, targetBits, hostOS)
+        self.TGC = TaintCollector(self) # provenance garbage collector
+        self.TCache = TaintCache(self) # sharing of identical derivations, see TaintCache
+        self.TBS = BlockSummarizer(self) # basic-block transfer summaries
+        self.TLF = LoopSummarizer(self) # loop fast-forward
+        self.TLS = LibrarySummarizer(self) # library function summaries
+        self.TCK = Checkpointer(self) # taint state checkpoints
+        self.THT = HeapTracker(self) # heap allocation tracking
+        self.TDS = ProvenanceStore(self) # disk-backed provenance
         self.targetBits = targetBits
-        self.static_taint = {} #keyed by instruction encoding, and mapping to a static taint template
-        self.dynamic_taint={} #keyed by memory or register/thread address, and mapping to its taint object(defined in Taint) 
+        if (sharedTracker is None):
+            self.xDecoder = x86Decoder(processBits, targetBits, hostOS)
+            self.static_taint = {} #keyed by instruction encoding, and mapping to a static taint template
+        else: # share the decoder and the static taint templates with a tracker running another policy
+            self.xDecoder = sharedTracker.xDecoder
+            self.static_taint = sharedTracker.static_taint
+        self.dynamic_taint=ShadowState() #keyed by memory or register/thread address, and mapping to its taint object(defined in Taint) 
+        self.granularity = GRANULARITY_BYTE # see SetGranularity
+        self.inst_slots = {} #keyed by instruction address, and mapping to the read/write slots of its static taint template
+        if (sharedTracker is not None):
+            self.inst_slots = sharedTracker.inst_slots
+        self.bPrefilter = True # skip instructions that cannot touch live taint
+        self.nSkipped = 0
         self.output_fd = out_fd
+        self.graph = TaintGraphRecorder() #reported taint graph, passed to the graph sinks registered with AddSink
         self.bDebug = False
         self.taint_policy = taint_policy # TAINT_DATA is  DEFAULT
         self.trace_type = trace_type
         self.pcs =[]
+        self.inputLabels = None #InputLabels registry when input-byte labelling is enabled
+        self.inputFilter = {} #input record sequence -> (offset, size) of the input bytes to taint, see Incremental
+        self.sources = [] #taint source assignment applied so far, see TaintMarker
         
         self.category_name={}
         self.category_name[X86ISA.X86_INVALID]="Invalid"
@@ -115,12 +149,119 @@ class TaintTracker(object):
         self.taint_category_misc = {X86ISA.X86_MISC}
         self.taint_category_todo = {X86ISA.X86_MMX, X86ISA.X86_SEMAPHORE, X86ISA.X86_SYSCALL, X86ISA.X86_SYSRET, X86ISA.X86_SYSTEM}        
         self.taint_category_Ignore = {X86ISA.X86_INVALID, X86ISA.X86_UNCOND_BR,X86ISA.X86_ThreeDNOW,X86ISA.X86_VTX,X86ISA.X86_WIDENOP,X86ISA.X86_X87_ALU,X86ISA.X86_XSAVE} #categories that are not significant to TA
+        self.taint_category_skippable = self.taint_category_stackpush | self.taint_category_stackpop | self.taint_category_1To1 | self.taint_category_2To1 | self.taint_category_ret | self.taint_category_branch | self.taint_category_logic | self.taint_category_shift | self.taint_category_eflags | self.taint_category_Ignore
+        self.taint_category_summarizable = (self.taint_category_skippable - self.taint_category_ret - self.taint_category_branch) - {X86ISA.X86_UNCOND_BR} #basic block bodies, see BlockSummary
+        self.taint_category_loop = self.taint_category_summarizable | {X86ISA.X86_UNCOND_BR} #loop bodies, see LoopSummary
+        if (self.taint_policy != TAINT_BRANCH):
+            self.taint_category_loop = self.taint_category_loop | self.taint_category_branch
         if self.bDebug:
             print("Construct Taint Propogater")
         # A few more not defined, should be very rare
         
+    def EnableInputLabels(self):
+        if (self.inputLabels is None):
+            self.inputLabels = InputLabels()
+        return self.inputLabels
+
+    def SetGranularity(self, granularity, objectBytes=DEFAULT_OBJECT_BYTES, fieldBytes=0):
+        '''
+        Tracks taint per byte(GRANULARITY_BYTE), per register and memory word(GRANULARITY_WORD), per register
+        and memory block(GRANULARITY_OBJECT), see GranularShadowState, or per heap object or heap field range
+        of fieldBytes(GRANULARITY_HEAP), see HeapShadowState. Block, loop and library summaries work on byte
+        slots and are bypassed at a coarser granularity.
+        '''
+        self.FlushPending()
+        if (granularity == GRANULARITY_BYTE):
+            state = ShadowState()
+        elif (granularity == GRANULARITY_HEAP):
+            self.THT.bEnabled = True
+            state = HeapShadowState(self.THT.index, self.targetBits, fieldBytes)
+        else:
+            state = GranularShadowState(granularity, self.targetBits, objectBytes)
+        for key, taint in self.dynamic_taint.iteritems():
+            state[key] = taint
+        self.dynamic_taint = state
+        self.granularity = granularity
+
+    def GetInstSlots(self, instInfo):
+        bSkippable = instInfo.inst_category in self.taint_category_skippable
+        if (instInfo.inst_category in self.TC.sinks.categories):
+            bSkippable = False #the sinks check registers that are not slots(ebp at a ret), see SinkRegistry
+        if (self.trace_type == IDA and str(instInfo.attDisa).find("fs:")!=-1):
+            bSkippable = False
+        bEFlags = instInfo.inst_category in self.taint_category_branch or instInfo.inst_category in self.taint_category_2To1
+        return InstSlots(instInfo, bSkippable, bEFlags)
+
+    def CanSkip(self, instRec):
+        '''
+        True when none of the source and destination slots of the instruction holds live taint
+        '''
+        slots = self.inst_slots.get(instRec.currentInstruction)
+        if (slots is None or not slots.bSkippable):
+            return False
+        srcNames, destNames = slots.getRegisterNames(self.x86ISA, instRec.currentThreadId)
+        if (self.dynamic_taint.isRegisterTainted(srcNames) or self.dynamic_taint.isRegisterTainted(destNames)):
+            return False
+        if (slots.srcMemWidth >0 and instRec.currentReadAddr is None):
+            return False
+        if (slots.destMemWidth >0 and instRec.currentWriteAddr is None):
+            return False
+        if (slots.srcMemWidth >0 or slots.destMemWidth >0):
+            if (instRec.currentReadAddr is not None and self.dynamic_taint.isMemoryTainted(instRec.currentReadAddr, slots.memWidth)):
+                return False
+            if (instRec.currentWriteAddr is not None and self.dynamic_taint.isMemoryTainted(instRec.currentWriteAddr, slots.memWidth)):
+                return False
+        return True
+
+    def getPrefilterStatistics(self):
+        nInstructions = self.TGC.nInstructions
+        rate = 0.0
+        if (nInstructions >0):
+            rate = 100.0*self.nSkipped/nInstructions
+        return "Prefilter: %d of %d instructions skipped(%.1f%%)\n" %(self.nSkipped, nInstructions, rate)
+
+    def FlushPending(self):
+        '''
+        Propagates the instructions buffered by the loop, block and library summarizers
+        '''
+        self.TLF.Flush()
+        self.TBS.Flush()
+        self.TLS.Flush()
+        self.dynamic_taint.EndUpdate()
+
+    def LoadImage(self, LRecord):
+        if (self.TLS.bEnabled):
+            self.TLS.LoadImage(LRecord)
+        if (self.THT.bEnabled):
+            self.THT.LoadImage(LRecord)
+        if (len(self.TC.sinks.functions) !=0):
+            self.TC.sinks.LoadImage(LRecord)
+
     def Propagator(self, instRec):
-        bTaint =0
+        if (self.THT.bEnabled):
+            self.THT.Observe(instRec)
+        bSink = 0
+        if (instRec.currentInstruction in self.TC.sinks.addresses):
+            bSink = self.TC.CheckAddressSinks(instRec)
+        if (self.PropagateRecord(instRec)==1):
+            return 1
+        return bSink
+
+    def PropagateRecord(self, instRec):
+        if (self.granularity != GRANULARITY_BYTE):
+            return self.PropagateInstruction(instRec)
+        if (self.TLS.bEnabled and self.TLS.Intercept(instRec)):
+            return 0
+        if (self.TLF.bEnabled):
+            return self.TLF.Propagate(instRec)
+        return self.PropagateBlock(instRec)
+
+    def PropagateBlock(self, instRec):
+        if (self.TBS.bEnabled):
+            return self.TBS.Propagate(instRec)
+        return self.PropagateInstruction(instRec)
+
+    def DecodeInstruction(self, instRec):
         if(not(instRec.currentInstruction in self.static_taint)):                
             instlen = instRec.currentInstSize
             instcode = c_byte*instlen
@@ -143,6 +284,7 @@ class TaintTracker(object):
                     #sDbg = instInfo.getDebugInfo();
                     #log.debug(sDbg)
                 self.static_taint[instRec.currentInstruction] = instInfo
+                self.inst_slots[instRec.currentInstruction] = self.GetInstSlots(instInfo)
             else:
                 sDbg = "instruction %s not supported" %(str(instRec.sEncoding))
                 log.debug(sDbg)
@@ -152,6 +294,22 @@ class TaintTracker(object):
             if self.bDebug:
                 sDbg = instInfo.getDebugInfo()
                 log.debug(sDbg)
+        return instInfo
+
+    def PropagateInstruction(self, instRec):
+        bTaint =0
+        self.dynamic_taint.BeginUpdate()
+        self.TGC.Tick()
+        if (self.TDS.bEnabled):
+            self.TDS.Tick()
+        if (self.bPrefilter and len(self.dynamic_taint)==0):
+            self.nSkipped = self.nSkipped+1
+            return 0
+        instInfo = self.DecodeInstruction(instRec)
+
+        if (self.bPrefilter and self.CanSkip(instRec)):
+            self.nSkipped = self.nSkipped+1
+            return 0
         
         #Propagate according to selected policies
         sDbg = "Beginning Taint Propagating Sequence(%x) for %s:" %(instRec.currentInstSeq, instInfo.attDisa)
@@ -190,6 +348,7 @@ class TaintTracker(object):
             self.TaintPropogateString(instInfo, instRec)
         elif (instInfo.inst_category in self.taint_category_ret):
             self.TaintPropogateRet(instInfo, instRec)
+            return self.TC.TaintCheckTargets(instInfo, instRec)
         elif (instInfo.inst_category in self.taint_category_branch):
             if (self.taint_policy == TAINT_BRANCH):
                 #print "Handle Taint_Branch"
@@ -620,21 +779,110 @@ class TaintTracker(object):
 
     '''
     def TaintPropogateString(self, instInfo, instRec):
-        tid = instRec.currentThreadId
         instStr = str(instInfo.attDisa).strip("b'")
         sDbg = "Taint propagating String %s:\n" %(instStr)
         log.debug(sDbg)
         if self.bDebug:
             print("%s" %sDbg)
-            
+
+        if (instRec.repCount >1):
+            self.TaintPropogateStringRange(instInfo, instRec)
+        else:
+            self.TaintPropogateStringElement(instInfo, instRec, instRec.reg_value["edi"], instRec.reg_value.get("esi"), instRec.currentInstSeq)
+
+    def TaintPropogateStringRange(self, instInfo, instRec):
+        '''
+        A coalesced rep string instruction(see IDBTraceReader.Coalesce), propagated in one pass over the byte
+        range of its elements: destination byte j of element n is derived from source byte j of element n(movs)
+        or from byte j of the stored register(stos), and from the counter under TAINT_COUNTER. The registers are
+        not written by the elements, so their taints are looked up once; overlapping source and destination
+        ranges are propagated element by element in execution order.
+        '''
+        tid = instRec.currentThreadId
+        instStr = str(instInfo.attDisa).strip("b'")
+        count = instRec.repCount
+        if ("ecx" in instRec.reg_value and instRec.reg_value["ecx"] < count):
+            sErr ="\nTaintPropogateString: %d iterations coalesced with ecx=%d\n" %(count, instRec.reg_value["ecx"])
+            log.error(sErr)
+            self.TaintPropogateStringElements(instInfo, instRec)
+            return
+        step = instRec.repWidth*instRec.repDirection
+        destStart = instRec.reg_value["edi"]
+        srcStart = instRec.reg_value.get("esi")
+        for i in range(instInfo.n_dest_operand):
+            if (instInfo.dest_operands[i]._type != MEMORY):
+                continue
+            nBytes = int(instInfo.dest_operands[i]._width_bits/8)
+            size = (count-1)*abs(step)+nBytes
+            destLow = min(destStart, destStart+(count-1)*step)
+            sources = [] #(relation, taints) of every destination byte, in operand order
+            for k in range(instInfo.n_src_operand):
+                operand = instInfo.src_operands[k]
+                if (operand._type == MEMORY and srcStart is not None):
+                    srcLow = min(srcStart, srcStart+(count-1)*step)
+                    if (srcLow < destLow+size and destLow < srcLow+size):
+                        self.TaintPropogateStringElements(instInfo, instRec)
+                        return
+                    if (self.dynamic_taint.isMemoryTainted(srcLow, size)):
+                        sources.append(("memory", None))
+                elif (operand._type == REGISTER):
+                    regName = str(operand._ea).strip("b'")
+                    normalizedSrcRegNames = self.x86ISA.getNormalizedX86RegisterNames(regName, operand._width_bits/8, tid)
+                    if (regName.lower().startswith('ecx')):
+                        if (self.taint_policy == TAINT_COUNTER and self.dynamic_taint.isRegisterTainted(normalizedSrcRegNames)):
+                            sources.append(("counter", [self.dynamic_taint[name] for name in normalizedSrcRegNames if name in self.dynamic_taint]))
+                    elif (regName.lower() in ("eax", "ax", "al") and self.dynamic_taint.isRegisterTainted(normalizedSrcRegNames)):
+                        sources.append(("register", [self.dynamic_taint.get(name) for name in normalizedSrcRegNames]))
+            bDestTainted = self.dynamic_taint.isMemoryTainted(destLow, size)
+            if (len(sources) == 0 and not bDestTainted):
+                continue
+            for n in range(count):
+                sequence = instRec.repSequences[n]
+                destAddress = destStart+n*step
+                for j in range(nBytes):
+                    taint = None
+                    for relation, taints in sources:
+                        if (relation == "memory"):
+                            taints = [self.dynamic_taint.get(srcStart+n*step+j)]
+                        elif (relation == "register"):
+                            taints = taints[j:j+1]
+                        for source in taints:
+                            if (source is None):
+                                continue
+                            if (taint is None):
+                                taint = Taint(MEMORY_TAINT,destAddress+j, sequence,tid,instStr)
+                                Taint.uid2Taint[taint.tuid]= taint
+                            if (relation == "counter"):
+                                taint.addTaintCSources(source)
+                            else:
+                                taint.addTaintDSources(source)
+                    if (bDestTainted and destAddress+j in self.dynamic_taint):
+                        sDbg ="\nTaintPropogateString: Taint Erased:%s\n" %(self.dynamic_taint[destAddress+j])
+                        log.debug(sDbg)
+                        self.dynamic_taint[destAddress+j].terminateTaint(sequence,tid)
+                        del self.dynamic_taint[destAddress+j]
+                    if (taint is not None):
+                        self.dynamic_taint[destAddress+j] = taint
+
+    def TaintPropogateStringElements(self, instInfo, instRec):
+        step = instRec.repWidth*instRec.repDirection
+        destStart = instRec.reg_value["edi"]
+        srcStart = instRec.reg_value.get("esi")
+        for n in range(instRec.repCount):
+            srcAddress = None
+            if (srcStart is not None):
+                srcAddress = srcStart+n*step
+            self.TaintPropogateStringElement(instInfo, instRec, destStart+n*step, srcAddress, instRec.repSequences[n])
+
+    def TaintPropogateStringElement(self, instInfo, instRec, destAddress, srcAddress, sequence):
+        tid = instRec.currentThreadId
+        instStr = str(instInfo.attDisa).strip("b'")
         for i in range(instInfo.n_dest_operand):
             if(instInfo.dest_operands[i]._type == REGISTER):
                 sErr ="\nStringOP suppose to have memory operand, not register:\n"
                 log.error(sErr)
             elif (instInfo.dest_operands[i]._type == MEMORY):
                 nBytes = int(instInfo.dest_operands[i]._width_bits/8)
-                # esi, edi and ecx always?
-                destAddress = instRec.reg_value["edi"]
                 for j in range(nBytes):
                     taint =None
                     for k in range(instInfo.n_src_operand):
@@ -655,19 +903,25 @@ class TaintTracker(object):
                                     for l in range(srcLen):
                                         if (normalizedSrcRegNames[l] in self.dynamic_taint):
                                             if(taint is None):
-                                                taint = Taint(MEMORY_TAINT,destAddress+j, instRec.currentInstSeq,tid,instStr)
+                                                taint = Taint(MEMORY_TAINT,destAddress+j, sequence,tid,instStr)
                                                 Taint.uid2Taint[taint.tuid]= taint
                                                 taint.addTaintCSources(self.dynamic_taint[normalizedSrcRegNames[l]])
                                             else:
                                                 taint.addTaintCSources(self.dynamic_taint[normalizedSrcRegNames[l]])
+                            if(str(instInfo.src_operands[k]._ea).strip("b'").lower() in ("eax", "ax", "al")): #stored register(stos): byte j to byte j of the element
+                                normalizedSrcRegNames = self.x86ISA.getNormalizedX86RegisterNames(str(instInfo.src_operands[k]._ea).strip("b'"), instInfo.src_operands[k]._width_bits/8,tid)
+                                if (j < len(normalizedSrcRegNames) and normalizedSrcRegNames[j] in self.dynamic_taint):
+                                    if(taint is None):
+                                        taint = Taint(MEMORY_TAINT,destAddress+j, sequence,tid,instStr)
+                                        Taint.uid2Taint[taint.tuid]= taint
+                                    taint.addTaintDSources(self.dynamic_taint[normalizedSrcRegNames[j]])
                         elif(instInfo.src_operands[k]._type == MEMORY):
                             # esi, edi and ecx always???
                             #srcAddress = instRec.currentReadAddr
-                            srcAddress = instRec.reg_value["esi"]
                             nBytes = (int)(instInfo.src_operands[k]._width_bits/8)
                             if(srcAddress+j in self.dynamic_taint): # One to One mapping
                                 if(taint is None):
-                                    taint = Taint(MEMORY_TAINT,destAddress+j, instRec.currentInstSeq,tid,instStr)
+                                    taint = Taint(MEMORY_TAINT,destAddress+j, sequence,tid,instStr)
                                     Taint.uid2Taint[taint.tuid]= taint
                                     taint.addTaintDSources(self.dynamic_taint[srcAddress+j])
                                 else:
@@ -676,7 +930,7 @@ class TaintTracker(object):
                     if (destAddress+j in self.dynamic_taint):
                         sDbg ="\nTaintPropogateString: Taint Erased:%s\n" %(self.dynamic_taint[destAddress+j])
                         log.debug(sDbg)
-                        self.dynamic_taint[destAddress+j].terminateTaint(instRec.currentInstSeq,instRec.currentThreadId)
+                        self.dynamic_taint[destAddress+j].terminateTaint(sequence,instRec.currentThreadId)
                         del self.dynamic_taint[destAddress+j]
                     if(taint !=None):
                         self.dynamic_taint[destAddress+j] = taint
@@ -935,10 +1189,10 @@ class TaintTracker(object):
                                     continue
                                 normalizedDestRegNames = self.x86ISA.getNormalizedX86RegisterNames(str(instInfo.dest_operands[k]._ea).strip("b'"), instInfo.dest_operands[k]._width_bits/8,tid)
                                 # for 1-To-1 mode
-                                taint = Taint(REGISTER_TAINT,normalizedDestRegNames[j], instRec.currentInstSeq,tid,instStr)
-                                Taint.uid2Taint[taint.tuid]= taint
                                 srcTaint = self.dynamic_taint[normalizedSrcRegNames[j]]
-                                taint.addTaintDSources(srcTaint)                                
+                                taint = self.TCache.Derive(RELATION_DATA, [srcTaint], REGISTER_TAINT,normalizedDestRegNames[j], instRec.currentInstSeq,tid,instStr)
+                                if(self.dynamic_taint.get(normalizedDestRegNames[j]) is taint):
+                                    continue
                                 if(normalizedDestRegNames[j] in self.dynamic_taint):
                                     self.dynamic_taint[normalizedDestRegNames[j]].terminateTaint(instRec.currentInstSeq,instRec.currentThreadId) 
                                     sDbg ="ERASE %s\n" %(self.dynamic_taint[normalizedDestRegNames[j]])
@@ -948,10 +1202,10 @@ class TaintTracker(object):
                                 log.debug(sDbg)
                             elif(instInfo.dest_operands[k]._type == MEMORY):
                                 destAddress = instRec.currentWriteAddr
-                                taint = Taint(MEMORY_TAINT,destAddress+j, instRec.currentInstSeq, tid,instStr)
-                                Taint.uid2Taint[taint.tuid]= taint
                                 srcTaint = self.dynamic_taint[normalizedSrcRegNames[j]]
-                                taint.addTaintDSources(srcTaint)
+                                taint = self.TCache.Derive(RELATION_DATA, [srcTaint], MEMORY_TAINT,destAddress+j, instRec.currentInstSeq, tid,instStr)
+                                if(self.dynamic_taint.get(destAddress+j) is taint):
+                                    continue
                                 if(destAddress+j in self.dynamic_taint):
                                     self.dynamic_taint[destAddress+j].terminateTaint(instRec.currentInstSeq,instRec.currentThreadId)
                                     #self.output_fd.write("%s\n" %(self.dynamic_taint[destAddress+j]))
@@ -992,10 +1246,10 @@ class TaintTracker(object):
                                     continue
                                 normalizedDestRegNames = self.x86ISA.getNormalizedX86RegisterNames(str(instInfo.dest_operands[k]._ea).strip("b'"), instInfo.dest_operands[k]._width_bits/8,tid)
                                 # for 1-To-1 mode
-                                taint = Taint(REGISTER_TAINT,normalizedDestRegNames[j], instRec.currentInstSeq, tid,instStr)
-                                Taint.uid2Taint[taint.tuid]= taint
                                 srcTaint = self.dynamic_taint[srcAddress+j]
-                                taint.addTaintDSources(srcTaint)
+                                taint = self.TCache.Derive(RELATION_DATA, [srcTaint], REGISTER_TAINT,normalizedDestRegNames[j], instRec.currentInstSeq, tid,instStr)
+                                if(self.dynamic_taint.get(normalizedDestRegNames[j]) is taint):
+                                    continue
                                 if(normalizedDestRegNames[j] in self.dynamic_taint): 
                                     self.dynamic_taint[normalizedDestRegNames[j]].terminateTaint(instRec.currentInstSeq,instRec.currentThreadId)
                                     #self.output_fd.write("%s\n" %(self.dynamic_taint[normalizedDestRegNames[j]]))
@@ -1005,10 +1259,10 @@ class TaintTracker(object):
 
                             elif(instInfo.dest_operands[k]._type == MEMORY):
                                 destAddress = instRec.currentWriteAddr
-                                taint = Taint(MEMORY_TAINT,destAddress+j, instRec.currentInstSeq, tid,instStr)
-                                Taint.uid2Taint[taint.tuid]= taint
                                 srcTaint = self.dynamic_taint[srcAddress+j]
-                                taint.addTaintDSources(srcTaint)
+                                taint = self.TCache.Derive(RELATION_DATA, [srcTaint], MEMORY_TAINT,destAddress+j, instRec.currentInstSeq, tid,instStr)
+                                if(self.dynamic_taint.get(destAddress+j) is taint):
+                                    continue
                                 if(destAddress+j in self.dynamic_taint):
                                     self.dynamic_taint[destAddress+j].terminateTaint(instRec.currentInstSeq,instRec.currentThreadId) 
                                     #self.output_fd.write("%s" %(self.dynamic_taint[destAddress+j]))
@@ -1289,7 +1543,7 @@ class TaintTracker(object):
                 normalizedDestRegNames = self.x86ISA.getNormalizedX86RegisterNames(str(instInfo.dest_operands[i]._ea).strip("b'"), instInfo.dest_operands[i]._width_bits/8,tid)
                 destLen = len(normalizedDestRegNames)
                 for j in range(destLen):
-                    taint =None
+                    srcTaints =[]
                     for k in range(instInfo.n_src_operand):
                         if(instInfo.src_operands[k]._type == REGISTER):
                             if(str(instInfo.dest_operands[k]._ea).strip("b'").lower()== 'eflags'):
@@ -1299,12 +1553,7 @@ class TaintTracker(object):
                             srcLen = len(normalizedSrcRegNames)
                             for l in range(srcLen):
                                 if (normalizedSrcRegNames[l] in self.dynamic_taint):
-                                    if(taint is None):
-                                        taint = Taint(REGISTER_TAINT,normalizedDestRegNames[j], instRec.currentInstSeq,tid,instStr)
-                                        Taint.uid2Taint[taint.tuid]= taint
-                                        taint.addTaintDSources(self.dynamic_taint[normalizedSrcRegNames[l]])
-                                    else:
-                                        taint.addTaintDSources(self.dynamic_taint[normalizedSrcRegNames[l]])                        
+                                    srcTaints.append(self.dynamic_taint[normalizedSrcRegNames[l]])
                         elif(instInfo.src_operands[k]._type == MEMORY):
                             srcAddress = instRec.currentReadAddr
                             nBytes = (int)(instInfo.src_operands[k]._width_bits/8)
@@ -1313,14 +1562,10 @@ class TaintTracker(object):
                                     sDbg ="TaintPropogateBinary: %x is Tainted\n" %(srcAddress+l)
                                     log.debug(sDbg)
 
-                                    if(taint is None):
-                                        taint = Taint(REGISTER_TAINT,normalizedDestRegNames[j], instRec.currentInstSeq,tid,instStr)
-                                        Taint.uid2Taint[taint.tuid]= taint
-                                        taint.addTaintDSources(self.dynamic_taint[srcAddress+l])
-                                    else:
-                                        taint.addTaintDSources(self.dynamic_taint[srcAddress+l])
-                                                                            
-                    if(taint !=None):
+                                    srcTaints.append(self.dynamic_taint[srcAddress+l])
+
+                    if(len(srcTaints)>0):
+                        taint = self.TCache.Derive(RELATION_DATA, srcTaints, REGISTER_TAINT,normalizedDestRegNames[j], instRec.currentInstSeq,tid,instStr,False)
                         self.dynamic_taint[normalizedDestRegNames[j]] = taint
                         sDbg ="\nCreated New Taint for %s : %s\n" %(normalizedDestRegNames[j], self.dynamic_taint[normalizedDestRegNames[j]])
                         log.debug(sDbg)
@@ -1333,7 +1578,7 @@ class TaintTracker(object):
                 nBytes = int(instInfo.dest_operands[i]._width_bits/8)
                 destAddress = instRec.currentWriteAddr
                 for j in range(nBytes):
-                    taint =None
+                    srcTaints =[]
                     for k in range(instInfo.n_src_operand):
                         if(instInfo.src_operands[k]._type == REGISTER):
                             if(str(instInfo.dest_operands[k]._ea).strip("b'").lower()== 'eflags'):
@@ -1343,25 +1588,16 @@ class TaintTracker(object):
                             srcLen = len(normalizedSrcRegNames)
                             for l in range(srcLen):
                                 if (normalizedSrcRegNames[l] in self.dynamic_taint):
-                                    if(taint is None):
-                                        taint = Taint(MEMORY_TAINT,destAddress+j, instRec.currentInstSeq,tid,instStr)
-                                        Taint.uid2Taint[taint.tuid]= taint
-                                        taint.addTaintDSources(self.dynamic_taint[normalizedSrcRegNames[l]])
-                                    else:
-                                        taint.addTaintDSources(self.dynamic_taint[normalizedSrcRegNames[l]])                        
+                                    srcTaints.append(self.dynamic_taint[normalizedSrcRegNames[l]])
                         elif(instInfo.src_operands[k]._type == MEMORY):
                             srcAddress = instRec.currentReadAddr
                             nBytes = (int)(instInfo.src_operands[k]._width_bits/8)
                             for l in range(nBytes):
                                 if(srcAddress+l in self.dynamic_taint):
-                                    if(taint is None):
-                                        taint = Taint(MEMORY_TAINT,destAddress+j, instRec.currentInstSeq,tid,instStr)
-                                        Taint.uid2Taint[taint.tuid]= taint
-                                        taint.addTaintDSources(self.dynamic_taint[srcAddress+l])
-                                    else:
-                                        taint.addTaintDSources(self.dynamic_taint[srcAddress+l])
-                                                                                                    
-                    if(taint !=None):
+                                    srcTaints.append(self.dynamic_taint[srcAddress+l])
+
+                    if(len(srcTaints)>0):
+                        taint = self.TCache.Derive(RELATION_DATA, srcTaints, MEMORY_TAINT,destAddress+j, instRec.currentInstSeq,tid,instStr,False)
                         self.dynamic_taint[destAddress+j] = taint
                         sDbg ="\nCreated New Taint:%s\n" %(self.dynamic_taint[destAddress+j])
                         log.debug(sDbg)
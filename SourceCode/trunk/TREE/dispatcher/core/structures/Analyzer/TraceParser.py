@@ -26,6 +26,10 @@ from x86Thread import X86Thread
 
 Invalid, LoadImage,UnloadImage,Input,ReadMemory,WriteMemory,Execution, Snapshot, eXception = range(9)
 
+REP_PREFIXES = ("f3", "f2")
+OTHER_PREFIXES = ("66", "26", "2e", "36", "3e", "64", "65") #operand size and segment overrides
+STRING_OPCODES = {"a4":1, "a5":4, "a6":1, "a7":4, "aa":1, "ab":4, "ac":1, "ad":4, "ae":1, "af":4} #opcode -> element width
+
 class InstructionEncoding(object):
     def __init__(self):
         self.address = None
@@ -56,6 +60,10 @@ class InstructionTraceRecord(TraceRecord):
         self.currentWriteSize = None
         self.currentWriteValue = {}
         self.reg_value={}
+        self.repCount = 1 #iterations of a coalesced rep string instruction, see IDBTraceReader
+        self.repWidth = 0 #element width in bytes
+        self.repDirection = 1 #1 when esi/edi increment, -1 when they decrement(direction flag set)
+        self.repSequences = None #sequence of every coalesced iteration
 
     def getDebugInfo(self):
         
@@ -103,6 +111,7 @@ class LoadImageTraceRecord(TraceRecord):
     def __init__(self):
         self.recordType = LoadImage
         self.ImageName = None
+        self.ImagePath = None
         self.ImageSize = None
         self.LoadAddress = None
         
@@ -113,15 +122,130 @@ class IDBTraceReader(object):
         self.trace_buffer = trace_buf
         self.lines = self.trace_buffer.splitlines()
         self.current_line = 0
+        self.record_line = 0 #line of the last returned record
+        self.bCoalesceRep = False #merge consecutive iterations of a rep string instruction into one record
+        self.pending = None #(record, line) read ahead while coalescing
     
     def reSet(self):
         self.current_line = 0
-    
+        self.pending = None
+
+    def seek(self, line):
+        '''
+        The next getNext() returns the record at the given line, see Checkpoint
+        '''
+        self.current_line = line
+        self.pending = None
+
+    def getRepWidth(self, tRecord):
+        '''
+        Element width of a rep prefixed string instruction, 0 for any other instruction
+        '''
+        if (not isinstance(tRecord.sEncoding, str)):
+            return 0
+        encoding = tRecord.sEncoding.lower()
+        bRep = False
+        bOperandSize = False
+        while (encoding[:2] in REP_PREFIXES or encoding[:2] in OTHER_PREFIXES):
+            if (encoding[:2] in REP_PREFIXES):
+                bRep = True
+            elif (encoding[:2] == "66"):
+                bOperandSize = True
+            encoding = encoding[2:]
+        width = STRING_OPCODES.get(encoding[:2], 0)
+        if (not bRep):
+            return 0
+        if (bOperandSize and width == 4):
+            return 2
+        return width
+
+    def IsRepIteration(self, tRecord, tLast, tNext):
+        '''
+        True when tNext is the iteration following tLast of the rep string instruction started by tRecord
+        '''
+        if (tNext.getRecordType() != Execution or tNext.currentInstruction != tRecord.currentInstruction):
+            return False
+        if (tNext.currentThreadId != tRecord.currentThreadId or tNext.sEncoding != tRecord.sEncoding):
+            return False
+        if ("ecx" in tLast.reg_value and "ecx" in tNext.reg_value and tNext.reg_value["ecx"] != tLast.reg_value["ecx"]-1):
+            return False
+        step = tRecord.repWidth*tRecord.repDirection
+        bMoved = False
+        for reg in ("esi", "edi"):
+            if (reg in tLast.reg_value):
+                if (reg not in tNext.reg_value):
+                    return False
+                delta = tNext.reg_value[reg] - tLast.reg_value[reg]
+                if (tRecord.repCount == 1 and delta == -tRecord.repWidth):
+                    tRecord.repDirection = -1
+                    step = -tRecord.repWidth
+                if (delta != step):
+                    return False
+                bMoved = True
+        return bMoved
+
+    def Coalesce(self, tRecord):
+        '''
+        Merges the following iterations of a rep string instruction into tRecord; the merged record keeps the
+        registers of the first iteration and its read/write ranges cover every iteration. The last iteration
+        before an exception or the end of the trace is left out, to be read as its own record with its own
+        registers(see DumpFaultCause)
+        '''
+        recordLine = self.record_line
+        lastLine = recordLine
+        tRecord.repWidth = self.getRepWidth(tRecord)
+        tRecord.repSequences = [tRecord.currentInstSeq]
+        tLast = tRecord
+        firstRead = (tRecord.currentReadAddr, tRecord.currentReadSize)
+        firstWrite = (tRecord.currentWriteAddr, tRecord.currentWriteSize)
+        while True:
+            if (self.current_line >= len(self.lines)):
+                self.pending = (None, self.current_line)
+                break
+            tNext = self.getNextRecord()
+            if (tNext is None):
+                self.pending = (None, self.record_line)
+                break
+            if (not self.IsRepIteration(tRecord, tLast, tNext)):
+                self.pending = (tNext, self.record_line)
+                break
+            tRecord.repCount = tRecord.repCount+1
+            tRecord.repSequences.append(tNext.currentInstSeq)
+            tLast = tNext
+            lastLine = self.record_line
+        if (tRecord.repCount >1 and (self.pending[0] is None or self.pending[0].getRecordType() == eXception)):
+            tRecord.repCount = tRecord.repCount-1
+            tRecord.repSequences.pop()
+            self.seek(lastLine)
+        if (tRecord.repCount >1):
+            span = (tRecord.repCount-1)*tRecord.repWidth
+            if (firstRead[0] is not None):
+                tRecord.currentReadAddr = min(firstRead[0], firstRead[0]+span*tRecord.repDirection)
+                tRecord.currentReadSize = span+firstRead[1]
+            if (firstWrite[0] is not None):
+                tRecord.currentWriteAddr = min(firstWrite[0], firstWrite[0]+span*tRecord.repDirection)
+                tRecord.currentWriteSize = span+firstWrite[1]
+        self.record_line = recordLine
+        return tRecord
+
     def getNext(self):
+        if (self.pending is not None):
+            tRecord, self.record_line = self.pending
+            self.pending = None
+            if (tRecord is None):
+                return None
+        else:
+            tRecord = self.getNextRecord()
+        if (self.bCoalesceRep and tRecord is not None and tRecord.getRecordType() == Execution and self.getRepWidth(tRecord) >0):
+            return self.Coalesce(tRecord)
+        return tRecord
+    
+    def getNextRecord(self):
         if(self.trace_buffer is None):
             print("Invalid trace buffer\n")
             return None
 
+        self.record_line = self.current_line
         line =  self.lines[self.current_line]
         self.current_line = self.current_line+1
         line = line.strip()
@@ -169,6 +293,7 @@ class IDBTraceReader(object):
                     log.debug(sDbg)
                     break            
             self.current_line = self.current_line+1
+            self.record_line = self.current_line
             line =  self.lines[self.current_line]
             line = line.strip()
             split = line.split(" ")
@@ -210,6 +335,7 @@ class IDBTraceReader(object):
         csplit = split.split() # default is space, which may have problem with Windows Path
         # Image load, extrac the name from the fullpath
         if len(csplit)>2:               
+            iRecord.ImagePath = csplit[0]
             sImageName = csplit[0].rsplit("\\",1)
             if len(sImageName)>1:
                 iRecord.ImageName = (csplit[0].rsplit("\\",1))[1]
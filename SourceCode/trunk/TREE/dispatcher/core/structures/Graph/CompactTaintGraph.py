@@ -0,0 +1,258 @@
+'''
+   This is the compact store of the taint graph for the TREE widgets.
+
+   A networkx graph of TaintNode objects keyed by uuid strings takes a few hundred bytes per node, gigabytes on
+   a graph of a few million nodes. The store is a graph sink of the tracker(see Analyzer.TaintGraphWriter) that
+   keeps the graph in flat arrays instead: nodes are numbered in the order they are recorded, their attributes
+   are stored by column(strings interned) and the edges in compressed sparse row form, forward(a taint to its
+   sources) and reverse(a source to the taints derived from it), built once the graph is complete(Freeze).
+
+   Only the subgraph being displayed is materialized as a networkx graph of TaintNode objects(getView), the
+   same graph the widgets used to build for the whole taint graph: edges going from a source to the taint
+   derived from it.
+ */
+'''
+from array import array
+from dispatcher.core.structures.Parse.TaintNode import TaintNode
+try:
+    import networkx as nx
+    NetworkX = True
+except:
+    print "[debug] No Networkx library support"
+    pass
+
+NODE_TYPES = ["reg", "mem", "in", "bc"]
+RELATIONS = ["d", "c", "b"]
+NO_TYPE = -1 #a source only referenced by an edge
+NO_END = -2 #live taint, no terminator recorded
+MAX_VIEW_NODES = 5000
+
+class CompactTaintGraph(object):
+    def __init__(self):
+        self.index = {} #tuid -> node
+        self.uuids = array('L')
+        self.types = array('b')
+        self.names = array('l') #interned
+        self.startSequences = array('l')
+        self.startThreads = array('l')
+        self.endSequences = array('l')
+        self.endThreads = array('l')
+        self.annotations = array('l') #interned, -1 for none
+        self.nodeAttrs = array('b') #relation of the last edge to the node as a source, -1 for none
+        self.strings = []
+        self.stringIds = {}
+        self.edgeNodes = array('L') #edges in the order recorded
+        self.edgeSources = array('L')
+        self.edgeRelations = array('b')
+        self.forwardOffsets = None #node -> first edge to its sources in forwardSources
+        self.forwardSources = None
+        self.forwardRelations = None
+        self.reverseOffsets = None #node -> first edge from it in reverseNodes
+        self.reverseNodes = None
+        self.bFrozen = False
+        self.chain = array('L') #tuids recorded before the first path condition, in order
+        self.paths = [] #path conditions
+
+    def __len__(self):
+        return len(self.uuids)
+
+    def Intern(self, s):
+        if (s is None):
+            return -1
+        i = self.stringIds.get(s)
+        if (i is None):
+            i = len(self.strings)
+            self.strings.append(s)
+            self.stringIds[s] = i
+        return i
+
+    def getNode(self, tuid):
+        node = self.index.get(tuid)
+        if (node is None):
+            node = len(self.uuids)
+            self.index[tuid] = node
+            self.uuids.append(tuid)
+            self.types.append(NO_TYPE)
+            self.names.append(-1)
+            self.startSequences.append(0)
+            self.startThreads.append(0)
+            self.endSequences.append(NO_END)
+            self.endThreads.append(NO_END)
+            self.annotations.append(-1)
+            self.nodeAttrs.append(-1)
+        return node
+
+    def AddRecord(self, record):
+        if (record[0] == "N"):
+            self.AddNode(record)
+        elif (record[0] == "E"):
+            self.AddEdge(record)
+        elif (record[0] == "P"):
+            self.paths.append(record[1])
+
+    def Close(self):
+        self.Freeze()
+
+    def AddNode(self, record):
+        tuid = record[1]
+        node = self.getNode(tuid)
+        if (len(self.paths) ==0 and self.types[node] == NO_TYPE):
+            self.chain.append(tuid)
+        self.types[node] = NODE_TYPES.index(record[2])
+        self.names[node] = self.Intern(record[3])
+        sequence, thread = record[4].split(":")
+        self.startSequences[node] = int(sequence, 16)
+        self.startThreads[node] = int(thread, 16)
+        if (record[5] is not None):
+            sequence, thread = record[5].split(":")
+            self.endSequences[node] = int(sequence, 16)
+            self.endThreads[node] = int(thread, 16)
+        self.annotations[node] = self.Intern(record[6])
+
+    def AddEdge(self, record):
+        node = self.getNode(record[1])
+        source = self.getNode(record[2])
+        relation = RELATIONS.index(record[3])
+        self.edgeNodes.append(node)
+        self.edgeSources.append(source)
+        self.edgeRelations.append(relation)
+        self.nodeAttrs[source] = relation
+        self.bFrozen = False
+
+    def Freeze(self):
+        '''
+        Builds the forward and reverse adjacency of the edges recorded so far
+        '''
+        if (self.bFrozen):
+            return
+        n = len(self.uuids)
+        m = len(self.edgeNodes)
+        self.forwardOffsets = self.getOffsets(self.edgeNodes, n)
+        self.reverseOffsets = self.getOffsets(self.edgeSources, n)
+        self.forwardSources = array('L', [0])*m
+        self.forwardRelations = array('b', [0])*m
+        self.reverseNodes = array('L', [0])*m
+        forward = array('L', self.forwardOffsets[:n])
+        reverse = array('L', self.reverseOffsets[:n])
+        for i in xrange(m):
+            node = self.edgeNodes[i]
+            source = self.edgeSources[i]
+            self.forwardSources[forward[node]] = source
+            self.forwardRelations[forward[node]] = self.edgeRelations[i]
+            forward[node] = forward[node]+1
+            self.reverseNodes[reverse[source]] = node
+            reverse[source] = reverse[source]+1
+        self.bFrozen = True
+
+    def getOffsets(self, ends, n):
+        offsets = array('L', [0])*(n+1)
+        for node in ends:
+            offsets[node+1] = offsets[node+1]+1
+        for node in xrange(n):
+            offsets[node+1] = offsets[node+1]+offsets[node]
+        return offsets
+
+    def getSources(self, node):
+        self.Freeze()
+        return self.forwardSources[self.forwardOffsets[node]:self.forwardOffsets[node+1]]
+
+    def getDerived(self, node):
+        self.Freeze()
+        return self.reverseNodes[self.reverseOffsets[node]:self.reverseOffsets[node+1]]
+
+    def getLeaves(self):
+        '''
+        The nodes no recorded taint derives from(the reported taints), newest first
+        '''
+        self.Freeze()
+        leaves = []
+        for node in xrange(len(self.uuids)-1, -1, -1):
+            if (self.reverseOffsets[node] == self.reverseOffsets[node+1]):
+                leaves.append(node)
+        return leaves
+
+    def getProvenance(self, roots, maxNodes=MAX_VIEW_NODES):
+        '''
+        The nodes of the provenance of roots, breadth first and at most maxNodes of them
+        '''
+        self.Freeze()
+        nodes = []
+        visited = set()
+        queue = list(roots)
+        i = 0
+        while i < len(queue) and len(nodes) < maxNodes:
+            node = queue[i]
+            i = i+1
+            if (node in visited):
+                continue
+            visited.add(node)
+            nodes.append(node)
+            for source in self.getSources(node):
+                if (source not in visited):
+                    queue.append(source)
+        return nodes
+
+    def getRecord(self, node):
+        tuid = self.uuids[node]
+        if (self.types[node] == NO_TYPE):
+            return None
+        end = None
+        if (self.endSequences[node] != NO_END):
+            end = hex(self.endSequences[node])+":"+hex(self.endThreads[node])
+        annotation = None
+        if (self.annotations[node] >=0):
+            annotation = self.strings[self.annotations[node]]
+        return ["N", tuid, NODE_TYPES[self.types[node]], self.strings[self.names[node]],
+                hex(self.startSequences[node])+":"+hex(self.startThreads[node]), end, annotation]
+
+    def getTaintNode(self, node):
+        tempNode = TaintNode(self.uuids[node])
+        record = self.getRecord(node)
+        if (record is not None):
+            tempNode.SetData(record)
+        if (self.nodeAttrs[node] >=0):
+            tempNode.SetNodeAttr(RELATIONS[self.nodeAttrs[node]])
+        return tempNode
+
+    def getView(self, tuids=None, maxNodes=MAX_VIEW_NODES):
+        '''
+        Materializes the provenance of tuids(the reported taints when None), at most maxNodes nodes of it, as
+        a networkx graph of TaintNode objects keyed by uuid strings
+        '''
+        self.Freeze()
+        if (tuids is None):
+            roots = self.getLeaves()
+        else:
+            roots = [self.index[tuid] for tuid in tuids if tuid in self.index]
+        return self.getSubgraph(self.getProvenance(roots, maxNodes))
+
+    def getSubgraph(self, nodes):
+        '''
+        Materializes exactly the given nodes and the edges between them
+        '''
+        self.Freeze()
+        view = nx.MultiDiGraph()
+        taintNodes = {}
+        for node in nodes:
+            taintNodes[node] = self.getTaintNode(node)
+            view.add_node(str(self.uuids[node]), inode = taintNodes[node])
+        for node in nodes:
+            tempNode = taintNodes[node]
+            start = self.forwardOffsets[node]
+            for i in xrange(start, self.forwardOffsets[node+1]):
+                source = self.forwardSources[i]
+                relation = RELATIONS[self.forwardRelations[i]]
+                attr = 'child_' + relation
+                if (getattr(tempNode, attr, None) is None):
+                    setattr(tempNode, attr, str(self.uuids[source]))
+                else:
+                    setattr(tempNode, attr, getattr(tempNode, attr) + " " + str(self.uuids[source]))
+                if (source in taintNodes):
+                    view.add_edge(str(self.uuids[source]), str(self.uuids[node]), anno=tempNode.edgeann, edgetype=relation)
+        return view
+
+    def getChain(self):
+        return [str(tuid) for tuid in self.chain]
+
+    def getStatistics(self):
+        return "Compact taint graph: %d nodes, %d edges, %d interned strings\n" %(len(self.uuids), len(self.edgeNodes), len(self.strings))
@@ -0,0 +1,75 @@
+from idaapi import *
+from idautils import *
+from idc import *
+from dispatcher.core.structures.Graph.TaintGraph import TaintGraph
+##################################################################
+#Pass in a TaintGraphSummary, double click drills down to the byte level taints of a node
+class SummaryTaintGraph(TaintGraph):
+  def __init__(self, summary):
+    GraphViewer.__init__(self, "Taint Graph Summary")
+    self.summary = summary
+    self.graph = summary.getView()
+    self.selectedNode = None
+    self.drillDown = None
+
+  def OnDblClick(self, node_id):
+    uuid = self.AddrNode[node_id]
+    if self.drillDown is not None:
+        self.drillDown.Close()
+    self.drillDown = TaintGraph(self.summary.getDrillDown(uuid))
+    self.drillDown.Show()
+    return True
+
+  def OnHint(self, node_id):
+    uuid = self.AddrNode[node_id]
+    tempNode = self.graph.node[uuid]['inode']
+    return "%s\n%d taints, double click to expand" % (tempNode.label(), len(tempNode.members))
+
+  def OnCommand(self, cmd_id):
+    '''
+    Triggered when a menu command is selected through the menu of hotkey
+    @return: None
+    '''
+    if cmd_id == self.cmd_close:
+        self.Close()
+        return
+    elif cmd_id == self.cmd_instructions:
+        self.summary.Collapse()
+    elif cmd_id == self.cmd_functions:
+        self.summary.Collapse(self.getFunctions())
+    elif cmd_id == self.cmd_expand:
+        self.summary.Expand()
+    else:
+        print "[debug] Unknown command:", cmd_id
+        return True
+    print self.summary.getStatistics()
+    self.graph = self.summary.getView()
+    self.Refresh()
+    return True
+
+  def Show(self):
+    if not GraphViewer.Show(self):
+        return False
+    # Add some handy commands to the graph view
+    self.cmd_close =  self.AddCommand("Close", "F2")
+    self.cmd_instructions = self.AddCommand("Collapse by Instruction", "F3")
+    self.cmd_functions = self.AddCommand("Collapse by Function", "F4")
+    self.cmd_expand = self.AddCommand("Expand to Registers and Words", "F5")
+    if self.cmd_close == 0 or self.cmd_instructions == 0 or self.cmd_functions == 0 or self.cmd_expand == 0:
+        print "[debug] Failed to add popup menu item for GraphView"
+    return True
+
+  def getFunctions(self):
+    '''
+    The function name of every instruction address of the taints
+    '''
+    functions = dict()
+    for addr in self.summary.getAddresses():
+        func = idaapi.get_func(addr)
+        if func is None:
+            continue
+        name = GetFunctionName(func.startEA)
+        if not name:
+            name = hex(func.startEA)
+        functions[addr] = name
+    return functions
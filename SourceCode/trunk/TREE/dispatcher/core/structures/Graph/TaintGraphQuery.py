@@ -0,0 +1,256 @@
+'''
+   This is the query module over the compact taint graph(see CompactTaintGraph).
+
+   The graph is indexed once: the nodes are put in topological order(sources first), every node gets its
+   level(the length of its longest chain of sources) and self.nLabels interval labels, GRAIL style: for each
+   label a depth-first traversal from the taints without sources, in a random order of the derived taints,
+   numbers the nodes in post order and the label of a node is the interval of the numbers of the nodes it
+   reaches. A taint derived from u has a higher level than u and its intervals are contained in those of u, so
+   most "does u reach v" queries are answered by the index alone; the others by a traversal pruned by the
+   same tests.
+
+   Nodes are named by tuid in every query. Ancestors are the(transitive) sources of a taint, descendants the
+   taints derived from it.
+ */
+'''
+import random
+from array import array
+from dispatcher.core.structures.Graph.CompactTaintGraph import NODE_TYPES, RELATIONS, NO_TYPE
+
+DEFAULT_LABELS = 2
+
+class TaintGraphQuery(object):
+    def __init__(self, store, nLabels=DEFAULT_LABELS, seed=0):
+        self.store = store
+        self.nLabels = nLabels
+        self.random = random.Random(seed)
+        self.order = None #nodes in topological order
+        self.levels = None
+        self.labels = [] #(low, rank) arrays of every label
+        self.nQueries = 0
+        self.nIndexAnswers = 0
+        self.Build()
+
+    def Build(self):
+        self.store.Freeze()
+        self.BuildOrder()
+        self.labels = []
+        for i in range(self.nLabels):
+            self.labels.append(self.BuildLabel())
+
+    def BuildOrder(self):
+        '''
+        Kahn's algorithm over the source -> derived edges, with the level of every node
+        '''
+        store = self.store
+        n = len(store)
+        pending = array('L', [0])*n #sources not ordered yet
+        self.levels = array('L', [0])*n
+        self.order = array('L')
+        for node in xrange(n):
+            pending[node] = store.forwardOffsets[node+1]-store.forwardOffsets[node]
+            if (pending[node] ==0):
+                self.order.append(node)
+        i = 0
+        while i < len(self.order):
+            node = self.order[i]
+            i = i+1
+            for derived in store.getDerived(node):
+                if (self.levels[derived] < self.levels[node]+1):
+                    self.levels[derived] = self.levels[node]+1
+                pending[derived] = pending[derived]-1
+                if (pending[derived] ==0):
+                    self.order.append(derived)
+
+    def BuildLabel(self):
+        '''
+        One interval label: post order ranks of a randomized depth-first traversal, low being the lowest rank
+        reached from the node
+        '''
+        store = self.store
+        n = len(store)
+        rank = array('L', [0])*n
+        low = array('L', [0])*n
+        visited = array('b', [0])*n
+        nRanked = 0
+        roots = [node for node in self.order if store.forwardOffsets[node+1] == store.forwardOffsets[node]]
+        self.random.shuffle(roots)
+        for root in roots:
+            if (visited[root]):
+                continue
+            visited[root] = 1
+            stack = [(root, self.getShuffled(store.getDerived(root)))]
+            while len(stack)!=0:
+                node, children = stack[-1]
+                if (len(children) !=0):
+                    child = children.pop()
+                    if (not visited[child]):
+                        visited[child] = 1
+                        stack.append((child, self.getShuffled(store.getDerived(child))))
+                    continue
+                stack.pop()
+                nRanked = nRanked+1
+                rank[node] = nRanked
+        #low over everything reached, not only the traversal tree: derived taints come later in topological order
+        for i in xrange(len(self.order)-1, -1, -1):
+            node = self.order[i]
+            nodeLow = rank[node]
+            for derived in store.getDerived(node):
+                if (low[derived] < nodeLow):
+                    nodeLow = low[derived]
+            low[node] = nodeLow
+        return (low, rank)
+
+    def getShuffled(self, nodes):
+        nodes = list(nodes)
+        self.random.shuffle(nodes)
+        return nodes
+
+    def getNodes(self, tuids):
+        return [self.store.index[tuid] for tuid in tuids if tuid in self.store.index]
+
+    def getTuids(self, nodes):
+        return [self.store.uuids[node] for node in nodes]
+
+    def isExcluded(self, u, v):
+        '''
+        True when the index proves that v is not reachable from u
+        '''
+        if (self.levels[u] >= self.levels[v]):
+            return True
+        for low, rank in self.labels:
+            if (low[v] < low[u] or rank[v] > rank[u]):
+                return True
+        return False
+
+    def Reaches(self, sourceTuid, tuid):
+        '''
+        True when tuid derives(transitively) from sourceTuid, e.g. an input byte reaching a sink taint
+        '''
+        self.nQueries = self.nQueries+1
+        if (sourceTuid not in self.store.index or tuid not in self.store.index):
+            return False
+        u = self.store.index[sourceTuid]
+        v = self.store.index[tuid]
+        if (u == v):
+            return True
+        if (self.isExcluded(u, v)):
+            self.nIndexAnswers = self.nIndexAnswers+1
+            return False
+        visited = set([u])
+        stack = [u]
+        while len(stack)!=0:
+            node = stack.pop()
+            for derived in self.store.getDerived(node):
+                if (derived == v):
+                    return True
+                if (derived not in visited and not self.isExcluded(derived, v)):
+                    visited.add(derived)
+                    stack.append(derived)
+        return False
+
+    def Walk(self, node, bForward, maxDepth=None, relations=None):
+        '''
+        The nodes reached from node, breadth first, over the sources(bForward) or the derived taints
+        '''
+        store = self.store
+        reached = []
+        visited = set([node])
+        frontier = [node]
+        depth = 0
+        while len(frontier)!=0 and (maxDepth is None or depth < maxDepth):
+            depth = depth+1
+            nextFrontier = []
+            for current in frontier:
+                if (bForward):
+                    start = store.forwardOffsets[current]
+                    neighbors = store.forwardSources[start:store.forwardOffsets[current+1]]
+                    edgeRelations = store.forwardRelations[start:store.forwardOffsets[current+1]]
+                else:
+                    neighbors = store.getDerived(current)
+                    edgeRelations = None
+                for i in xrange(len(neighbors)):
+                    if (relations is not None and edgeRelations is not None and RELATIONS[edgeRelations[i]] not in relations):
+                        continue
+                    neighbor = neighbors[i]
+                    if (neighbor not in visited):
+                        visited.add(neighbor)
+                        reached.append(neighbor)
+                        nextFrontier.append(neighbor)
+            frontier = nextFrontier
+        return reached
+
+    def getAncestors(self, tuid, maxDepth=None, relations=None):
+        '''
+        The tuids tuid derives from, nearest first, following only the given relations("d", "c", "b") if any
+        '''
+        self.nQueries = self.nQueries+1
+        if (tuid not in self.store.index):
+            return []
+        return self.getTuids(self.Walk(self.store.index[tuid], True, maxDepth, relations))
+
+    def getDescendants(self, tuid, maxDepth=None):
+        '''
+        The tuids derived from tuid, nearest first
+        '''
+        self.nQueries = self.nQueries+1
+        if (tuid not in self.store.index):
+            return []
+        return self.getTuids(self.Walk(self.store.index[tuid], False, maxDepth))
+
+    def getLowestCommonSources(self, tuid1, tuid2):
+        '''
+        The common ancestors of two taints that no other common ancestor derives from
+        '''
+        self.nQueries = self.nQueries+1
+        if (tuid1 not in self.store.index or tuid2 not in self.store.index):
+            return []
+        common = set(self.Walk(self.store.index[tuid1], True)) & set(self.Walk(self.store.index[tuid2], True))
+        lowest = []
+        for node in common:
+            #a common ancestor reaching another one reaches it through a derived taint that is a common ancestor too
+            bLowest = True
+            for derived in self.store.getDerived(node):
+                if (derived in common):
+                    bLowest = False
+                    break
+            if (bLowest):
+                lowest.append(node)
+        lowest.sort()
+        return self.getTuids(lowest)
+
+    def Filter(self, tuids=None, address=None, sequences=None, nodeType=None):
+        '''
+        The tuids(all of them when None) whose taint is at address(a memory address or a register name),
+        was created within the (first, last) sequence range and/or is of nodeType("reg", "mem", "in" or "bc")
+        '''
+        store = self.store
+        if (tuids is None):
+            nodes = xrange(len(store))
+        else:
+            nodes = self.getNodes(tuids)
+        name = None
+        if (address is not None):
+            if (isinstance(address, (int, long))):
+                address = hex(address)
+            name = store.stringIds.get(address)
+            if (name is None):
+                return []
+        typeCode = None
+        if (nodeType is not None):
+            typeCode = NODE_TYPES.index(nodeType)
+        matches = []
+        for node in nodes:
+            if (store.types[node] == NO_TYPE):
+                continue
+            if (name is not None and store.names[node] != name):
+                continue
+            if (typeCode is not None and store.types[node] != typeCode):
+                continue
+            if (sequences is not None and (store.startSequences[node] < sequences[0] or store.startSequences[node] > sequences[1])):
+                continue
+            matches.append(store.uuids[node])
+        return matches
+
+    def getStatistics(self):
+        return "Taint graph queries: %d nodes indexed with %d labels, %d queries, %d answered by the index alone\n" %(len(self.order), len(self.labels), self.nQueries, self.nIndexAnswers)
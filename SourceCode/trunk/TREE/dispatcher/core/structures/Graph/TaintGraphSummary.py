@@ -0,0 +1,323 @@
+'''
+   This is the summarized view of the compact taint graph(see CompactTaintGraph) for graphs too large to display
+   byte by byte.
+
+   The taints are put in groups, a group being a node of the summary:
+   - the byte taints of the same register or memory word created at the same sequence and thread(the bytes of
+     eax written by one instruction, a dword stored to memory) are one group;
+   - collapsed on demand(Collapse), the taints created by the same instruction, or by the instructions of the
+     same function, are one group, whatever their location.
+
+   Groups with exactly one source group and one derived group(a value moved from register to memory and back)
+   are then contracted: the edge from the source group to the derived group is annotated with the number of
+   contracted groups and their instructions instead. Input taints, the reported taints and collapsed groups are
+   never contracted.
+
+   Each node of the summary view(getView) is a TaintNode of the group representative(its first taint) named
+   after the group, with the tuids of its taints in members. getDrillDown materializes the byte level taints
+   of a summary node, with those of the chains contracted into its incoming edges.
+ */
+'''
+from array import array
+from dispatcher.core.structures.Graph.CompactTaintGraph import NODE_TYPES, RELATIONS, NO_TYPE, MAX_VIEW_NODES
+try:
+    import networkx as nx
+    NetworkX = True
+except:
+    print "[debug] No Networkx library support"
+    pass
+
+WORD_BYTES = 4
+MAX_EDGE_INSTRUCTIONS = 3 #instructions listed on a contracted edge
+
+class TaintGraphSummary(object):
+    def __init__(self, store, addresses=None):
+        self.store = store
+        self.addresses = addresses #sequence -> instruction address, see AnalyzerWidget.node_ea
+        if (self.addresses is None):
+            self.addresses = {}
+        self.keys = None #instruction address -> collapse key, None when not collapsed
+        self.groups = None #node -> group
+        self.members = [] #group -> nodes
+        self.names = [] #group -> display name
+        self.bCollapsed = None #group -> collapsed by instruction or function
+        self.bContracted = None #group -> contracted into an edge
+        self.sources = [] #group -> {source group: relation}
+        self.edges = {} #(source group, group) of the summary -> [relation, contracted groups]
+        self.Build()
+
+    def Collapse(self, keys=None):
+        '''
+        Collapses the taints by instruction(keys None) or by the given key of their instruction address, e.g.
+        the start of its function
+        '''
+        if (keys is None):
+            keys = {}
+            for node in xrange(len(self.store)):
+                address = self.getAddress(node)
+                if (address is not None):
+                    keys[address] = address
+        self.keys = keys
+        self.Build()
+
+    def Expand(self):
+        self.keys = None
+        self.Build()
+
+    def Build(self):
+        self.store.Freeze()
+        self.BuildGroups()
+        self.BuildSources()
+        self.Contract()
+
+    def getAddress(self, node):
+        if (self.store.types[node] == NO_TYPE):
+            return None
+        sequence = self.store.startSequences[node]
+        address = self.addresses.get(hex(sequence))
+        if (address is None):
+            address = self.addresses.get(sequence) #pin traces
+        return address
+
+    def getAddresses(self):
+        '''
+        The instruction addresses of the taints, e.g. to map them to functions for Collapse
+        '''
+        addresses = set()
+        for node in xrange(len(self.store)):
+            address = self.getAddress(node)
+            if (address is not None):
+                addresses.add(address)
+        return addresses
+
+    def getSiblingKey(self, node):
+        '''
+        The location of node at word granularity, with its creator sequence and thread
+        '''
+        store = self.store
+        if (store.types[node] == NO_TYPE):
+            return ("node", node)
+        name = store.strings[store.names[node]]
+        location = name
+        if (NODE_TYPES[store.types[node]] == "reg"):
+            #normalized register bytes, e.g. eax_2_1 is byte 2 of eax in thread 1
+            parts = name.split("_")
+            if (len(parts) >= 3):
+                location = parts[0] + "_" + parts[-1]
+        else:
+            try:
+                location = int(name.rstrip("L"), 16) & ~(WORD_BYTES-1)
+            except ValueError:
+                pass
+        return (store.startSequences[node], store.startThreads[node], store.types[node], location)
+
+    def BuildGroups(self):
+        store = self.store
+        n = len(store)
+        self.groups = array('l', [0])*n
+        self.members = []
+        self.bCollapsed = array('b')
+        groupIds = {}
+        for node in xrange(n):
+            key = None
+            if (self.keys is not None):
+                address = self.getAddress(node)
+                if (address is not None and address in self.keys):
+                    key = ("key", self.keys[address])
+            if (key is None):
+                key = self.getSiblingKey(node)
+            group = groupIds.get(key)
+            if (group is None):
+                group = len(self.members)
+                groupIds[key] = group
+                self.members.append([])
+                self.bCollapsed.append(key[0] == "key")
+            self.groups[node] = group
+            self.members[group].append(node)
+        self.names = []
+        for group in xrange(len(self.members)):
+            self.names.append(self.getGroupName(group))
+
+    def getGroupName(self, group):
+        store = self.store
+        nodes = self.members[group]
+        representative = nodes[0]
+        if (store.types[representative] == NO_TYPE):
+            return str(store.uuids[representative])
+        if (self.bCollapsed[group]):
+            address = self.getAddress(representative)
+            key = self.keys[address]
+            if (isinstance(key, (int, long))):
+                key = hex(key)
+            return "%s(%d taints)" %(key, len(nodes))
+        name = store.strings[store.names[representative]]
+        if (NODE_TYPES[store.types[representative]] == "reg"):
+            return name.split("_")[0]
+        if (len(nodes) == 1):
+            return name
+        try:
+            addresses = [int(store.strings[store.names[node]].rstrip("L"), 16) for node in nodes]
+        except ValueError:
+            return name
+        return "%s-%s" %(hex(min(addresses)), hex(max(addresses)))
+
+    def BuildSources(self):
+        '''
+        The edges between groups, the first relation recorded for a pair of groups
+        '''
+        store = self.store
+        self.sources = []
+        for group in xrange(len(self.members)):
+            self.sources.append({})
+        for node in xrange(len(store)):
+            group = self.groups[node]
+            groupSources = self.sources[group]
+            for i in xrange(store.forwardOffsets[node], store.forwardOffsets[node+1]):
+                source = self.groups[store.forwardSources[i]]
+                if (source != group and source not in groupSources):
+                    groupSources[source] = store.forwardRelations[i]
+
+    def Contract(self):
+        store = self.store
+        nGroups = len(self.members)
+        nDerived = array('L', [0])*nGroups
+        for group in xrange(nGroups):
+            for source in self.sources[group]:
+                nDerived[source] = nDerived[source]+1
+        self.bContracted = array('b', [0])*nGroups
+        for group in xrange(nGroups):
+            representative = self.members[group][0]
+            if (self.bCollapsed[group] or store.types[representative] == NO_TYPE or NODE_TYPES[store.types[representative]] == "in"):
+                continue
+            if (len(self.sources[group]) == 1 and nDerived[group] == 1):
+                self.bContracted[group] = 1
+        #an edge of the summary from every kept group to the kept groups its derived chains end at
+        self.edges = {}
+        for group in xrange(nGroups):
+            if (self.bContracted[group]):
+                continue
+            for source in self.sources[group]:
+                relation = self.sources[group][source]
+                contracted = []
+                while self.bContracted[source]:
+                    contracted.append(source)
+                    source = self.sources[source].keys()[0]
+                contracted.reverse()
+                edge = self.edges.get((source, group))
+                if (edge is None):
+                    self.edges[(source, group)] = [relation, contracted]
+                else:
+                    edge[1].extend(contracted)
+
+    def getGroup(self, uuid):
+        node = self.store.index.get(int(uuid))
+        if (node is None):
+            return None
+        return self.groups[node]
+
+    def getMembers(self, uuid):
+        '''
+        The tuids of the taints of a summary node
+        '''
+        group = self.getGroup(uuid)
+        if (group is None):
+            return []
+        return [self.store.uuids[node] for node in self.members[group]]
+
+    def getEdgeAnnotation(self, group, contracted):
+        annotation = self.store.getTaintNode(self.members[group][0]).edgeann
+        if (len(contracted) == 0):
+            return annotation
+        instructions = []
+        for source in contracted:
+            instruction = self.store.getTaintNode(self.members[source][0]).edgeann
+            if (instruction not in instructions):
+                instructions.append(instruction)
+        text = "; ".join([str(instruction) for instruction in instructions[:MAX_EDGE_INSTRUCTIONS]])
+        if (len(instructions) > MAX_EDGE_INSTRUCTIONS):
+            text = text + "; ..."
+        return "%s <- %d contracted: %s" %(annotation, len(contracted), text)
+
+    def getView(self, maxNodes=MAX_VIEW_NODES):
+        '''
+        Materializes the summary, at most maxNodes groups of it from the reported taints, as a networkx graph
+        of TaintNode objects keyed by the uuid string of the group representative
+        '''
+        store = self.store
+        groupSources = {}
+        isSource = set()
+        for source, group in self.edges:
+            groupSources.setdefault(group, []).append(source)
+            isSource.add(source)
+        roots = []
+        for group in xrange(len(self.members)-1, -1, -1):
+            if (not self.bContracted[group] and group not in isSource):
+                roots.append(group)
+        #collapsed groups may be in cycles(a loop) that no root reaches
+        for group in xrange(len(self.members)-1, -1, -1):
+            if (not self.bContracted[group] and group in isSource):
+                roots.append(group)
+        groups = []
+        visited = set()
+        queue = roots
+        i = 0
+        while i < len(queue) and len(groups) < maxNodes:
+            group = queue[i]
+            i = i+1
+            if (group in visited):
+                continue
+            visited.add(group)
+            groups.append(group)
+            for source in groupSources.get(group, []):
+                if (source not in visited):
+                    queue.append(source)
+        view = nx.MultiDiGraph()
+        taintNodes = {}
+        for group in groups:
+            representative = self.members[group][0]
+            tempNode = store.getTaintNode(representative)
+            tempNode.name = self.names[group]
+            tempNode.members = [store.uuids[node] for node in self.members[group]]
+            tempNode.setEA(self.getAddress(representative))
+            taintNodes[group] = tempNode
+            view.add_node(tempNode.uuid, inode = tempNode)
+        for source, group in self.edges:
+            if (group not in taintNodes):
+                continue
+            relation, contracted = self.edges[(source, group)]
+            relation = RELATIONS[relation]
+            tempNode = taintNodes[group]
+            sourceUuid = str(store.uuids[self.members[source][0]])
+            attr = 'child_' + relation
+            if (getattr(tempNode, attr, None) is None):
+                setattr(tempNode, attr, sourceUuid)
+            else:
+                setattr(tempNode, attr, getattr(tempNode, attr) + " " + sourceUuid)
+            if (source in taintNodes):
+                taintNodes[source].SetNodeAttr(relation)
+                view.add_edge(sourceUuid, tempNode.uuid, anno=self.getEdgeAnnotation(group, contracted), edgetype=relation)
+        return view
+
+    def getDrillDown(self, uuid):
+        '''
+        Materializes the taints of a summary node and of the chains contracted into its incoming edges
+        '''
+        group = self.getGroup(uuid)
+        if (group is None):
+            return nx.MultiDiGraph()
+        nodes = list(self.members[group])
+        for source, derived in self.edges:
+            if (derived == group):
+                for contracted in self.edges[(source, derived)][1]:
+                    nodes.extend(self.members[contracted])
+        view = self.store.getSubgraph(nodes)
+        for node in nodes:
+            view.node[str(self.store.uuids[node])]['inode'].setEA(self.getAddress(node))
+        return view
+
+    def getStatistics(self):
+        nGroups = len(self.members)
+        nContracted = 0
+        for group in xrange(nGroups):
+            nContracted = nContracted+self.bContracted[group]
+        return "Taint graph summary: %d nodes in %d groups, %d groups contracted into edges, %d nodes and %d edges shown\n" %(len(self.store), nGroups, nContracted, nGroups-nContracted, len(self.edges))
@@ -0,0 +1,56 @@
+import json
+from dispatcher.core.structures.Parse.TaintNode import TaintNode
+
+class TaintGraphReader(object):
+    '''
+    Builds a networkx graph from the structured taint graph records(see Analyzer.TaintGraphWriter), edges going
+    from a source to the taint derived from it. It is a graph sink of the tracker(Analyzer.TaintGraphSink), the
+    records being added as the analysis makes them, or loads the records written by a TaintGraphWriter.
+    '''
+    def __init__(self, graph):
+        self.graph = graph
+        self.chain = [] #nodes recorded before the first path condition, in order
+        self.chained = set()
+        self.paths = [] #path conditions
+
+    def AddRecord(self, record):
+        if record[0] == "N":
+            self.AddNode(record)
+        elif record[0] == "E":
+            self.AddEdge(record)
+        elif record[0] == "P":
+            self.paths.append(str(record[1]))
+
+    def Close(self):
+        pass
+
+    def Load(self, path):
+        for line in open(path, 'r'):
+            self.AddRecord(json.loads(line))
+
+    def AddNode(self, record):
+        uuid = str(record[1])
+        if len(self.paths) == 0 and uuid not in self.chained:
+            self.chain.append(uuid)
+            self.chained.add(uuid)
+        if self.graph.has_node(uuid):
+            self.graph.node[uuid]['inode'].SetData(record)
+            return
+        tempNode = TaintNode()
+        tempNode.SetData(record)
+        self.graph.add_node(uuid, inode = tempNode)
+
+    def AddEdge(self, record):
+        uuid = str(record[1])
+        child = str(record[2])
+        relation = record[3]
+        node = self.graph.node[uuid]['inode']
+        attr = 'child_' + relation
+        if getattr(node, attr, None) is None:
+            setattr(node, attr, child)
+        else:
+            setattr(node, attr, getattr(node, attr) + " " + child)
+        if not self.graph.has_node(child):
+            self.graph.add_node(child, inode = TaintNode(child))
+        self.graph.node[child]['inode'].SetNodeAttr(relation)
+        self.graph.add_edge(child, uuid, anno=node.edgeann, edgetype=relation)
@@ -7,6 +7,12 @@ class TaintNode(object):
         self.node_label = None
         self.typ = None
         self.depth = 0
+        self.name = None
+        self.startind = None
+        self.endind = None
+        self.edgeann = None
+        self.child_c = None
+        self.child_d = None
 
     def __str__(self):
         return self.uuid
@@ -30,6 +36,15 @@ class TaintNode(object):
     def setLib(self, s):
         self.lib = s
         
+    def SetData(self, record):
+        #node record of the structured taint graph, see Analyzer.TaintGraphWriter
+        self.uuid = str(record[1])
+        self.typ = record[2]
+        self.name = record[3]
+        self.startind = record[4]
+        self.endind = record[5]
+        self.edgeann = record[6]
+
     def ExtractData(self, s):
         #Temporary solution is to parse a text file until we get the C struct passed in
         import re
@@ -31,6 +31,9 @@ class AnalyzerWidget(QtGui.QMainWindow):
         self._definePropEnum()
         self.t_graph = nx.MultiDiGraph()
         self.in_taint_chain = []
+        self.taint_store = None #compact taint graph of the last analysis, t_graph being the displayed part of it
+        self.taint_query = None
+        self.taint_summary = None
         self.ExTraces = idaapi.netnode("$ ExTraces", 0, False) #Get the execution trace id
         self.trace_data = self.ExTraces.getblob(0, 'A') #Get the execution trace data, use str(data) to convert to data to a str
         self._createGui()
@@ -97,6 +100,60 @@ class AnalyzerWidget(QtGui.QMainWindow):
         vbox2.addWidget(self.pin_trace_cb)
         self.verbose_trace_cb = QtGui.QCheckBox("Verbose")
         vbox2.addWidget(self.verbose_trace_cb)
+        self.full_history_cb = QtGui.QCheckBox("Keep Full History")
+        vbox2.addWidget(self.full_history_cb)
+        self.input_labels_cb = QtGui.QCheckBox("Input Byte Labels")
+        vbox2.addWidget(self.input_labels_cb)
+        self.share_taints_cb = QtGui.QCheckBox("Share Identical Taints")
+        vbox2.addWidget(self.share_taints_cb)
+        self.block_summaries_cb = QtGui.QCheckBox("Block Summaries")
+        vbox2.addWidget(self.block_summaries_cb)
+        self.loop_fast_forward_cb = QtGui.QCheckBox("Loop Fast-Forward")
+        vbox2.addWidget(self.loop_fast_forward_cb)
+        self.library_summaries_cb = QtGui.QCheckBox("Library Summaries")
+        vbox2.addWidget(self.library_summaries_cb)
+        self.verify_summaries_cb = QtGui.QCheckBox("Verify Library Summaries")
+        vbox2.addWidget(self.verify_summaries_cb)
+        self.all_policies_cb = QtGui.QCheckBox("All Policies In One Pass")
+        vbox2.addWidget(self.all_policies_cb)
+        self.checkpoints_cb = QtGui.QCheckBox("Checkpoints")
+        vbox2.addWidget(self.checkpoints_cb)
+        self.resume_cb = QtGui.QCheckBox("Resume From Checkpoint")
+        vbox2.addWidget(self.resume_cb)
+        self.incremental_cb = QtGui.QCheckBox("Incremental Re-analysis")
+        vbox2.addWidget(self.incremental_cb)
+        self.input_filter_edit = QtGui.QLineEdit()
+        self.input_filter_edit.setPlaceholderText("Input filter: seq:offset:size, ...")
+        vbox2.addWidget(self.input_filter_edit)
+        self.backward_slice_cb = QtGui.QCheckBox("Backward Slice From Fault")
+        vbox2.addWidget(self.backward_slice_cb)
+        self.coalesce_rep_cb = QtGui.QCheckBox("Coalesce REP Strings")
+        self.coalesce_rep_cb.setChecked(True)
+        vbox2.addWidget(self.coalesce_rep_cb)
+        self.parallel_cb = QtGui.QCheckBox("Parallel Segments")
+        vbox2.addWidget(self.parallel_cb)
+        self.coarse_provenance_cb = QtGui.QCheckBox("Coarse Provenance")
+        vbox2.addWidget(self.coarse_provenance_cb)
+        self.granularity_combo = QtGui.QComboBox()
+        self.granularity_combo.addItems(["Byte Granularity", "Word Granularity", "Object Granularity", "Heap Object Granularity", "Heap Field Granularity"])
+        vbox2.addWidget(self.granularity_combo)
+        self.heap_objects_cb = QtGui.QCheckBox("Track Heap Objects")
+        vbox2.addWidget(self.heap_objects_cb)
+        self.function_sinks_cb = QtGui.QCheckBox("Library Argument Sinks")
+        vbox2.addWidget(self.function_sinks_cb)
+        self.coalesce_live_cb = QtGui.QCheckBox("Coalesce Live Memory Ranges")
+        vbox2.addWidget(self.coalesce_live_cb)
+        self.export_text_cb = QtGui.QCheckBox("Export Text Taint Graph")
+        vbox2.addWidget(self.export_text_cb)
+        self.export_graph_cb = QtGui.QCheckBox("Export Taint Graph File")
+        vbox2.addWidget(self.export_graph_cb)
+        self.spill_provenance_cb = QtGui.QCheckBox("Spill Provenance To Disk")
+        vbox2.addWidget(self.spill_provenance_cb)
+        self.provenance_budget_spin = QtGui.QSpinBox()
+        self.provenance_budget_spin.setRange(1, 1000000)
+        self.provenance_budget_spin.setValue(2000)
+        self.provenance_budget_spin.setSuffix("K provenance nodes in memory")
+        vbox2.addWidget(self.provenance_budget_spin)
         #vbox2.addWidget(self.indexFileIn)
         #vbox2.addWidget(self.indexFileStr)
         self.indexFileGroupBox.setLayout(vbox2)
@@ -193,128 +250,6 @@ class AnalyzerWidget(QtGui.QMainWindow):
         self.taint_nodes_label.setText("Taint Nodes(%d/%d)" %
             (n1, n2))
             
-    def generateInternalGraph(self):
-        """
-        Action for refreshing the window data by checking each process
-        """
-        import re
-        if hasattr(self, 'f_taint'):
-            #import taint file
-            taint_in = open(self.f_taint, 'r')
-            #
-            # TAINT_BRANCH taint nodes do not indicate explicit children but
-            # have tab indicating depth and children
-            #
-            if self.radioGroup2.checkedButton().text() == "TAINT_BRANCH":
-                self.cur_depth = 0
-                self.cur_taint_node = None
-                input_flag = False
-                for line in taint_in:
-                    line = line.rstrip('\n')
-                    if line.startswith("Path"):
-                        input_flag = True
-                    if input_flag:
-                        depth = re.match('\t*', line).group(0).count('\t')
-                        if (depth == 0):
-                            self.insert_node_br(line, 0)
-                        else:
-                            nodedata = line[depth:]
-                            self.insert_node_br(nodedata, depth)
-                    else:
-                        self.in_taint_chain.append(self.extract_uuid(line))
-                self.t_graph.reverse(copy=False)
-            else:
-                for line in taint_in:
-                    self.insert_node(line.rstrip('\n'))
-                self.t_graph.reverse(copy=False)
-            
-    def insert_node_br(self, s, depth):
-        from ..core.structures.Parse.TaintNode import TaintNode
-        try:
-            uuid = self.extract_uuid(s)
-        except AttributeError:
-            return
-        if uuid is None:
-            return
-        if self.t_graph.has_node(uuid):
-            return
-        tempNode = TaintNode()
-        tempNode.depth = depth
-        tempNode.ExtractData(s)
-        if tempNode.typ is None:
-            return
-        self.t_graph.add_node(uuid, inode = tempNode)
-        if depth == 0:
-            self.cur_taint_node = tempNode
-            self.cur_depth = depth
-            return
-        elif (depth > self.cur_depth):
-            if self.cur_taint_node.edgeann is not None:
-                self.t_graph.add_edge(str(self.cur_taint_node), str(tempNode), anno=self.cur_taint_node.edgeann)
-            else:
-                self.t_graph.add_edge(str(self.cur_taint_node), str(tempNode))
-            self.cur_depth = depth
-        elif(depth == self.cur_depth):
-            if self.cur_taint_node.edgeann is not None:
-                self.t_graph.add_edge(self.t_graph.predecessors(str(self.cur_taint_node))[0], tempNode, anno=self.t_graph.predecessors(str(self.cur_taint_node))[0].edgeann)
-            else:
-                self.t_graph.add_edge(self.t_graph.predecessors(str(self.cur_taint_node))[0], tempNode)
-        #Have to cover for the case where node is root of tree
-        else:
-            print depth
-            print self.cur_taint_node
-            print s
-            print self.t_graph.predecessors(str(self.cur_taint_node))
-            parent = self.t_graph.predecessors(str(self.cur_taint_node))[0]
-            for i in range(0, self.cur_depth - depth):
-                parent = self.t_graph.predecessors(str(parent))[0]
-            if parent.edgeann is not None:
-                self.t_graph.add_edge(str(parent), str(tempNode), anno=parent.edgeann)
-            else:
-                self.t_graph.add_edge(str(parent), str(tempNode))
-            self.cur_depth = depth
-        self.cur_taint_node = tempNode
-            
-    def insert_node(self, s):
-        from ..core.structures.Parse.TaintNode import TaintNode
-        tempNode = None
-        try:
-            uuid = self.extract_uuid(s)
-        except AttributeError:
-            return
-        if self.t_graph.has_node(uuid):
-            tempNode = self.t_graph.node[uuid]['inode']
-            tempNode.ExtractData(s)
-        else:
-            tempNode = TaintNode()
-            tempNode.ExtractData(s)
-            self.t_graph.add_node(uuid, inode = tempNode)
-        self.child_edges(tempNode)
-
-    def child_edges(self, node):
-        from ..core.structures.Parse.TaintNode import TaintNode
-        for attr, value in node.__dict__.iteritems():
-            if(attr.startswith('child')):
-                x = getattr(node, attr)
-                if x is not None:
-                    for child in x.split():
-                        if self.t_graph.has_node(child):
-                            self.t_graph.add_edge(str(node), child, anno=node.edgeann, edgetype=attr.split('_')[1])
-                            tempNode = self.t_graph.node[child]['inode']
-                            tempNode.SetNodeAttr(attr.split('_')[1])
-                        else:
-                            newNode = TaintNode(child)
-                            newNode.SetNodeAttr(attr.split('_')[1])
-                            self.t_graph.add_node(child, inode = newNode)
-                            self.t_graph.add_edge(str(node), child, anno=node.edgeann, edgetype=attr.split('_')[1])
-    def extract_uuid(self, s):
-        import re
-        pattern = re.compile(r"""
-                            \[(?P<uuid>\d+)\].*
-                            """, re.VERBOSE)
-        m = pattern.search(s)
-        return str(m.group('uuid'))
-        
     def onStartAnalyzeButtonClicked(self):
         """
         Action for calling the analyzer functionality 
@@ -331,6 +266,16 @@ class AnalyzerWidget(QtGui.QMainWindow):
         from ..core.structures.Analyzer.x86Decoder import WINDOWS, LINUX
         from ..core.structures.Analyzer.TaintMark import TaintMarker
         from ..core.structures.Analyzer.TaintChecker import TaintChecker
+        from ..core.structures.Analyzer.TaintPolicySet import TaintPolicySet, POLICY_PREFIX
+        from ..core.structures.Analyzer.Incremental import IncrementalAnalyzer
+        from ..core.structures.Analyzer.TaintSlicer import BackwardSlicer
+        from ..core.structures.Analyzer.ParallelTaint import ParallelPropagator
+        from ..core.structures.Analyzer.ShadowState import GRANULARITY_BYTE, GRANULARITY_WORD, GRANULARITY_OBJECT, GRANULARITY_HEAP
+        from ..core.structures.Analyzer.HeapTracker import DEFAULT_FIELD_BYTES
+        from ..core.structures.Analyzer.TaintGraphWriter import TaintGraphWriter
+        from ..core.structures.Graph.CompactTaintGraph import CompactTaintGraph
+        from ..core.structures.Graph.TaintGraphQuery import TaintGraphQuery
+        from ..core.structures.Graph.TaintGraphSummary import TaintGraphSummary
 
         self.trace_fname = idc.GetInputFile()
         log = logging.getLogger('CIDATA')
@@ -383,9 +328,51 @@ class AnalyzerWidget(QtGui.QMainWindow):
         elif(self.radioGroup2.checkedButton().text() == "TAINT_ADDRESS"):
             taintPolicy = TAINT_ADDRESS
             fTaint = "ATaintGraph_"+idb_filename
-        out_fd = open(fTaint, 'w')
-        
-        TP = TaintTracker(hostOS, processBits, targetBits, out_fd,taintPolicy, IDA)
+        policies = [taintPolicy]
+        if self.all_policies_cb.isChecked():
+            policies = [TAINT_DATA, TAINT_BRANCH, TAINT_COUNTER]
+            if taintPolicy not in policies:
+                policies.append(taintPolicy)
+        out_fds = {} #text output of every policy, only kept when exported
+        fGraphs = {} #taint graph file of every policy, written when exported
+        for policy in policies:
+            fText = fTaint
+            if policy != taintPolicy:
+                fText = POLICY_PREFIX[policy]+"TaintGraph_"+idb_filename
+            if self.export_text_cb.isChecked():
+                out_fds[policy] = open(fText, 'w')
+            else:
+                out_fds[policy] = open(os.devnull, 'w')
+            fGraphs[policy] = os.path.splitext(fText)[0]+".jsonl"
+        
+        TPS = TaintPolicySet(hostOS, processBits, targetBits, policies, out_fds, IDA)
+        granularities = [(GRANULARITY_BYTE, 0), (GRANULARITY_WORD, 0), (GRANULARITY_OBJECT, 0), (GRANULARITY_HEAP, 0), (GRANULARITY_HEAP, DEFAULT_FIELD_BYTES)] #(granularity, heap field bytes) of every granularity_combo item
+        TP = TPS.getTracker(taintPolicy)
+        for policy in policies:
+            tracker = TPS.getTracker(policy)
+            tracker.TGC.bKeepHistory = self.full_history_cb.isChecked()
+            tracker.TCache.bEnabled = self.share_taints_cb.isChecked()
+            tracker.TBS.bEnabled = self.block_summaries_cb.isChecked()
+            tracker.TLF.bEnabled = self.loop_fast_forward_cb.isChecked()
+            tracker.TLS.bEnabled = self.library_summaries_cb.isChecked() or self.verify_summaries_cb.isChecked()
+            tracker.TLS.bVerify = self.verify_summaries_cb.isChecked()
+            tracker.inputFilter = self.getInputFilter()
+            if self.input_labels_cb.isChecked() or self.incremental_cb.isChecked():
+                tracker.EnableInputLabels()
+            tracker.THT.bEnabled = self.heap_objects_cb.isChecked()
+            granularity, fieldBytes = granularities[self.granularity_combo.currentIndex()]
+            tracker.SetGranularity(granularity, fieldBytes=fieldBytes)
+            if self.function_sinks_cb.isChecked():
+                tracker.TC.sinks.AddDefaultFunctionSinks()
+            tracker.TC.bCoalesceMemory = self.coalesce_live_cb.isChecked()
+            if self.export_graph_cb.isChecked():
+                tracker.graph.AddSink(TaintGraphWriter(fGraphs[policy]))
+        self.taint_store = CompactTaintGraph() # the taint graph, built while the taints are reported
+        TP.graph.AddSink(self.taint_store)
+        TP.TCK.bEnabled = self.checkpoints_cb.isChecked() or self.incremental_cb.isChecked()
+        TP.TCK.directory = "Checkpoints_"+idb_filename
+        if self.spill_provenance_cb.isChecked():
+            TP.TDS.Enable(budget=1000*self.provenance_budget_spin.value()) # shared by all policies
         if (self.trace_data is not None):
             TR = IDBTraceReader(str(self.trace_data))
         else:
@@ -395,37 +382,56 @@ class AnalyzerWidget(QtGui.QMainWindow):
             log.error("Failed to open trace. Exit")
             self.trace_table2.append("Failed to open trace.")
             return
+        TR.bCoalesceRep = self.coalesce_rep_cb.isChecked()
         out_str = "Processing trace file %s..." %(self.trace_fname)
         self.trace_table2.append(out_str)
-
-        TM = TaintMarker(TP)
-        TC = TaintChecker(TP)
+        TIA = None
+        if self.incremental_cb.isChecked():
+            TIA = IncrementalAnalyzer(TP)
+            checkpointSeq = TIA.Resume(TR)
+            if checkpointSeq is not None:
+                out_str = "Re-analysis resumed from checkpoint at seq 0x%x" %(checkpointSeq)
+                self.trace_table2.append(out_str)
+        elif self.resume_cb.isChecked():
+            checkpointSeq = TP.TCK.Resume(TR)
+            if checkpointSeq is not None:
+                out_str = "Resumed from checkpoint at seq 0x%x" %(checkpointSeq)
+                self.trace_table2.append(out_str)
             
         if TP is None:
             log.error("Failed to create Taint Propogator. Exit")
             return
-
-        if TM is None:
-            log.error("Failed to create Taint Marker. Exit")
-            return
-        if TC is None:
-            log.error("Failed to create Taint Checker. Exit")
-            return
+          
+        TSL = None
+        if self.backward_slice_cb.isChecked():
+            TSL = BackwardSlicer(TP)
+            if (TSL.Run(TR, self.verbose_trace_cb.isChecked()) is None):
+                TSL = None # no fault in the trace, propagate forward
+          
+        TPR = None
+        if (self.parallel_cb.isChecked() and TSL is None and TIA is None and len(policies) ==1):
+            TPR = ParallelPropagator(TP, bCoarse=self.coarse_provenance_cb.isChecked())
+            if (TPR.Run(TR, self.verbose_trace_cb.isChecked()) is None):
+                TPR = None # policy not summarized, propagate sequentially
           
         tRecord = TR.getNext()
+        if (TSL is not None or TPR is not None):
+            tRecord = None
         bEnd = False
         tNextRecord = None
         strTaint = ""
         while tRecord!=None:
+            recordLine = TR.record_line
             tNextRecord = TR.getNext()
             recordType = tRecord.getRecordType()
             if (recordType == LoadImage):
+                TPS.LoadImage(tRecord)
                 if (self.verbose_trace_cb.isChecked()):
                     print("ImageName=%s, LoadAddr = %x, Size=%x" %(tRecord.ImageName, tRecord.LoadAddress, tRecord.ImageSize))
                     out_str = "ImageName=%s, LoadAddr = %x, Size=%x" %(tRecord.ImageName, tRecord.LoadAddress, tRecord.ImageSize)
                     self.trace_table2.append(out_str)                     
             elif (recordType == Input):
-                TM.SetInputTaint(tRecord)
+                TPS.SetInputTaint(tRecord)
                 if(self.verbose_trace_cb.isChecked()):
                     print("InputAddr = %x, InputSize =%x" %(tRecord.currentInputAddr, tRecord.currentInputSize))
                     out_str = "InputAddr = %x, InputSize =%x" %(tRecord.currentInputAddr, tRecord.currentInputSize)
@@ -434,23 +440,27 @@ class AnalyzerWidget(QtGui.QMainWindow):
                 if (tNextRecord ==None):
                   break
                 if(tNextRecord.getRecordType() == eXception):
+                    TP.TCK.SaveFinal(tRecord, recordLine)
                     if(tNextRecord.currentExceptionCode ==0): # termination
                         if (taintPolicy == TAINT_BRANCH):
                           print("Path Condition\n")
-                          strTaint = TC.DisplayPCs()
-                        else:
-                          strTaint = TC.DumpLiveTaints()	
+                        strTaint = TPS.DumpLiveTaints()[taintPolicy]
                     else:
-                        strTaint = TC.DumpFaultCause(tNextRecord, tRecord, self.verbose_trace_cb.isChecked())
+                        strTaint = TPS.DumpFaultCause(tNextRecord, tRecord, self.verbose_trace_cb.isChecked())[taintPolicy]
                         if self.verbose_trace_cb.isChecked():
                           print "Exception! Get out of the loop!"
                         bEnd = True
                         break        					
-                elif(TP.Propagator(tRecord)==1):
+                elif(TPS.Propagator(tRecord)==1):
                     #bEnd = True
                     if(self.verbose_trace_cb.isChecked()):
                       print "Tainted Security Warning!"
                     #break
+                if (TIA is not None):
+                    if (TIA.Tick(tRecord, TR)): # converged with the previous run, continue at its last record
+                        tNextRecord = TR.getNext()
+                elif (TP.TCK.bEnabled):
+                    TP.TCK.Tick(tRecord, TR)
             else:
                 print "Type not supported:%d" %recordType
 
@@ -460,22 +470,54 @@ class AnalyzerWidget(QtGui.QMainWindow):
                 tRecord = tNextRecord 				
 
         #if(taintPolicy ==TAINT_BRANCH):
-        strTaint = TC.DumpPCs()
-        out_fd.close()
+        strTaint = TPS.DumpPCs()[taintPolicy]
+        strTaint = strTaint + TPS.DumpSinkReports()[taintPolicy]
+        for policy in policies:
+            out_fds[policy].close()
+            TPS.getTracker(policy).graph.Close()
         
         text = strTaint
-        self.f_taint = fTaint # TODO: enhance later, not to read from file
         self.trace_table2.setText(text)
+        self.trace_table2.append(TP.TGC.getStatistics())
+        self.trace_table2.append(TP.TC.sinks.getStatistics())
+        self.trace_table2.append(TP.TC.dumper.getStatistics())
+        self.trace_table2.append(TP.graph.getStatistics())
+        self.trace_table2.append(TP.TCache.getStatistics())
+        self.trace_table2.append(TP.getPrefilterStatistics())
+        self.trace_table2.append(TP.dynamic_taint.getStatistics())
+        self.trace_table2.append(TP.TBS.getStatistics())
+        self.trace_table2.append(TP.TLF.getStatistics())
+        self.trace_table2.append(TP.TLS.getStatistics())
+        self.trace_table2.append(TP.TCK.getStatistics())
+        self.trace_table2.append(TP.THT.getStatistics())
+        self.trace_table2.append(TP.TDS.getStatistics())
+        TP.TDS.Close()
+        if TIA is not None:
+            self.trace_table2.append(TIA.getStatistics())
+        if TSL is not None:
+            self.trace_table2.append(TSL.getStatistics())
+        if TPR is not None:
+            self.trace_table2.append(TPR.getStatistics())
+        if TP.inputLabels is not None:
+            self.updateInputInfluence(TP.inputLabels)
+        self.trace_table2.append(self.taint_store.getStatistics())
         log.info("TREE Taint Analysis Finished")
+        self.t_graph = self.taint_store.getView() # only the displayed subgraph is materialized
+        self.taint_query = TaintGraphQuery(self.taint_store)
         if self.verbose_trace_cb.isChecked():
           for x, y, d in self.t_graph.edges(data=True):
               print x
               print y
               print d
-        self.generateInternalGraph()
+        if self.radioGroup2.checkedButton().text() == "TAINT_BRANCH":
+            self.in_taint_chain = self.taint_store.getChain()
         self.extendTaints()
+        self.taint_summary = TaintGraphSummary(self.taint_store, self.node_ea) # coarsened view of the whole graph
+        self.trace_table2.append(self.taint_summary.getStatistics())
         self.parent.setTabFocus("Visualizer")
         self.parent.passTaintGraph(self.t_graph, "Visualizer", self.radioGroup2.checkedButton().text())
+        self.parent.passTaintQuery(self.taint_query, "Visualizer")
+        self.parent.passTaintSummary(self.taint_summary, "Visualizer")
         if (self.radioGroup2.checkedButton().text() == "TAINT_BRANCH"):
             if not self.in_taint_chain:
                 self.parent.passBranchData(None, "Visualizer")
@@ -535,6 +577,9 @@ class AnalyzerWidget(QtGui.QMainWindow):
                     #inputBytes
                     elif column == 2:
                         tmp_item = self.QtGui.QTableWidgetItem(str(tRecord.inputBytes))
+                    #influence counts, filled after the analysis
+                    elif column == 3:
+                        tmp_item = self.QtGui.QTableWidgetItem("")
                     tmp_item.setFlags(tmp_item.flags() & ~self.QtCore.Qt.ItemIsEditable)
                     self.sources_table.setItem(self.sources_table.rowCount()-1, column, tmp_item)
             elif(recordType==Execution):
@@ -547,11 +592,50 @@ class AnalyzerWidget(QtGui.QMainWindow):
         self.images_table.horizontalHeader().setResizeMode(self.QtGui.QHeaderView.Stretch)
         #self.sources_table.horizontalHeader().setResizeMode(self.QtGui.QHeaderView.Stretch)        
             
+    def getInputFilter(self):
+        """
+        Parses the input filter, e.g. "63c4:0:4, 7a10:8:2" only taints 4 bytes at offset 0 of the input
+        record with sequence 0x63c4 and 2 bytes at offset 8 of the one with sequence 0x7a10
+        """
+        inputFilter = {}
+        for part in str(self.input_filter_edit.text()).split(","):
+            split = part.strip().split(":")
+            if (len(split) != 3):
+                continue
+            try:
+                inputFilter[int(split[0], 16)] = (int(split[1], 16), int(split[2], 16))
+            except ValueError:
+                print "Bad input filter %s" %part
+        return inputFilter
+
+    def updateInputInfluence(self, inputLabels):
+        """
+        Fill the influence column of the taint source table with the per-input-byte influence counts
+        """
+        self.sources_table.setSortingEnabled(False)
+        used_rows = set()
+        for source in inputLabels.sources:
+            if not isinstance(source.address, (int, long)): # interactive register source
+                continue
+            for row in xrange(self.sources_table.rowCount()):
+                if row in used_rows:
+                    continue
+                if self.sources_table.item(row, 0).text() == str(hex(source.address)) and self.sources_table.item(row, 1).text() == str(source.size):
+                    tmp_item = self.QtGui.QTableWidgetItem(inputLabels.describeInfluence(source))
+                    tmp_item.setFlags(tmp_item.flags() & ~self.QtCore.Qt.ItemIsEditable)
+                    self.sources_table.setItem(row, 3, tmp_item)
+                    used_rows.add(row)
+                    break
+        self.sources_table.resizeColumnsToContents()
+        self.sources_table.setSortingEnabled(True)
+            
     def extendTaints(self):
         """
         Method to extend taint information with trace. Library context added to taint nodes from trace
         """
         for node in self.t_graph.nodes(data=True):
+            if node[1]['inode'].startind is None: # source only referenced by an edge
+                continue
             ind = node[1]['inode'].startind.split(':')[0]
             if(self.pin_trace_cb.isChecked()):
                 ind = int(ind, 0)
@@ -629,7 +713,7 @@ class AnalyzerWidget(QtGui.QMainWindow):
         Populate the VM table with information about the virtual machines
         """
         self.sources_table.setSortingEnabled(False)
-        self.sources_header_labels = ["Input Address", "Size", "Input Bytes"]
+        self.sources_header_labels = ["Input Address", "Size", "Input Bytes", "Influence"]
         self.sources_table.clear()
         self.sources_table.setColumnCount(len(self.sources_header_labels))
         self.sources_table.setHorizontalHeaderLabels(self.sources_header_labels)
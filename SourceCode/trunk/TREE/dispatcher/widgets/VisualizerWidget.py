@@ -35,6 +35,8 @@ class VisualizerWidget(QtGui.QMainWindow):
         self.t_graph = nx.MultiDiGraph()
         #The taint graph object was added to prevent openning multiple instance the IDA Graphviewer
         self.taintGraph = None
+        self.taint_query = None #queries over the whole taint graph, t_graph being only the displayed part of it
+        self.taint_summary = None
         
     def _createGui(self):
         """
@@ -69,10 +71,12 @@ class VisualizerWidget(QtGui.QMainWindow):
         self._createRefreshAction()
         #self._createImportTraceAction()
         self._createIDAGraphAction()
+        self._createSummaryGraphAction()
         
         self.toolbar = self.addToolBar('Trace Generation Toolbar')
         self.toolbar.addAction(self.refreshAction)
         self.toolbar.addAction(self.importIDAGraphAction)
+        self.toolbar.addAction(self.summaryGraphAction)
         
     def _createRefreshAction(self):
         """
@@ -99,6 +103,14 @@ class VisualizerWidget(QtGui.QMainWindow):
         self.importIDAGraphAction = QtGui.QAction(QIcon(path),"Generate IDA Graph", self)
         self.importIDAGraphAction.triggered.connect(self.onIDAGraphClicked)
         
+    def _createSummaryGraphAction(self):
+        """
+        Create the summary graph action
+        """
+        path = os.path.join(self.parent.iconPath,"zoom.png")
+        self.summaryGraphAction = QtGui.QAction(QIcon(path),"Generate IDA Summary Graph", self)
+        self.summaryGraphAction.triggered.connect(self.onSummaryGraphClicked)
+        
     def _createTaintTable(self):
         """
         Create the top table used for showing all
@@ -203,6 +215,21 @@ class VisualizerWidget(QtGui.QMainWindow):
             self.taintGraph = TaintGraph(self.t_graph)
         self.taintGraph.Show()
         
+    def onSummaryGraphClicked(self):
+        """ 
+        Action for generating the IDA Graph of the taint graph summary, nodes expand to their taints on double click
+        """
+        from ..core.structures.Graph.SummaryTaintGraph import SummaryTaintGraph
+        
+        if self.taint_summary is None:
+          print "No taint graph summary, run the analysis first"
+          return
+        if self.taintGraph is not None:
+          print "Closing taint graph"
+          self.taintGraph.Close()
+        self.taintGraph = SummaryTaintGraph(self.taint_summary)
+        self.taintGraph.Show()
+        
     def _createTaintsTable(self):
         """
         Create the bottom left table
@@ -239,6 +266,18 @@ class VisualizerWidget(QtGui.QMainWindow):
         self.populateTaintTable()
         self.populateTaintsTableImported()
         
+    def setTaintQuery(self, q):
+        """
+        Method to set the taint graph queries
+        """
+        self.taint_query = q
+        
+    def setTaintSummary(self, s):
+        """
+        Method to set the taint graph summary
+        """
+        self.taint_summary = s
+        
     def setBranchData(self, t):
         """
         Method to set extra branch information
@@ -360,6 +399,17 @@ class VisualizerWidget(QtGui.QMainWindow):
             return
         elif not self.taint_table.item(x,y).text().strip():
             return
+        elif self.taint_query is not None:
+            #the sources of the same relation, up to the depth highlighted by the recursion below
+            relation = 'c'
+            if y == 7:
+                relation = 'd'
+            rows = self.tableRows(self.taint_table)
+            uuid = int(self.taint_table.item(x,0).text())
+            for child in self.taint_query.getAncestors(uuid, maxDepth=4-depth, relations=(relation,)):
+                if str(child) in rows:
+                    self.highlightRow(self.taint_table, rows[str(child)], self.QtCore.Qt.red)
+            return
         else:
             for child in self.taint_table.item(x,y).text().split(" "):
                 #Search for child's row in taint_table
@@ -371,6 +421,15 @@ class VisualizerWidget(QtGui.QMainWindow):
             return
         return
             
+    def tableRows(self, table):
+        """
+        Map the uuid of every row to the row
+        """
+        rows = {}
+        for i in xrange(table.rowCount()):
+            rows[str(int(table.item(i,0).text()))] = i
+        return rows
+        
     def tableSearch(self, table, val):
         """
         Search through every row in the uuid for a value and retun the corresponding row